@@ -0,0 +1,335 @@
+import argparse
+import csv
+import datetime
+import math
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from history_import import iter_csv, iter_excel
+from schedule_engine import DEFAULT_SCOPE, ScheduleInputs, calculate_schedule
+
+# ==========================================
+# 🌙 批次重估 (CSV / Excel → 多核心運算 → CSV / Excel / 歷史資料庫)
+# ==========================================
+# - 輸入欄位同 Pro 表單 (表頭可用表單標籤或 ScheduleInputs 欄位名)，逐列串流讀取
+# - 每 chunk_size 列交給一個工作行程 (解析 + calculate_schedule)，最多 2 × 行程數個 chunk 在途，
+#   依原順序取回後立即寫出，記憶體不隨檔案大小成長
+# - 不合格的列照樣輸出一列並記錄錯誤原因，不中斷整批
+
+CHUNK_SIZE = 200
+
+FORM_ALIASES = {
+    "project_name": ["工程名稱", "專案名稱", "案名"],
+    "location": ["地號位置", "地點", "基地位置"],
+    "design_unit": ["設計單位", "建築師"],
+    "b_type": ["建物類型"],
+    "method": ["施工方式", "工法"],
+    "struct_above": ["地上結構"],
+    "struct_below": ["地下結構"],
+    "slab_type": ["樓版型式"],
+    "base_area_m2": ["基地面積", "基地面積 (m²)", "基地面積(m2)"],
+    "total_fa_m2": ["總樓地板面積", "總樓地板面積 (m²)", "總樓地板面積(m2)"],
+    "floors_up": ["地上層數", "地上層數 (F)"],
+    "floors_roof": ["屋突層數", "屋突層數 (R)"],
+    "floors_down": ["地下層數", "地下層數 (B)"],
+    "building_count": ["棟數"],
+    "site_condition": ["基地現況"],
+    "obstruction_method": ["地中障礙清障方式"],
+    "deep_gw_seq": ["深導溝施作順序"],
+    "soil_improvement": ["地質改良"],
+    "prep_type_select": ["前置作業類型"],
+    "prep_days_custom": ["自訂前置天數", "輸入自訂前置天數"],
+    "manual_review_days": ["危評緩衝天數", "危評/外審緩衝期", "輸入緩衝天數"],
+    "selected_wall": ["擋土壁體類型", "A. 擋土壁體類型"],
+    "selected_support": ["支撐/開挖方式", "B. 支撐/開挖方式"],
+    "rw_aux_options": ["連續壁輔助措施"],
+    "foundation_type": ["基礎型式"],
+    "ext_wall": ["外牆型式"],
+    "scope_options": ["納入工項"],
+    "daily_soil_limit": ["每日限出土", "每日限出土 (m³)"],
+    "manual_retain_days": ["擋土壁施作工期", "擋土壁施作工期 (天)"],
+    "manual_crane_days": ["塔吊/鋼構吊裝工期", "塔吊/鋼構吊裝工期 (天)"],
+    "start_date": ["開工日期", "預計開工日期"],
+    "exclude_sat": ["排除週六", "排除週六 (不施工)"],
+    "exclude_sun": ["排除週日", "排除週日 (不施工)"],
+    "exclude_cny": ["扣除過年", "扣除過年 (7天)"],
+    "floor_cycle_schedule": ["逐層循環排程"],
+    "transfer_floors": ["轉換層樓層", "轉換層"],
+}
+_NUMBER_FIELDS = {"base_area_m2", "total_fa_m2", "floors_up", "floors_roof", "floors_down", "building_count", "prep_days_custom",
+                  "manual_review_days", "daily_soil_limit", "manual_retain_days", "manual_crane_days"}
+_INT_FIELDS = {"floors_up", "floors_roof", "building_count", "prep_days_custom", "manual_review_days", "manual_retain_days", "manual_crane_days"}
+_LIST_FIELDS = {"rw_aux_options", "scope_options"}
+_BOOL_FIELDS = {"exclude_sat", "exclude_sun", "exclude_cny", "floor_cycle_schedule"}
+_FALSE_TEXT = {"0", "false", "no", "n", "否", "不", "x", "off"}
+
+
+def _norm_header(text):
+    return "".join(str(text or "").split()).lower().replace("（", "(").replace("）", ")")
+
+
+_ALIAS_LOOKUP = {_norm_header(alias): key for key, aliases in FORM_ALIASES.items() for alias in aliases + [key]}
+
+
+def map_form_columns(header):
+    """表頭 → {表單欄位: 欄位序}；未知欄位忽略"""
+    mapping = {}
+    for idx, name in enumerate(header):
+        key = _ALIAS_LOOKUP.get(_norm_header(name))
+        if key and key not in mapping: mapping[key] = idx
+    return mapping
+
+
+def _convert(key, value):
+    if isinstance(value, str):
+        value = value.strip()
+        if not value: return None
+    if key in _NUMBER_FIELDS:
+        if isinstance(value, bool): raise ValueError  # JSON true / Excel TRUE 不當成 1
+        number = float(str(value).replace(",", "")) if isinstance(value, str) else float(value)
+        if not math.isfinite(number): raise ValueError  # "inf" / JSON 1e400
+        if key in _INT_FIELDS:
+            if number != int(number): raise ValueError
+            return int(number)
+        return number
+    if key in _BOOL_FIELDS:
+        return value if isinstance(value, bool) else str(value).strip().lower() not in _FALSE_TEXT
+    if key in _LIST_FIELDS:
+        if isinstance(value, (list, tuple)): return tuple(str(x).strip() for x in value if str(x).strip())
+        return tuple(x.strip() for x in re.split(r"[,;、|\n]", str(value)) if x.strip() and x.strip() != "無")
+    if key == "transfer_floors":
+        return tuple(sorted({int(x) for x in re.findall(r"\d+", str(value))}))
+    if key == "start_date":
+        if isinstance(value, datetime.datetime): return value.date()
+        if isinstance(value, datetime.date): return value
+        y, m, d = (int(x) for x in str(value).split()[0].replace("/", "-").split("-"))
+        return datetime.date(y, m, d)
+    return str(value)
+
+
+def parse_form(values, mapping):
+    """單列 → {表單欄位: 值}；格式錯誤時丟 ValueError"""
+    form = {}
+    for key, idx in mapping.items():
+        value = values[idx] if idx < len(values) else None
+        if value is None: continue
+        try: value = _convert(key, value)
+        except (TypeError, ValueError) as e: raise ValueError(f"{FORM_ALIASES[key][0]} 格式錯誤: {value!r}") from e
+        if key in _NUMBER_FIELDS and value is not None and value < 0: raise ValueError(f"{FORM_ALIASES[key][0]} 不可為負: {value}")
+        if value is not None: form[key] = value
+    return form
+
+
+def parse_record(record):
+    """{欄位名或表單標籤: 值} (如 JSON 物件) → {表單欄位: 值}"""
+    keys = list(record)
+    return parse_form([record[k] for k in keys], map_form_columns(keys))
+
+
+def build_inputs(form):
+    """表單欄位 → (ScheduleInputs, is_reverse_method)；與 Pro 表單相同的預設與連動規則，缺必要欄位時丟 ValueError"""
+    method = form.get("method")
+    missing = [label for key, label in [("b_type", "建物類型"), ("method", "施工方式"), ("struct_above", "地上結構"), ("struct_below", "地下結構")]
+               if not form.get(key)]
+    if missing: raise ValueError(f"缺少必要欄位: {', '.join(missing)}")
+    floors_up, floors_roof = form.get("floors_up", 0), form.get("floors_roof", 0)
+    floors_down = form.get("floors_down", 0.0)
+    base_area_m2, total_fa_m2 = form.get("base_area_m2", 0.0), form.get("total_fa_m2", 0.0)
+    if not (base_area_m2 > 0 and total_fa_m2 > 0 and (floors_up + floors_roof > 0 or floors_down > 0)):
+        raise ValueError("請輸入 基地面積、總樓地板面積 及 樓層數")
+
+    site_condition = form.get("site_condition")
+    is_deep_demo = site_condition and "舊地下室" in site_condition
+    obstruction_method = form.get("obstruction_method") if is_deep_demo else "一般怪手破除"
+    deep_gw_seq = form.get("deep_gw_seq") if obstruction_method and "深導溝" in obstruction_method else "無"
+    prep_type_select = form.get("prep_type_select")
+    selected_wall = form.get("selected_wall")
+    # 同 Pro：逆打預設支撐為結構樓板
+    default_support = "結構樓板 (逆打標準)" if "逆打" in method else "型鋼內支撐 (Strut)"
+    review_days = form.get("manual_review_days", 0)
+    daily_soil_limit = form.get("daily_soil_limit", 0)
+    inp = ScheduleInputs(
+        start_date=form.get("start_date", datetime.date.today()), b_type=form["b_type"], struct_above=form["struct_above"],
+        slab_type=form.get("slab_type", "一般 RC 樓版"), base_area_m2=base_area_m2, total_fa_m2=total_fa_m2,
+        calc_floors_struct=floors_up + floors_roof, display_max_floor=floors_up, building_count=max(form.get("building_count", 1), 1),
+        floors_down=floors_down, enable_soil_limit=daily_soil_limit > 0, daily_soil_limit=daily_soil_limit or 300,
+        site_condition=site_condition, obstruction_method=obstruction_method, deep_gw_seq=deep_gw_seq,
+        soil_improvement=form.get("soil_improvement"), prep_type_select=prep_type_select,
+        prep_days_custom=form.get("prep_days_custom", 120) if prep_type_select and "自訂" in prep_type_select else None,
+        enable_manual_review=review_days > 0, manual_review_days=review_days,
+        selected_wall=selected_wall, selected_support=form.get("selected_support", default_support),
+        rw_aux_options=form.get("rw_aux_options", ()) if selected_wall and "連續壁" in selected_wall else (),
+        foundation_type=form.get("foundation_type"), ext_wall=form.get("ext_wall"), scope_options=form.get("scope_options", DEFAULT_SCOPE),
+        manual_retain_days=form.get("manual_retain_days", 0), manual_crane_days=form.get("manual_crane_days", 0),
+        exclude_sat=form.get("exclude_sat", True), exclude_sun=form.get("exclude_sun", True), exclude_cny=form.get("exclude_cny", True),
+        floor_cycle_schedule=form.get("floor_cycle_schedule", False),
+        transfer_floors=form.get("transfer_floors", ()) if form.get("floor_cycle_schedule") else (),
+    )
+    return inp, "逆打" in method or "雙順打" in method
+
+
+# ==========================================
+# 工作行程
+# ==========================================
+
+PHASE_ORDER = ["1.前期", "2.拆除", "3.地改", "4.擋土壁", "5.支撐", "6.開挖", "7.地下結構", "7.5 塔吊", "8.地上結構",
+               "9.外牆", "10.機電", "11.裝修", "12.景觀", "13.驗收"]
+OUTPUT_COLUMNS = (["列", "工程名稱", "地號位置", "設計單位", "建物類型", "施工方式", "有效工期(天)", "日曆天", "完工日", "錯誤"]
+                  + [f"{name} {part}" for name in PHASE_ORDER for part in ("天數", "完成")])
+
+
+_ID_FIELDS = ("project_name", "location", "design_unit", "b_type", "method")
+
+
+def _estimate(line_no, values, mapping):
+    # (輸出列, 存檔用 (摘要, inp, result, is_reverse) 或 None)
+    try:
+        form = parse_form(values, mapping)
+        inp, is_reverse = build_inputs(form)
+        result = calculate_schedule(inp, is_reverse)
+    except ValueError as e:
+        ids = [values[mapping[k]] if k in mapping and mapping[k] < len(values) else None for k in _ID_FIELDS]
+        return [line_no] + ids + [None, None, None, str(e)] + [None] * (2 * len(PHASE_ORDER)), None
+    phases = {p.name: p for p in result.phases}
+    row = [line_no, form.get("project_name"), form.get("location"), form.get("design_unit"), form["b_type"], form["method"],
+           result.eff_days, result.cal_days, result.final_finish.isoformat(), None]
+    for name in PHASE_ORDER:
+        p = phases.get(name)
+        row += [p.days, p.finish.isoformat()] if p else [None, None]
+    summary = {"project_name": form.get("project_name"), "location": form.get("location"), "design_unit": form.get("design_unit"),
+               "b_type": form["b_type"], "struct_above": form["struct_above"], "base_area": inp.base_area_m2,
+               "floors_up": inp.display_max_floor, "floors_down": inp.floors_down, "total_cal_days": result.cal_days,
+               "final_finish_date": str(result.final_finish), "note": form["method"]}
+    return row, (summary, inp, result, is_reverse)
+
+
+def _estimate_chunk(chunk, mapping, keep):
+    out = []
+    for line_no, values in chunk:
+        row, saved = _estimate(line_no, values, mapping)
+        out.append((row, saved if keep else None))
+    return out
+
+
+def _chunks(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+
+def run_batch(rows, mapping, workers=None, chunk_size=CHUNK_SIZE, keep=False):
+    """rows = (列號, values) 的 iterable；依原順序產生 (輸出列, 存檔用資料或 None)。workers=1 時不開行程池"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(rows, chunk_size): yield from _estimate_chunk(chunk, mapping, keep)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _chunks(rows, chunk_size):
+            pending.append(pool.submit(_estimate_chunk, chunk, mapping, keep))
+            if len(pending) >= workers * 2: yield from pending.popleft().result()
+        while pending: yield from pending.popleft().result()
+
+
+# ==========================================
+# 輸出
+# ==========================================
+
+def _read_rows(path, sheet=None):
+    """(表頭, (列號, values) generator)；列號為輸入檔的實體列號"""
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in ("xlsx", "xlsm", "csv"): raise ValueError(f"不支援的檔案格式: {fmt or path}")
+    stream = open(path, "rb")
+    rows = iter_csv(stream) if fmt == "csv" else iter_excel(stream, sheet)
+    try: _, header, _ = next(rows)
+    except StopIteration:
+        rows.close()
+        stream.close()
+        raise ValueError("檔案沒有資料列") from None
+
+    def body():
+        try:
+            for line_no, values, _ in rows: yield line_no, list(values)
+        finally:
+            rows.close()
+            stream.close()
+    return list(header), body()
+
+
+def _save_to_db(results, stats, batch_size=500):
+    # 邊算邊存：每 batch_size 筆一個交易，最多一批在寫
+    from history_db import submit_estimates
+    batch, pending = [], None
+    for row, saved in results:
+        if saved is not None: batch.append(saved)
+        if len(batch) >= batch_size:
+            if pending is not None: stats["saved"] += len(pending.result())
+            pending, batch = submit_estimates(batch), []
+        yield row, saved
+    if pending is not None: stats["saved"] += len(pending.result())
+    if batch: stats["saved"] += len(submit_estimates(batch).result())
+
+
+def write_results(results, out_path, stats):
+    """依副檔名寫出 CSV / Excel (皆為逐列串流)"""
+    def rows():
+        for row, _ in results:
+            stats["done"] += 1
+            if row[9]: stats["errors"] += 1
+            yield row
+
+    fmt = os.path.splitext(out_path)[1].lstrip(".").lower()
+    if fmt == "csv":
+        with open(out_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(OUTPUT_COLUMNS)
+            writer.writerows(rows())
+    elif fmt == "xlsx":
+        from excel_report import Sheet, write_workbook
+        write_workbook([Sheet("批次估算", OUTPUT_COLUMNS, rows(), styled=False)], out_path)
+    else: raise ValueError(f"不支援的輸出格式: {fmt or out_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次重估工期 (CSV/Excel，欄位同 Pro 表單)")
+    parser.add_argument("file", help="輸入 .csv / .xlsx / .xlsm")
+    parser.add_argument("-o", "--out", help="輸出 .csv / .xlsx")
+    parser.add_argument("--save-db", action="store_true", help="估算結果存入歷史資料庫")
+    parser.add_argument("--db", help="資料庫檔案 (預設 construction_history_v2.db)")
+    parser.add_argument("--sheet", help="Excel 工作表名稱 (預設第一張)")
+    parser.add_argument("--workers", type=int, default=None, help="工作行程數 (預設 CPU 核心數；1 = 不開行程池)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if not args.out and not args.save_db: parser.error("請指定 --out 或 --save-db")
+    if args.db:
+        from history_db import configure
+        configure(args.db)
+
+    header, rows = _read_rows(args.file, args.sheet)
+    mapping = map_form_columns(header)
+    stats = {"done": 0, "errors": 0, "saved": 0}
+    started = time.perf_counter()
+    results = run_batch(rows, mapping, args.workers, args.chunk_size, keep=args.save_db)
+    if args.save_db: results = _save_to_db(results, stats)
+    if args.out: write_results(results, args.out, stats)
+    else:
+        for row, _ in results:
+            stats["done"] += 1
+            if row[9]: stats["errors"] += 1
+    elapsed = time.perf_counter() - started
+    rate = stats["done"] / elapsed if elapsed > 0 else 0.0
+    print(f"{args.file}: {stats['done']:,} 案，錯誤 {stats['errors']:,} 案，存檔 {stats['saved']:,} 案，"
+          f"{elapsed:.2f} 秒 ({rate:,.0f} 案/秒)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
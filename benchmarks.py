@@ -0,0 +1,260 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+import numpy as np
+
+import history_db
+from excel_report import REPORT_COLUMNS, REPORT_SHEET, REPORT_WIDTHS, Sheet, phase_report_rows, portfolio_xlsx, write_workbook
+from history_db import SQL_INSERT_PROJECT, count_projects, rebuild_search_index, search_projects, submit_estimates, \
+    submit_write, suspend_search_index
+from schedule_batch import calculate_schedule_batch, inputs_to_columns
+from schedule_engine import (
+    EXT_WALL_MAP, STRUCT_MAP_ABOVE, SUPPORT_FACTORS, WALL_FACTORS, IncrementalSchedule, ScheduleInputs, calculate_schedule,
+)
+from workday_calendar import get_calendar
+
+# ==========================================
+# ⏱️ 效能基準測試 (JSON 輸出，可跨 commit 比對)
+# ==========================================
+# python benchmarks.py [--quick] [--only engine,db] [-o bench.json] [--compare base.json]
+# - 每個案例 = 名稱 + 規模參數；自動調整每次取樣的呼叫次數 (每筆取樣至少 min_time 秒)，取 repeat 筆
+# - 結果記錄每次呼叫的 min / median / mean 秒數，比對時以 median 比值判斷變快或變慢
+# - 資料庫案例建在暫存目錄，不動到 construction_history_v2.db
+
+SCALES = {
+    "full": {"floors": (10, 40, 100), "basements": (2, 5, 8), "projects": (1_000, 10_000), "db_rows": (10_000, 100_000),
+             "spans": (30, 365, 3650), "vector": (1_000, 100_000), "portfolio": (10, 100), "repeat": 7, "min_time": 0.05},
+    "quick": {"floors": (10, 40), "basements": (2, 5), "projects": (1_000,), "db_rows": (10_000,),
+              "spans": (30, 3650), "vector": (1_000,), "portfolio": (10,), "repeat": 3, "min_time": 0.02},
+}
+GROUPS = ("engine", "compare", "calendar", "excel", "db")
+REGRESSION = 1.2  # median 慢 20% 以上視為退步
+MAX_NUMBER = 1 << 20
+B_TYPES = ("住宅", "辦公大樓", "飯店", "百貨", "廠房", "醫院")
+NAMES = ("信義", "大安", "中山", "內湖", "南港", "板橋", "新莊", "竹北", "西屯", "前鎮")
+
+
+def project_inputs(rng, floors_up, floors_down, **overrides):
+    """基準用的隨機專案 (固定種子可重現)"""
+    base_area = rng.uniform(800, 6000)
+    values = dict(
+        start_date=datetime.date(2026, 1, 5) + datetime.timedelta(days=rng.randrange(365)), b_type=rng.choice(B_TYPES),
+        struct_above=rng.choice(list(STRUCT_MAP_ABOVE)), base_area_m2=base_area, total_fa_m2=base_area * 0.6 * (floors_up + floors_down),
+        calc_floors_struct=floors_up + 2, display_max_floor=floors_up, floors_down=float(floors_down),
+        site_condition="有舊建物 (含舊地下室)", obstruction_method="一般怪手破除", soil_improvement="局部改良 (JSP/CCP)",
+        prep_type_select="一般 (120天)", selected_wall=rng.choice(list(WALL_FACTORS)), selected_support=rng.choice(list(SUPPORT_FACTORS)),
+        foundation_type="筏式基礎 + 一般鑽掘/預力樁", ext_wall=rng.choice(list(EXT_WALL_MAP)),
+    )
+    values.update(overrides)
+    return ScheduleInputs(**values)
+
+
+# ==========================================
+# 計時
+# ==========================================
+
+def _timed(fn, number):
+    t = time.perf_counter()
+    for _ in range(number): fn()
+    return time.perf_counter() - t
+
+
+def measure(fn, repeat, min_time):
+    """(每筆取樣呼叫次數, 每次呼叫秒數 list)；先倍增呼叫次數到單筆取樣 ≥ min_time"""
+    number = 1
+    while True:
+        elapsed = _timed(fn, number)
+        if elapsed >= min_time or number >= MAX_NUMBER: break
+        number = min(max(number * 2, int(number * min_time / max(elapsed, 1e-9)) + 1), MAX_NUMBER)
+    return number, [_timed(fn, number) / number for _ in range(repeat)]
+
+
+def _record(name, params, number, samples, items=1):
+    median = statistics.median(samples)
+    return {"name": name, "params": params, "number": number, "repeat": len(samples), "min_s": min(samples), "median_s": median,
+            "mean_s": statistics.fmean(samples), "items": items, "items_per_s": items / median if median > 0 else None}
+
+
+def case_key(record):
+    return record["name"] + "".join(f"|{k}={v}" for k, v in sorted(record["params"].items()))
+
+
+# ==========================================
+# 案例
+# ==========================================
+
+def bench_engine(scale, rng):
+    for floors in scale["floors"]:
+        for basements in scale["basements"]:
+            inp = project_inputs(rng, floors, basements)
+            yield "engine.calculate_schedule", {"floors": floors, "basements": basements}, lambda inp=inp: calculate_schedule(inp, False), 1
+        inp = project_inputs(rng, floors, scale["basements"][-1], floor_cycle_schedule=True, transfer_floors=(floors // 2,))
+        yield "engine.floor_cycle", {"floors": floors}, lambda inp=inp: calculate_schedule(inp, False), 1
+        # 增量重算：來回切換外牆 (只影響外牆之後的工項)
+        inc, pair = IncrementalSchedule(), [inp, replace(inp, ext_wall="預鑄PC板")]
+        state = {"i": 0}
+
+        def toggle(inc=inc, pair=pair, state=state):
+            state["i"] ^= 1
+            inc.compute(pair[state["i"]], False)
+        yield "engine.incremental", {"floors": floors}, toggle, 1
+
+
+def bench_compare(scale, rng):
+    # Pro 比較模式：同一組輸入順打、逆打各算一次
+    for floors in scale["floors"]:
+        inp = project_inputs(rng, floors, scale["basements"][-1])
+        yield "compare.pro", {"floors": floors}, lambda inp=inp: (calculate_schedule(inp, False), calculate_schedule(inp, True)), 1
+    for n in scale["projects"]:
+        cols = inputs_to_columns([project_inputs(rng, rng.randint(5, 60), rng.randint(1, 6)) for _ in range(n)])
+        yield "compare.batch", {"projects": n}, lambda cols=cols: (calculate_schedule_batch(cols, False), calculate_schedule_batch(cols, True)), n
+
+
+def bench_calendar(scale, rng):
+    cal = get_calendar(True, True, True)
+    starts = [datetime.date(2026, 1, 1) + datetime.timedelta(days=rng.randrange(3650)) for _ in range(256)]
+    for span in scale["spans"]:
+        state = {"i": 0}
+
+        def add(span=span, state=state):
+            state["i"] = (state["i"] + 1) & 255
+            return cal.add_workdays(starts[state["i"]], span)
+
+        def sub(span=span, state=state):
+            state["i"] = (state["i"] + 1) & 255
+            return cal.sub_workdays(starts[state["i"]], span)
+        yield "calendar.get_end", {"days": span}, add, 1
+        yield "calendar.get_start_from_end", {"days": span}, sub, 1
+    for n in scale["vector"]:
+        ords = [d.toordinal() for d in starts] * (n // len(starts) + 1)
+        ords, days = np.asarray(ords[:n], dtype=np.int64), np.asarray([rng.randint(1, 3650) for _ in range(n)])
+        yield "calendar.add_workdays_ord", {"n": n}, lambda o=ords, d=days: cal.add_workdays_ord(o, d), n
+
+
+def bench_excel(scale, rng):
+    for floors in scale["floors"]:
+        result = calculate_schedule(project_inputs(rng, floors, scale["basements"][-1]), False)
+        rows = [["工程名稱", "基準案"], ["建物類型", "住宅"], ["[ 進度分析 ]", ""]] + phase_report_rows(result.s_data())
+        yield "excel.report", {"floors": floors}, lambda rows=rows: write_workbook([Sheet(REPORT_SHEET, REPORT_COLUMNS, rows, REPORT_WIDTHS)]), 1
+
+
+def _fill_projects(n, rng, batch_size=5000):
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    suspend_search_index()
+    pending = None
+    for lo in range(0, n, batch_size):
+        rows = [[now, f"{rng.choice(NAMES)}{i}號案", f"{rng.choice(NAMES)}段{rng.randint(1, 999)}地號", f"{rng.choice(NAMES)}建築師事務所",
+                 rng.choice(B_TYPES), rng.choice(list(STRUCT_MAP_ABOVE)), rng.uniform(500, 8000), rng.randint(3, 60), rng.randint(0, 7),
+                 rng.randint(600, 3000), "2030-01-01", "順打工法"] for i in range(lo, min(lo + batch_size, n))]
+        if pending is not None: pending.result()
+        pending = submit_write(lambda conn, rows=rows: conn.executemany(SQL_INSERT_PROJECT, rows))
+    if pending is not None: pending.result()
+    rebuild_search_index()
+
+
+def bench_db(scale, rng, workdir):
+    for n in scale["db_rows"]:
+        history_db.configure(os.path.join(workdir, f"bench_{n}.db"))
+        _fill_projects(n, rng)
+        newest = search_projects("", limit=1)["id"].iloc[0]
+        yield "db.search_page", {"rows": n, "query": ""}, lambda: search_projects(""), 1
+        yield "db.search_page", {"rows": n, "query": "keyset"}, lambda: search_projects("", before_id=newest - n // 2), 1
+        for query in ("信義1", "大安", "建築師"):  # 3 字以上走 FTS，2 字走 LIKE
+            yield "db.search_page", {"rows": n, "query": query}, lambda q=query: search_projects(q), 1
+            yield "db.count", {"rows": n, "query": query}, lambda q=query: count_projects(q), 1
+    for n in scale["portfolio"]:
+        history_db.configure(os.path.join(workdir, f"portfolio_{n}.db"))
+        items = []
+        for i in range(n):
+            inp = project_inputs(rng, rng.randint(5, 40), rng.randint(1, 5))
+            result = calculate_schedule(inp, False)
+            items.append(({"project_name": f"組合{i}", "b_type": inp.b_type, "total_cal_days": result.cal_days}, inp, result, False))
+        submit_estimates(items).result()
+        yield "excel.portfolio", {"projects": n}, lambda: portfolio_xlsx(), n
+
+
+def run(scale_name="full", only=None, seed=20240601):
+    scale = SCALES[scale_name]
+    groups = [g for g in GROUPS if not only or g in only]
+    results = []
+    original_db = history_db.DB_NAME
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            for group in groups:
+                rng = random.Random(seed)
+                cases = bench_db(scale, rng, workdir) if group == "db" else globals()[f"bench_{group}"](scale, rng)
+                for name, params, fn, items in cases:
+                    number, samples = measure(fn, scale["repeat"], scale["min_time"])
+                    record = _record(name, params, number, samples, items)
+                    results.append(record)
+                    print(f"{case_key(record):<58} {record['median_s'] * 1e3:>12.4f} ms", file=sys.stderr)
+        finally: history_db.configure(original_db)
+    return results
+
+
+def _git_revision():
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo, capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, base, threshold=REGRESSION):
+    """依案例比對 median；回傳 (比對列, 退步案例數)"""
+    base_map = {case_key(r): r for r in base["results"]}
+    lines, regressions = [], 0
+    for r in current["results"]:
+        b = base_map.get(case_key(r))
+        if b is None: continue
+        ratio = r["median_s"] / b["median_s"] if b["median_s"] else float("inf")
+        mark = "慢" if ratio >= threshold else "快" if ratio <= 1 / threshold else ""
+        regressions += mark == "慢"
+        lines.append(f"{case_key(r):<58} {b['median_s'] * 1e3:>10.4f} → {r['median_s'] * 1e3:>10.4f} ms  ×{ratio:5.2f} {mark}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="工期引擎 / 工作日曆 / Excel / 資料庫 效能基準")
+    parser.add_argument("--quick", action="store_true", help="小規模快速跑一輪")
+    parser.add_argument("--only", help=f"只跑指定群組 (逗號分隔：{','.join(GROUPS)})")
+    parser.add_argument("-o", "--out", help="結果 JSON (預設 bench_<commit>.json)")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比對")
+    parser.add_argument("--threshold", type=float, default=REGRESSION, help="median 比值超過此值視為退步 (預設 1.2)")
+    args = parser.parse_args(argv)
+    only = set(args.only.split(",")) if args.only else None
+    if only and only - set(GROUPS): parser.error(f"未知群組: {', '.join(sorted(only - set(GROUPS)))}")
+
+    scale_name = "quick" if args.quick else "full"
+    revision = _git_revision()
+    report = {
+        "meta": {"revision": revision, "scale": scale_name, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "results": run(scale_name, only),
+    }
+    out = args.out or f"bench_{(revision or 'local').replace('-dirty', '')}.json"
+    with open(out, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"已寫入 {out} ({len(report['results'])} 個案例)", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: base = json.load(f)
+        lines, regressions = compare(report, base, args.threshold)
+        print(f"對照 {args.compare} ({base['meta'].get('revision')})", file=sys.stderr)
+        for line in lines: print(line, file=sys.stderr)
+        if regressions: return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
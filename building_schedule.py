@@ -0,0 +1,115 @@
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+
+from schedule_batch import batch_durations, inputs_to_columns
+from schedule_engine import schedule_nodes
+
+# ==========================================
+# 🏙️ 集合住宅分棟排程 (各棟向量化)
+# ==========================================
+# 開挖、地下結構等全案共用工項沿用引擎時間軸；地上結構以後各棟依自身樓層獨立計算
+# (不再套用每棟 +3% 的多棟係數)，各棟工期以 schedule_batch 的欄位運算一次算完。
+# - 錯開開工：第 k 棟地上結構可開工日 = 全案可開工日 + k × 錯開工作天
+# - 共用塔吊：需要塔吊的棟數多於台數時，依可開工順序每輪分配一次 (同輪各棟向量化)，
+#   塔吊於前一棟地上結構完成後拆移、重新安裝才可開工
+# - 啟用逐層循環時各棟依自身樓層 (屋突、轉換層) 決定外牆/機電進場
+# - 景觀、驗收為全案工項，接在各棟外牆/機電/裝修全部完成之後
+
+
+@dataclass(frozen=True, slots=True)
+class SiteSchedule:
+    final_finish: datetime.date
+    cal_days: int
+    eff_days: int
+    substructure_finish: datetime.date
+    landscape: tuple  # (開始, 完成)
+    inspection: tuple
+    buildings: tuple  # 各棟一列 dict
+
+    def rows(self):
+        return [dict(row) for row in self.buildings]
+
+
+def _floors(values):
+    # data_editor 新增列的空白格為 NaN
+    return np.nan_to_num(np.asarray(values, dtype=np.float64)).astype(np.int64)
+
+
+def building_durations(inp, is_reverse_method, floors_up, floors_roof):
+    """各棟工期 (工作天) 欄位運算：以全案輸入為底，各棟代入自身樓層、視為單棟"""
+    floors_up, floors_roof = _floors(floors_up), _floors(floors_roof)
+    n = len(floors_up)
+    cols = {name: values * n for name, values in inputs_to_columns([inp]).items()}
+    cols["calc_floors_struct"] = floors_up + floors_roof
+    cols["display_max_floor"] = floors_up
+    cols["building_count"] = np.ones(n, dtype=np.int64)
+    return batch_durations(cols, is_reverse_method, n)
+
+
+def _date(ordinal):
+    return datetime.date.fromordinal(int(ordinal))
+
+
+def schedule_buildings(inp, is_reverse_method, names, floors_up, floors_roof, stagger_days=0, crane_count=None):
+    """分棟排程；crane_count=None 表示每棟各有塔吊。回傳 SiteSchedule"""
+    names = [str(x) for x in names]
+    n = len(names)
+    if n == 0: raise ValueError("至少需要一棟")
+    nodes = schedule_nodes(inp, is_reverse_method)
+    cal = nodes["work_cal"]
+    add = cal.add_workdays_ord
+    d = building_durations(inp, is_reverse_method, floors_up, floors_roof)
+    d_body, d_tower, needs = d["d_struct_body"], d["d_tower"], d["needs_tower_crane"]
+
+    # 全案地上結構可開工日 (地下結構完成 / 逆打一樓版完成)，各棟依序錯開
+    p8_s_pre = nodes["t_below"]["p8_s_pre"].toordinal()
+    ready = add(np.full(n, p8_s_pre, dtype=np.int64), np.arange(n, dtype=np.int64) * max(int(stagger_days), 0))
+    tower_s = ready - 26
+    tower_e = add(tower_s, d_tower)
+    body_s = np.where(needs, np.maximum(ready, tower_e + 1), ready)
+    own_crane_start = body_s.copy()
+
+    crane_idx = np.flatnonzero(needs)
+    if crane_count and len(crane_idx) > int(crane_count):
+        c = int(crane_count)
+        crane_free = add(body_s[crane_idx[:c]], d_body[crane_idx[:c]])
+        for w in range(c, len(crane_idx), c):
+            wave = crane_idx[w:w + c]
+            # 最早空出的塔吊給最早可開工的棟
+            order = np.argsort(crane_free, kind="stable")[:len(wave)]
+            tower_s[wave] = np.maximum(tower_s[wave], crane_free[order] + 1)
+            tower_e[wave] = add(tower_s[wave], d_tower[wave])
+            body_s[wave] = np.maximum(ready[wave], tower_e[wave] + 1)
+            crane_free[order] = add(body_s[wave], d_body[wave])
+
+    body_e = add(body_s, d_body)
+    ext_s = add(body_s, d["lag_ext"]); ext_e = add(ext_s, d["d_ext_wall"])
+    mep_s = add(body_s, d["lag_mep"]); mep_e = add(mep_s, d["d_mep"])
+    fit_e = ext_e + 90
+
+    # 全案收尾
+    land_s = int(ext_e.max()) - 15
+    land_e = int(add(land_s, nodes["landscape"]))
+    insp_s = max(int(ext_e.max()), int(mep_e.max()), int(fit_e.max()), land_e) - 30
+    insp_e = int(add(insp_s, nodes["insp"]))
+    p7_e = nodes["t_below"]["p7_e"].toordinal()
+    final = max(p7_e, int(body_e.max()), int(ext_e.max()), int(mep_e.max()), int(fit_e.max()), land_e, insp_e)
+    cal_days = final - inp.start_date.toordinal()
+    eff_days = int(cal_days * (5/7 if inp.exclude_sat and inp.exclude_sun else 6/7))
+
+    floors = _floors(floors_up) + _floors(floors_roof)
+    buildings = tuple(
+        {
+            "棟別": names[i], "結構層數": int(floors[i]), "地上結構(天)": int(d_body[i]), "外牆(天)": int(d["d_ext_wall"][i]),
+            "塔吊": ("需要" if needs[i] else "免"), "等候塔吊(日曆天)": int(body_s[i] - own_crane_start[i]),
+            "地上結構開始": _date(body_s[i]), "地上結構完成": _date(body_e[i]), "外牆開始": _date(ext_s[i]), "外牆完成": _date(ext_e[i]),
+            "機電完成": _date(mep_e[i]) if d["d_mep"][i] > 0 else None, "裝修完成": _date(fit_e[i]) if d["d_fit_out"][i] > 0 else None,
+        }
+        for i in range(n)
+    )
+    return SiteSchedule(
+        final_finish=_date(final), cal_days=cal_days, eff_days=eff_days, substructure_finish=_date(p7_e),
+        landscape=(_date(land_s), _date(land_e)), inspection=(_date(insp_s), _date(insp_e)), buildings=buildings,
+    )
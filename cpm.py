@@ -0,0 +1,228 @@
+import datetime
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from schedule_engine import EXT_START_RATIO, MEP_START_RATIO, area_factors, calculate_schedule, floor_cycle, floor_lag
+from workday_calendar import get_calendar
+
+# ==========================================
+# 🧮 要徑法 (CPM) 排程引擎
+# ==========================================
+# 工項與相依關係 (FS/SS/FF/SF + 延時) 以資料定義，時間單位為「工作天序」(0 = 開工日)。
+# Kahn 拓撲排序後做一次順推 / 一次逆推，皆為 O(V+E)，數千個工項也只需毫秒級。
+
+DEP_TYPES = ("FS", "SS", "FF", "SF")
+
+
+@dataclass(frozen=True, slots=True)
+class Activity:
+    id: str
+    duration: int
+    name: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class Dependency:
+    pred: str
+    succ: str
+    type: str = "FS"
+    lag: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class CPMResult:
+    ids: tuple
+    names: tuple
+    duration: tuple
+    es: tuple
+    ef: tuple
+    ls: tuple
+    lf: tuple
+    total_float: tuple
+    free_float: tuple
+    project_duration: int
+    critical_path: tuple  # 要徑工項 id (依最早開始排序)
+
+    def rows(self):
+        return [
+            {"id": self.ids[i], "工項": self.names[i], "工期": self.duration[i], "ES": self.es[i], "EF": self.ef[i],
+             "LS": self.ls[i], "LF": self.lf[i], "總浮時": self.total_float[i], "自由浮時": self.free_float[i],
+             "要徑": self.total_float[i] == 0}
+            for i in range(len(self.ids))
+        ]
+
+
+def earliest_start(dep_type, lag, es_p, ef_p, d_s):
+    """前置工項排定後，後續工項最早開始的限制"""
+    if dep_type == "FS": return ef_p + lag
+    if dep_type == "SS": return es_p + lag
+    if dep_type == "FF": return ef_p + lag - d_s
+    return es_p + lag - d_s  # SF
+
+
+def _latest_finish(dep_type, lag, ls_s, lf_s, d_p):
+    """後續工項排定後，前置工項最晚完成的限制"""
+    if dep_type == "FS": return ls_s - lag
+    if dep_type == "SS": return ls_s - lag + d_p
+    if dep_type == "FF": return lf_s - lag
+    return lf_s - lag + d_p  # SF
+
+
+def topological_order(n, edges):
+    """Kahn 演算法；edges 為 (前置序, 後續序, ...)；有循環相依時丟 ValueError"""
+    indeg = [0] * n
+    out = [[] for _ in range(n)]
+    for e in edges:
+        out[e[0]].append(e)
+        indeg[e[1]] += 1
+    queue = deque(i for i in range(n) if indeg[i] == 0)
+    order = []
+    while queue:
+        i = queue.popleft()
+        order.append(i)
+        for e in out[i]:
+            indeg[e[1]] -= 1
+            if indeg[e[1]] == 0: queue.append(e[1])
+    if len(order) != n: raise ValueError("工項相依關係有循環，無法排程")
+    return order, out
+
+
+def compute_cpm(activities, dependencies):
+    """順推求 ES/EF、逆推求 LS/LF，回傳 CPMResult (總浮時 0 者為要徑)"""
+    index = {a.id: i for i, a in enumerate(activities)}
+    if len(index) != len(activities): raise ValueError("工項 id 重複")
+    dur = [int(a.duration) for a in activities]
+    edges = []
+    for dep in dependencies:
+        if dep.type not in DEP_TYPES: raise ValueError(f"未知的相依型式: {dep.type}")
+        if dep.pred not in index or dep.succ not in index: raise ValueError(f"相依關係指向不存在的工項: {dep.pred} → {dep.succ}")
+        edges.append((index[dep.pred], index[dep.succ], dep.type, int(dep.lag)))
+    n = len(activities)
+    order, out = topological_order(n, edges)
+
+    # 順推 (開工日為下限)
+    es = [0] * n
+    for i in order:
+        ef_i = es[i] + dur[i]
+        for _, s, t, lag in out[i]:
+            es[s] = max(es[s], earliest_start(t, lag, es[i], ef_i, dur[s]))
+    ef = [es[i] + dur[i] for i in range(n)]
+    project_duration = max(ef, default=0)
+
+    # 逆推 (專案完工日為上限)
+    lf = [project_duration] * n
+    for i in reversed(order):
+        for _, s, t, lag in out[i]:
+            lf[i] = min(lf[i], _latest_finish(t, lag, lf[s] - dur[s], lf[s], dur[i]))
+    ls = [lf[i] - dur[i] for i in range(n)]
+
+    total_float = [ls[i] - es[i] for i in range(n)]
+    free_float = []
+    for i in range(n):
+        slack = project_duration - ef[i]
+        for _, s, t, lag in out[i]: slack = min(slack, es[s] - earliest_start(t, lag, es[i], ef[i], dur[s]))
+        free_float.append(slack)
+    critical = sorted((i for i in range(n) if total_float[i] == 0), key=lambda i: (es[i], ef[i]))
+    return CPMResult(
+        ids=tuple(a.id for a in activities), names=tuple(a.name or a.id for a in activities), duration=tuple(dur),
+        es=tuple(es), ef=tuple(ef), ls=tuple(ls), lf=tuple(lf), total_float=tuple(total_float), free_float=tuple(free_float),
+        project_duration=project_duration, critical_path=tuple(activities[i].id for i in critical),
+    )
+
+
+def offsets_to_dates(start_date, offsets, calendar):
+    """工作天序 → 日期 (向量化)；0 為開工日"""
+    ords = calendar.add_workdays_ord(start_date.toordinal(), np.asarray(offsets, dtype=np.int64))
+    return [datetime.date.fromordinal(int(o)) for o in ords]
+
+
+# ==========================================
+# 🏗️ 本案工項網圖 (13 工項 + 塔吊)
+# ==========================================
+# 工期取自 calculate_schedule 的各工項天數；原時間軸的日曆天常數 (+1 天、-15 天、+90 天…) 依週休比例換成工作天。
+# 逆打的開挖天數已含「配合地下結構」的延長，不再另加 FF 關係 (否則與 SS 形成循環)。
+# 延時格式：整數 = 工作天；("cal", n) = 日曆天 n 換算；("ratio", r) = 前置工項工期 × r；
+# ("floor", r) = 逐層循環時第 r 比例層結構完成 (未啟用時同 ratio)；("area", n) = n × 面積係數
+
+PHASE_IDS = {
+    "1.前期": "prep", "2.拆除": "demo", "3.地改": "soil", "4.擋土壁": "retain", "5.支撐": "strut", "6.開挖": "excav",
+    "7.地下結構": "struct_below", "8.地上結構": "struct_body", "9.外牆": "ext_wall", "10.機電": "mep",
+    "11.裝修": "fit_out", "12.景觀": "landscape", "13.驗收": "insp", "7.5 塔吊": "tower",
+}
+
+NETWORK_COMMON = [
+    ("prep", "demo", "FS", ("cal", 1)),
+    ("demo", "soil", "FS", ("cal", 1)),
+    ("soil", "retain", "FS", ("cal", 1)),
+    ("retain", "strut", "FS", ("cal", 1)),
+    ("strut", "excav", "SS", 0),
+    ("struct_body", "ext_wall", "SS", ("floor", EXT_START_RATIO)),
+    ("struct_body", "mep", "SS", ("floor", MEP_START_RATIO)),
+    ("ext_wall", "fit_out", "FF", ("cal", 90)),
+    ("ext_wall", "landscape", "FS", ("cal", -15)),
+    ("ext_wall", "insp", "FS", ("cal", -30)),
+    ("mep", "insp", "FS", ("cal", -30)),
+    ("fit_out", "insp", "FS", ("cal", -30)),
+    ("landscape", "insp", "FS", ("cal", -30)),
+    ("tower", "struct_body", "FS", ("cal", 1)),
+]
+NETWORK_STANDARD = [
+    ("strut", "struct_below", "FS", ("cal", 1)),
+    ("excav", "struct_below", "FS", ("cal", 1)),
+    ("struct_below", "struct_body", "FS", ("cal", 1)),
+    ("struct_below", "tower", "FS", ("cal", -25)),
+]
+NETWORK_REVERSE = [
+    ("excav", "struct_below", "SS", ("area", 30)),
+    ("excav", "struct_body", "SS", ("area", 60)),
+    ("excav", "tower", "SS", ("area_cal", 60, -26)),
+]
+
+
+def workday_ratio(inp):
+    return (7 - int(inp.exclude_sat) - int(inp.exclude_sun)) / 7
+
+
+def resolve_lag(spec, pred_duration, ratio, area_multiplier, floor_offsets=None):
+    if isinstance(spec, int): return spec
+    kind = spec[0]
+    if kind == "floor": return floor_lag(floor_offsets, spec[1]) if floor_offsets is not None else int(pred_duration * spec[1])
+    if kind == "cal": return int(round(spec[1] * ratio))
+    if kind == "ratio": return int(pred_duration * spec[1])
+    if kind == "area": return int(spec[1] * area_multiplier)
+    if kind == "area_cal": return int(spec[1] * area_multiplier) + int(round(spec[2] * ratio))
+    raise ValueError(f"未知的延時格式: {spec}")
+
+
+def schedule_network(inp, is_reverse_method, result=None):
+    """由引擎結果建出本案 CPM 網圖 (activities, dependencies)"""
+    result = result or calculate_schedule(inp, is_reverse_method)
+    _, area_multiplier = area_factors(inp)
+    ratio = workday_ratio(inp)
+    floors = floor_cycle(inp)
+    activities = [Activity(PHASE_IDS[p.name], max(int(p.days), 0), p.name) for p in result.phases]
+    present = {a.id: a for a in activities}
+    spec = NETWORK_COMMON + (NETWORK_REVERSE if is_reverse_method else NETWORK_STANDARD)
+    dependencies = [
+        Dependency(pred, succ, dep_type, resolve_lag(lag, present[pred].duration, ratio, area_multiplier, floors))
+        for pred, succ, dep_type, lag in spec if pred in present and succ in present
+    ]
+    return activities, dependencies
+
+
+def analyze_schedule(inp, is_reverse_method, result=None):
+    """本案要徑分析：回傳 (CPMResult, 各工項日期表 list of dict)"""
+    activities, dependencies = schedule_network(inp, is_reverse_method, result)
+    cpm = compute_cpm(activities, dependencies)
+    cal = get_calendar(inp.exclude_sat, inp.exclude_sun, inp.exclude_cny)
+    es_dates = offsets_to_dates(inp.start_date, cpm.es, cal)
+    ef_dates = offsets_to_dates(inp.start_date, cpm.ef, cal)
+    ls_dates = offsets_to_dates(inp.start_date, cpm.ls, cal)
+    lf_dates = offsets_to_dates(inp.start_date, cpm.lf, cal)
+    table = []
+    for i, row in enumerate(cpm.rows()):
+        row.update({"最早開始": es_dates[i], "最早完成": ef_dates[i], "最晚開始": ls_dates[i], "最晚完成": lf_dates[i]})
+        table.append(row)
+    return cpm, table
@@ -0,0 +1,62 @@
+import heapq
+from dataclasses import dataclass
+
+# ==========================================
+# 🧱 連續壁單元多機排程 (平行成槽機)
+# ==========================================
+# 導溝、穩定液池等前置工項仍依序施作；主體、共構樁、扶壁、地中壁、壁樁各單元
+# 指派給多台抓斗/銑溝機平行施作：每個單元交給最早空出的機台 (heap)，
+# LPT 先排工期長的單元，List 依輸入順序。單台機具時等於原本逐項加總。
+
+PANEL_DAYS = {"連續壁主體": 3, "連續壁共構樁": 4, "無筋扶壁": 1, "地中壁": 1, "矩形壁樁": 4}  # 天/單元
+LPT = "最長工項優先 (LPT)"
+LIST = "依單元順序 (List)"
+RIG_METHODS = (LPT, LIST)
+
+
+@dataclass(frozen=True, slots=True)
+class PanelPlan:
+    kinds: tuple  # 各單元項目
+    rig: tuple  # 各單元指派的機台 (0 起)
+    start: tuple  # 相對成槽開始的工作天
+    finish: tuple
+    makespan: int
+    busy: tuple  # 各機台作業天
+    utilization: tuple  # 作業天 / 總工期
+
+    def rig_rows(self):
+        return [
+            {"機台": f"#{r + 1}", "單元數": sum(1 for x in self.rig if x == r), "作業天": self.busy[r], "使用率": f"{self.utilization[r]:.0%}"}
+            for r in range(len(self.busy))
+        ]
+
+
+def panel_units(counts):
+    """{項目: 單元數} → (各單元項目, 各單元天數)，依 PANEL_DAYS 順序展開"""
+    kinds, days = [], []
+    for kind, per_unit in PANEL_DAYS.items():
+        qty = max(int(counts.get(kind, 0) or 0), 0)
+        kinds += [kind] * qty
+        days += [per_unit] * qty
+    return kinds, days
+
+
+def schedule_panels(kinds, durations, rigs=1, method=LPT):
+    """平行機台排程 (各單元獨立)；回傳 PanelPlan"""
+    n = len(durations)
+    if len(kinds) != n: raise ValueError("單元項目與工期筆數不一致")
+    rigs = max(int(rigs), 1)
+    order = sorted(range(n), key=lambda i: (-durations[i], i)) if method == LPT else range(n)
+    free = [(0, r) for r in range(rigs)]
+    rig, start, finish = [0] * n, [0] * n, [0] * n
+    busy = [0] * rigs
+    for i in order:
+        t, r = heapq.heappop(free)
+        rig[i], start[i], finish[i] = r, t, t + durations[i]
+        busy[r] += durations[i]
+        heapq.heappush(free, (finish[i], r))
+    makespan = max(finish, default=0)
+    return PanelPlan(
+        kinds=tuple(kinds), rig=tuple(rig), start=tuple(start), finish=tuple(finish), makespan=makespan,
+        busy=tuple(busy), utilization=tuple(b / makespan if makespan else 0.0 for b in busy),
+    )
@@ -0,0 +1,118 @@
+import datetime
+import heapq
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from schedule_engine import area_factors, excavation_multiplier, schedule_nodes
+
+# ==========================================
+# 🚜 分區開挖排程 (各區體積 + 全案每日出土上限)
+# ==========================================
+# 分區開挖不再折算成加權平均深度：各區依自身深度求標準工期，產能 = 出土量 / 標準工期。
+# 同時開挖的作業面數有限，全案每日出土量受管制上限約束；以流量模型推進：
+# - 先開工的分區先取得其全部產能，剩餘出土額度才分給後開工者
+# - 作業面空出且尚有出土額度時，由 priority queue 取出下一區 (預設標準工期最長者優先)
+# - 事件只有「分區完成」，每次完成後重新分配額度，數百區也只需毫秒級
+
+EPS = 1e-9
+SOIL_PER_FLOOR_M = 3.5  # 同引擎：每層地下室 3.5 m
+BULKING = 1.25  # 鬆方係數
+ORDER_LONGEST = "標準工期最長優先"
+ORDER_INPUT = "依輸入順序"
+ZONE_ORDERS = (ORDER_LONGEST, ORDER_INPUT)
+
+
+@dataclass(frozen=True, slots=True)
+class Zone:
+    name: str
+    area_m2: float
+    depth_m: float
+
+
+@dataclass(frozen=True, slots=True)
+class ZoneSchedule:
+    names: tuple
+    volume: tuple  # 出土量 m³ (含鬆方)
+    std_days: tuple  # 單區不受出土管制的工期
+    start: tuple  # 工作天序 (0 = 開挖開始)
+    finish: tuple
+    start_dates: tuple
+    finish_dates: tuple
+    duration: int  # 全部分區完成的工作天
+    haul: tuple  # ((工作天序, 每日出土 m³), ...)，階梯曲線的轉折點
+
+    def rows(self):
+        return [
+            {"分區": self.names[i], "出土量(m³)": round(self.volume[i], 1), "標準工期": self.std_days[i], "開始": self.start[i],
+             "完成": self.finish[i], "開始日": self.start_dates[i], "完成日": self.finish_dates[i]}
+            for i in range(len(self.names))
+        ]
+
+
+def sequence_zones(volumes, rates, daily_limit=None, crews=None, priority=None):
+    """各區 (開始, 完成) 工作天 (浮點) 與出土曲線；rates = 各區最大每日出土，priority = 各區排序鍵 (小者先)"""
+    n = len(volumes)
+    if len(rates) != n: raise ValueError("分區出土量與產能筆數不一致")
+    cap = float(daily_limit) if daily_limit else math.inf
+    crews = max(int(crews), 1) if crews else max(n, 1)
+    start, finish = [0.0] * n, [0.0] * n
+    remaining = [float(v) for v in volumes]
+    queue = [(priority[i] if priority else i, i) for i in range(n) if remaining[i] > EPS and rates[i] > EPS]
+    heapq.heapify(queue)
+    active, haul = [], []
+    t = 0.0
+    while queue or active:
+        left = cap
+        alloc = {}
+        for i in active:
+            alloc[i] = min(rates[i], left)
+            left -= alloc[i]
+        while queue and len(active) < crews and left > EPS:
+            _, i = heapq.heappop(queue)
+            start[i] = t
+            active.append(i)
+            alloc[i] = min(rates[i], left)
+            left -= alloc[i]
+        haul.append((t, sum(alloc.values())))
+        dt = min(remaining[i] / alloc[i] for i in active)
+        t += dt
+        done = [i for i in active if remaining[i] / alloc[i] <= dt * (1 + EPS)]
+        for i in active: remaining[i] -= alloc[i] * dt
+        for i in done:
+            finish[i] = t
+            active.remove(i)
+    if n: haul.append((t, 0.0))
+    return start, finish, haul
+
+
+def _zone_std_days(depth_m, selected_wall, selected_support, area_multiplier):
+    # 同引擎標準開挖工期，以該區深度換算層數
+    return max(math.ceil(depth_m / SOIL_PER_FLOOR_M * 22 * excavation_multiplier(selected_wall, selected_support) * area_multiplier), 1)
+
+
+def plan_zone_excavation(inp, is_reverse_method, zones, crews=2, order=ORDER_LONGEST, nodes=None):
+    """分區開挖排程：zones = [Zone, ...]，開挖開始日取本案時間軸；回傳 ZoneSchedule"""
+    zones = [z for z in zones if z.area_m2 > 0 and z.depth_m > 0]
+    if not zones: raise ValueError("至少需要一個面積與深度大於 0 的分區")
+    nodes = nodes or schedule_nodes(inp, is_reverse_method)
+    _, area_multiplier = area_factors(inp)
+    volumes = [z.area_m2 * z.depth_m * BULKING for z in zones]
+    std_days = [_zone_std_days(z.depth_m, inp.selected_wall, inp.selected_support, area_multiplier) for z in zones]
+    rates = [v / d for v, d in zip(volumes, std_days)]
+    priority = [(-d, -v, i) for i, (d, v) in enumerate(zip(std_days, volumes))] if order == ORDER_LONGEST else None
+    daily_limit = inp.daily_soil_limit if inp.enable_soil_limit and inp.daily_soil_limit else None
+    start, finish, haul = sequence_zones(volumes, rates, daily_limit, crews, priority)
+
+    # 起訖換成整數工作天，全部分區日期一次換算
+    n = len(zones)
+    start_wd = np.floor(np.asarray(start) + EPS).astype(np.int64)
+    finish_wd = np.ceil(np.asarray(finish) - EPS).astype(np.int64)
+    ords = nodes["work_cal"].add_workdays_ord(nodes["t_below"]["p6_s"].toordinal(), np.concatenate((start_wd, finish_wd)))
+    dates = [datetime.date.fromordinal(int(o)) for o in ords]
+    return ZoneSchedule(
+        names=tuple(z.name for z in zones), volume=tuple(volumes), std_days=tuple(std_days),
+        start=tuple(start_wd.tolist()), finish=tuple(finish_wd.tolist()), start_dates=tuple(dates[:n]), finish_dates=tuple(dates[n:]),
+        duration=int(finish_wd.max()), haul=tuple((round(t, 3), round(m3, 3)) for t, m3 in haul),
+    )
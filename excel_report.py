@@ -0,0 +1,158 @@
+import hashlib
+import io
+import json
+import re
+from collections import namedtuple
+
+from history_db import iter_ranked_projects, load_phase_rows
+from schedule_cache import LRUCache
+
+# ==========================================
+# 📊 Excel 報表 (write-only 串流 + NamedStyle)
+# ==========================================
+# - 只在使用者要求時產生；同一份報表內容 (雜湊) 直接回傳快取的 bytes
+# - write-only 模式逐列寫出，多工作表大報表也不會整本留在記憶體
+# - 樣式以 NamedStyle 註冊一次，各儲存格只引用名稱
+# - 專案組合報表：由 SQLite 逐筆串流，每個專案一張工作表 + 依工期排名的總表
+# - openpyxl 於實際產生報表時才載入，不拖慢頁面冷啟動
+
+REPORT_SHEET = "詳細工期報告"
+REPORT_COLUMNS = ["項目", "數值/天數", "日期區間", "備註"]
+REPORT_WIDTHS = [30, 20, 30, 25]
+SUMMARY_SHEET = "專案組合總表"
+SUMMARY_COLUMNS = ["排名", "ID", "工程名稱", "地點", "設計單位", "建物類型", "地上層數", "地下層數", "工期(天)", "完工日", "工作表"]
+SUMMARY_WIDTHS = [8, 8, 30, 20, 25, 20, 10, 10, 12, 14, 30]
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FONT_NAME = "微軟正黑體"
+
+
+def _named_styles():
+    # 每本活頁簿各自註冊 (NamedStyle 綁定活頁簿，不可跨本共用)
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+    dark = PatternFill(fill_type="solid", start_color="2D2926", end_color="2D2926")
+    left = Alignment(horizontal="left", vertical="center")
+    return [
+        NamedStyle("rpt_normal", font=Font(name=FONT_NAME, size=11), alignment=left),
+        NamedStyle("rpt_header", font=Font(name=FONT_NAME, size=12, bold=True, color="FFB81C"), fill=dark,
+                   alignment=Alignment(horizontal="center", vertical="center")),
+        NamedStyle("rpt_total", font=Font(name=FONT_NAME, size=12, bold=True, color="FFB81C"), fill=dark, alignment=left),
+        NamedStyle("rpt_section", font=Font(name=FONT_NAME, size=11, bold=True),
+                   fill=PatternFill(fill_type="solid", start_color="EFEFEF", end_color="EFEFEF"), alignment=left),
+        NamedStyle("rpt_highlight", font=Font(name=FONT_NAME, size=12, bold=True, color="FF4438"),
+                   fill=PatternFill(fill_type="solid", start_color="FFF2CC", end_color="FFF2CC"), alignment=left),
+    ]
+
+
+# styled=True：套用詳細工期報告的段落/總結樣式；False：一般表格
+Sheet = namedtuple("Sheet", "name columns rows widths styled", defaults=(None, True))
+
+
+def _cell_style(value):
+    if value == "[ 總結結果 ]": return "rpt_total"
+    if value == "預估完工日期": return "rpt_highlight"
+    if isinstance(value, str) and "[" in value: return "rpt_section"
+    return "rpt_normal"
+
+
+def write_workbook(sheets, path=None):
+    """sheets: Sheet 的 iterable (本身與各表的列都可為 generator)；有 path 時寫檔，否則回傳 xlsx bytes"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    def _styled(ws, value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    wb = Workbook(write_only=True)
+    for style in _named_styles(): wb.add_named_style(style)
+    for sheet in sheets:
+        ws = wb.create_sheet(title=sheet.name[:31])
+        for idx, width in enumerate(sheet.widths or [], start=1): ws.column_dimensions[get_column_letter(idx)].width = width
+        ws.append([_styled(ws, name, "rpt_header") for name in sheet.columns])
+        n_cols = len(sheet.columns)
+        for row in sheet.rows:
+            values = list(row)[:n_cols]
+            values += [None] * (n_cols - len(values))
+            # 空白格不需樣式，直接寫 None 省去建立儲存格物件
+            ws.append([None if v is None or v == "" else _styled(ws, v, _cell_style(v) if sheet.styled else "rpt_normal") for v in values])
+        ws.close()  # 寫完即關閉該表的暫存檔寫入器，釋放緩衝，記憶體不隨工作表數成長
+    if path is not None:
+        wb.save(path)
+        return None
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def phase_report_rows(s_data, enable_date=True):
+    """進度分析段落：天數 > 0 的工項"""
+    rows = []
+    for item in s_data:
+        if item["天數"] > 0:
+            s_date = str(item['Start']) if enable_date else "未定"
+            e_date = str(item['Finish']) if enable_date else "未定"
+            rows.append([item["工項"], f"{item['天數']} 天", f"{s_date} ~ {e_date}", item.get('備註', '')])
+    return rows
+
+
+def report_key(rows, sheet_name=REPORT_SHEET):
+    text = json.dumps([sheet_name, rows], ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+REPORT_CACHE = LRUCache(maxsize=64)
+
+
+def cached_report_xlsx(rows, sheet_name=REPORT_SHEET, build=True):
+    """單頁工期報表 bytes；build=False 時只查快取 (未產生過回傳 None)"""
+    key = report_key(rows, sheet_name)
+    data = REPORT_CACHE.get(key)
+    if data is None and build:
+        data = write_workbook([Sheet(sheet_name, REPORT_COLUMNS, rows, REPORT_WIDTHS)])
+        REPORT_CACHE.put(key, data)
+    return data
+
+
+def _sheet_title(rank, name):
+    # 工作表名稱不可含 []:*?/\ 且最長 31 字；加排名前綴確保唯一
+    clean = re.sub(r"[\[\]:*?/\\]", "_", str(name or "未命名")).strip() or "未命名"
+    return f"{rank:03d}_{clean}"[:31]
+
+
+def project_report_rows(project, phase_rows):
+    """由資料庫紀錄組出與單案報表相同版面的列 (generator)"""
+    floors = f"地下 {project['floors_down'] or 0} B / 最高地上 {project['floors_up'] or 0} F"
+    area = f"{project['base_area']:,.2f} m²" if project["base_area"] is not None else ""
+    yield from [
+        ["工程名稱", project["project_name"]], ["地號位置", project["location"]], ["設計單位", project["design_unit"]],
+        ["[ 建築規模與條件 ]", ""], ["建物類型", project["b_type"]], ["地上結構", project["struct_above"]],
+        ["施工方式", project["note"]], ["基地面積", area], ["樓層規模", floors],
+        ["", ""], ["[ 進度分析 ]", ""],
+    ]
+    if not phase_rows: yield ["(未保存工項明細)", "", "", ""]
+    for _, phase, days, start, finish, note in phase_rows:
+        if days > 0: yield [phase, f"{days} 天", f"{start} ~ {finish}", note]
+    yield from [
+        ["", "", "", ""], ["[ 總結結果 ]", "", "", ""],
+        ["專案總日曆天數", f"{project['total_cal_days']} 天" if project["total_cal_days"] is not None else "", "", ""],
+        ["預估完工日期", project["final_finish_date"] or "", "", ""],
+    ]
+
+
+def _portfolio_sheets(query):
+    # 總表與各專案表各自串流一次查詢；兩次排序相同 (工期長到短、id)，排名一致
+    summary = (
+        [rank, p["id"], p["project_name"], p["location"], p["design_unit"], p["b_type"], p["floors_up"], p["floors_down"],
+         p["total_cal_days"], p["final_finish_date"], _sheet_title(rank, p["project_name"])]
+        for rank, p in enumerate(iter_ranked_projects(query), start=1)
+    )
+    yield Sheet(SUMMARY_SHEET, SUMMARY_COLUMNS, summary, SUMMARY_WIDTHS, styled=False)
+    for rank, p in enumerate(iter_ranked_projects(query), start=1):
+        yield Sheet(_sheet_title(rank, p["project_name"]), REPORT_COLUMNS, project_report_rows(p, load_phase_rows(p["id"])), REPORT_WIDTHS)
+
+
+def portfolio_xlsx(query="", path=None):
+    """專案組合報表：總表 (依工期排名) + 每專案一張詳細工期報告；query 同歷史資料庫搜尋"""
+    return write_workbook(_portfolio_sheets(query), path)
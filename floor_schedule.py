@@ -0,0 +1,54 @@
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+
+from schedule_engine import (
+    EXT_START_RATIO, MEP_START_RATIO, area_factors, base_days_per_floor, floor_cycle_offsets, floor_kinds, schedule_nodes, start_floor,
+)
+
+# ==========================================
+# 🏢 逐層結構排程 (各層開始/完成日)
+# ==========================================
+# 各層完成的累計工作天取自引擎的逐層循環陣列，開始 = 前一層完成；
+# 全部樓層的開始/完成以一次 add_workdays_ord 由地上結構開工日換算成日期。
+
+
+@dataclass(frozen=True, slots=True)
+class FloorSchedule:
+    labels: tuple  # 1F, 2F, …, R1, R2
+    kinds: tuple  # 標準層 / 轉換層 / 屋突層
+    cycle: tuple  # 各層工作天
+    start: tuple
+    finish: tuple
+    ext_start_floor: int  # 外牆於此層結構完成後進場
+    mep_start_floor: int
+
+    def rows(self):
+        return [
+            {"樓層": self.labels[i], "類型": self.kinds[i], "循環(天)": self.cycle[i], "開始": self.start[i], "完成": self.finish[i]}
+            for i in range(len(self.labels))
+        ]
+
+
+def floor_schedule(inp, is_reverse_method, nodes=None):
+    """地上結構逐層日期；未啟用逐層循環時仍以同一循環係數展開 (供比對)"""
+    nodes = nodes or schedule_nodes(inp, is_reverse_method)
+    offsets = nodes["floor_cycle"]
+    if offsets is None:
+        offsets = floor_cycle_offsets(inp.calc_floors_struct, inp.display_max_floor, inp.transfer_floors,
+                                      base_days_per_floor(inp.slab_type, inp.struct_above), area_factors(inp)[1], nodes["k_usage"])
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n = len(offsets)
+    transfer, roof = floor_kinds(inp.calc_floors_struct, inp.display_max_floor, inp.transfer_floors)
+    begin = np.concatenate(([0], offsets[:-1])) if n else offsets
+    body_s = nodes["t_body"][0].toordinal()
+    ords = nodes["work_cal"].add_workdays_ord(body_s, np.concatenate((begin, offsets)))
+    dates = [datetime.date.fromordinal(int(o)) for o in ords]
+    up = int(np.count_nonzero(~roof))
+    return FloorSchedule(
+        labels=tuple([f"{i}F" for i in range(1, up + 1)] + [f"R{i}" for i in range(1, n - up + 1)]),
+        kinds=tuple("屋突層" if r else "轉換層" if t else "標準層" for t, r in zip(transfer, roof)),
+        cycle=tuple((offsets - begin).tolist()), start=tuple(dates[:n]), finish=tuple(dates[n:]),
+        ext_start_floor=start_floor(n, EXT_START_RATIO), mep_start_floor=start_floor(n, MEP_START_RATIO),
+    )
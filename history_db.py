@@ -0,0 +1,389 @@
+import datetime
+import json
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import get_args
+
+import numpy as np
+
+from schedule_engine import Phase, ScheduleInputs
+
+# ==========================================
+# 💾 歷史資料庫存取層 (SQLite, WAL)
+# ==========================================
+# - 結構初始化每個行程只做一次
+# - 讀取：共用連線池 (借用/歸還)，不再每次 connect/close
+# - 寫入：單一寫入執行緒依序處理佇列，並行儲存不會遇到 "database is locked"
+# - SQL 皆為固定字串 + 參數，搭配 cached_statements 重複使用已編譯的陳述式
+
+DB_NAME = "construction_history_v2.db"
+POOL_SIZE = 8
+PAGE_SIZE = 50
+
+_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA foreign_keys=ON",
+]
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        save_date TEXT,
+        project_name TEXT,
+        location TEXT,
+        design_unit TEXT,
+        b_type TEXT,
+        struct_above TEXT,
+        base_area REAL,
+        floors_up INTEGER,
+        floors_down REAL,
+        total_cal_days INTEGER,
+        final_finish_date TEXT,
+        note TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS project_inputs (
+        project_id INTEGER PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+        is_reverse INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS project_phases (
+        id INTEGER PRIMARY KEY,
+        project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        seq INTEGER,
+        phase TEXT,
+        days INTEGER,
+        start TEXT,
+        finish TEXT,
+        note TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_phases_project ON project_phases(project_id, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_phases_phase_start ON project_phases(phase, start)",
+    "CREATE INDEX IF NOT EXISTS idx_phases_finish ON project_phases(finish)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_cal_days ON projects(total_cal_days)",
+]
+
+PROJECT_COLUMNS = ["save_date", "project_name", "location", "design_unit", "b_type", "struct_above", "base_area", "floors_up", "floors_down", "total_cal_days", "final_finish_date", "note"]
+SQL_INSERT_PROJECT = f"INSERT INTO projects ({', '.join(PROJECT_COLUMNS)}) VALUES ({', '.join('?' * len(PROJECT_COLUMNS))})"
+SQL_SELECT_PROJECTS = "SELECT * FROM projects ORDER BY id DESC"
+SQL_DELETE_PROJECT = "DELETE FROM projects WHERE id=?"
+
+# 完整輸入：ScheduleInputs 每個欄位一欄 (tuple 存 JSON、日期存 ISO 字串)，引擎新增欄位時自動 ALTER 補欄
+# 欄位不宣告型別 (無型別親和性)，300 與 300.0 原樣存回，重算時備註文字不變
+INPUT_FIELDS = fields(ScheduleInputs)
+INPUT_COLUMNS = [f.name for f in INPUT_FIELDS]
+SQL_INSERT_INPUTS = f"INSERT INTO project_inputs (project_id, is_reverse, {', '.join(INPUT_COLUMNS)}) VALUES ({', '.join('?' * (len(INPUT_COLUMNS) + 2))})"
+PHASE_COLUMNS = ["project_id", "seq", "phase", "days", "start", "finish", "note"]
+SQL_INSERT_PHASE = f"INSERT INTO project_phases ({', '.join(PHASE_COLUMNS)}) VALUES ({', '.join('?' * len(PHASE_COLUMNS))})"
+SQL_SELECT_PHASES = "SELECT seq, phase, days, start, finish, note FROM project_phases WHERE project_id=? ORDER BY seq"
+
+# 全文檢索：FTS5 trigram (中文名稱可直接子字串搜尋)，以觸發器與 projects 同步
+FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE projects_fts USING fts5(project_name, location, design_unit, content='projects', content_rowid='id', tokenize='trigram')",
+    "INSERT INTO projects_fts(projects_fts) VALUES('rebuild')",
+]
+FTS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS projects_fts_ai AFTER INSERT ON projects BEGIN
+        INSERT INTO projects_fts(rowid, project_name, location, design_unit) VALUES (new.id, new.project_name, new.location, new.design_unit);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS projects_fts_ad AFTER DELETE ON projects BEGIN
+        INSERT INTO projects_fts(projects_fts, rowid, project_name, location, design_unit) VALUES ('delete', old.id, old.project_name, old.location, old.design_unit);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS projects_fts_au AFTER UPDATE ON projects BEGIN
+        INSERT INTO projects_fts(projects_fts, rowid, project_name, location, design_unit) VALUES ('delete', old.id, old.project_name, old.location, old.design_unit);
+        INSERT INTO projects_fts(rowid, project_name, location, design_unit) VALUES (new.id, new.project_name, new.location, new.design_unit);
+    END''',
+]
+FTS_TRIGGER_NAMES = ["projects_fts_ai", "projects_fts_ad", "projects_fts_au"]
+SEARCH_COLUMNS = ["project_name", "location", "design_unit"]
+LIST_COLUMNS = ["id", "save_date", "project_name", "location", "design_unit", "b_type", "floors_up", "floors_down", "total_cal_days", "final_finish_date"]
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False, cached_statements=256)
+    for pragma in _PRAGMAS: conn.execute(pragma)
+    return conn
+
+
+class _Writer:
+    """單一寫入執行緒：每個工作在自己的交易中執行"""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="history-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        conn = _connect(self.path)
+        while True:
+            item = self._queue.get()
+            if item is None: break
+            fn, future = item
+            if not future.set_running_or_notify_cancel(): continue
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn)
+                conn.execute("COMMIT")
+                future.set_result(result)
+            except BaseException as e:
+                if conn.in_transaction: conn.execute("ROLLBACK")
+                future.set_exception(e)
+        conn.close()
+
+
+_lock = threading.Lock()
+_initialized = False
+_has_fts = False
+_writer = None
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+
+def configure(db_name):
+    """切換資料庫檔案 (批次工具/測試用)，會關閉既有連線"""
+    global DB_NAME, _initialized, _writer
+    with _lock:
+        if _writer is not None: _writer.stop()
+        _writer = None
+        while not _pool.empty(): _pool.get_nowait().close()
+        DB_NAME = db_name
+        _initialized = False
+
+
+def init_db():
+    """初始化資料庫 (每個行程只建一次結構)"""
+    global _initialized, _writer, _has_fts
+    if _initialized: return
+    with _lock:
+        if _initialized: return
+        conn = _connect(DB_NAME)
+        for ddl in SCHEMA: conn.execute(ddl)
+        _migrate_inputs(conn)
+        _has_fts = _init_fts(conn)
+        conn.close()
+        _writer = _Writer(DB_NAME)
+        _initialized = True
+
+
+def _migrate_inputs(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(project_inputs)")}
+    for f in INPUT_FIELDS:
+        if f.name not in existing: conn.execute(f"ALTER TABLE project_inputs ADD COLUMN {f.name}")
+
+
+def _encode_inputs(inp):
+    row = []
+    for f in INPUT_FIELDS:
+        value = getattr(inp, f.name)
+        if isinstance(value, tuple): value = json.dumps(value, ensure_ascii=False)
+        elif isinstance(value, datetime.date): value = value.isoformat()
+        elif isinstance(value, np.generic): value = value.item()
+        row.append(value)
+    return row
+
+
+def _decode_inputs(row):
+    kwargs = {}
+    for f in INPUT_FIELDS:
+        value = row.get(f.name)
+        if value is None:
+            # 非 Optional 欄位為 NULL 表示舊資料尚無此欄，沿用預設值
+            if type(None) in get_args(f.type): kwargs[f.name] = None
+            continue
+        if f.type is tuple: value = tuple(json.loads(value))
+        elif f.type is datetime.date: value = datetime.date.fromisoformat(value)
+        elif f.type is bool: value = bool(value)
+        kwargs[f.name] = value
+    return ScheduleInputs(**kwargs)
+
+
+def _init_fts(conn):
+    """建立全文索引 (首次建立時由既有資料重建)；SQLite 不支援 FTS5 時回傳 False"""
+    try:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name='projects_fts'").fetchone()
+        conn.execute("BEGIN IMMEDIATE")
+        if not exists:
+            for ddl in FTS_SCHEMA: conn.execute(ddl)
+        for ddl in FTS_TRIGGERS: conn.execute(ddl)
+        conn.execute("COMMIT")
+        return True
+    except sqlite3.OperationalError:
+        if conn.in_transaction: conn.execute("ROLLBACK")
+        return False
+
+
+@contextmanager
+def reader():
+    """從連線池借一條唯讀用連線"""
+    init_db()
+    try: conn = _pool.get_nowait()
+    except queue.Empty: conn = _connect(DB_NAME)
+    try:
+        yield conn
+    finally:
+        try: _pool.put_nowait(conn)
+        except queue.Full: conn.close()
+
+
+def submit_write(fn):
+    """排入寫入佇列，fn(conn) 於單一交易內執行；回傳 Future"""
+    init_db()
+    return _writer.submit(fn)
+
+
+def write(fn):
+    """submit_write 並等待結果"""
+    return submit_write(fn).result()
+
+
+def _project_row(data_dict):
+    return [datetime.datetime.now().strftime("%Y-%m-%d %H:%M")] + [data_dict.get(c) for c in PROJECT_COLUMNS[1:]]
+
+
+def save_to_db(data_dict):
+    row = _project_row(data_dict)
+    return write(lambda conn: conn.execute(SQL_INSERT_PROJECT, row).lastrowid)
+
+
+def _estimate_rows(data_dict, inp, result, is_reverse_method):
+    phase_rows = [(p.name, p.days, p.start.isoformat(), p.finish.isoformat(), p.note) for p in result.phases]
+    return _project_row(data_dict), [int(bool(is_reverse_method))] + _encode_inputs(inp), phase_rows
+
+
+def _insert_estimate(conn, row, inputs_row, phase_rows):
+    pid = conn.execute(SQL_INSERT_PROJECT, row).lastrowid
+    conn.execute(SQL_INSERT_INPUTS, [pid] + inputs_row)
+    conn.executemany(SQL_INSERT_PHASE, [(pid, seq) + r for seq, r in enumerate(phase_rows)])
+    return pid
+
+
+def save_estimate(data_dict, inp, result, is_reverse_method):
+    """摘要 + 完整輸入 + 各工項明細，同一交易寫入；回傳專案 id"""
+    rows = _estimate_rows(data_dict, inp, result, is_reverse_method)
+    return write(lambda conn: _insert_estimate(conn, *rows))
+
+
+def submit_estimates(items):
+    """多筆估算同一交易寫入 (批次工具用)：items = [(摘要, inp, result, is_reverse_method), ...]；回傳 Future (專案 id list)"""
+    rows = [_estimate_rows(*item) for item in items]
+    return submit_write(lambda conn: [_insert_estimate(conn, *r) for r in rows])
+
+
+def load_estimate(project_id):
+    """讀回已存估算 (不重算)：{"project", "inputs", "is_reverse", "phases"}；舊資料無明細時 inputs 為 None、phases 為空"""
+    with reader() as conn:
+        conn.row_factory = sqlite3.Row
+        try:
+            project = conn.execute("SELECT * FROM projects WHERE id=?", (project_id,)).fetchone()
+            if project is None: return None
+            inputs = conn.execute("SELECT * FROM project_inputs WHERE project_id=?", (project_id,)).fetchone()
+            phase_rows = conn.execute(SQL_SELECT_PHASES, (project_id,)).fetchall()
+        finally: conn.row_factory = None
+    phases = tuple(Phase(r["phase"], r["days"], datetime.date.fromisoformat(r["start"]), datetime.date.fromisoformat(r["finish"]), r["note"]) for r in phase_rows)
+    return {
+        "project": dict(project),
+        "inputs": _decode_inputs(dict(inputs)) if inputs else None,
+        "is_reverse": bool(inputs["is_reverse"]) if inputs else None,
+        "phases": phases,
+    }
+
+
+def load_from_db():
+    import pandas as pd
+    with reader() as conn:
+        return pd.read_sql_query(SQL_SELECT_PROJECTS, conn)
+
+
+def delete_from_db(project_id):
+    write(lambda conn: conn.execute(SQL_DELETE_PROJECT, (project_id,)))
+
+
+def suspend_search_index():
+    """大量匯入前暫停全文索引觸發器，匯入後務必呼叫 rebuild_search_index (一次重建比逐列維護快)"""
+    init_db()
+    if not _has_fts: return
+
+    def job(conn):
+        for name in FTS_TRIGGER_NAMES: conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    write(job)
+
+
+def rebuild_search_index():
+    """恢復觸發器並由 projects 重建全文索引"""
+    init_db()
+    if not _has_fts: return
+
+    def job(conn):
+        for ddl in FTS_TRIGGERS: conn.execute(ddl)
+        conn.execute(FTS_SCHEMA[1])
+    write(job)
+
+
+def _search_clause(query):
+    """回傳 (FROM/WHERE 片段, 參數)；3 字以上走 trigram 索引，較短的關鍵字退回 LIKE"""
+    query = (query or "").strip()
+    if not query: return "FROM projects p WHERE 1=1", []
+    if _has_fts and len(query) >= 3:
+        phrase = '"' + query.replace('"', '""') + '"'
+        return "FROM projects_fts f JOIN projects p ON p.id = f.rowid WHERE projects_fts MATCH ?", [phrase]
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    like = " OR ".join(f"p.{c} LIKE ? ESCAPE '\\'" for c in SEARCH_COLUMNS)
+    return f"FROM projects p WHERE ({like})", [pattern] * len(SEARCH_COLUMNS)
+
+
+def search_projects(query="", limit=PAGE_SIZE, before_id=None, columns=LIST_COLUMNS):
+    """名稱/地點/設計單位搜尋，依 id 由新到舊分頁 (keyset：傳入上一頁最小 id)"""
+    init_db()
+    clause, params = _search_clause(query)
+    if before_id is not None:
+        clause += " AND p.id < ?"; params.append(int(before_id))
+    sql = f"SELECT {', '.join('p.' + c for c in columns)} {clause} ORDER BY p.id DESC LIMIT ?"
+    import pandas as pd  # 頁面冷啟動 (登入/建庫) 不需 pandas，查詢時才載入
+    with reader() as conn:
+        return pd.read_sql_query(sql, conn, params=params + [int(limit)])
+
+
+def iter_ranked_projects(query="", batch_size=500):
+    """依 total_cal_days 由長到短逐筆產生專案 dict (fetchmany 串流，不整批載入)"""
+    init_db()
+    clause, params = _search_clause(query)
+    sql = f"SELECT p.id, {', '.join('p.' + c for c in PROJECT_COLUMNS)} {clause} ORDER BY p.total_cal_days DESC, p.id"
+    with reader() as conn:
+        cursor = conn.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        while rows := cursor.fetchmany(batch_size):
+            for row in rows: yield dict(zip(names, row))
+
+
+def load_phase_rows(project_id):
+    """單一專案工項明細 [(seq, phase, days, start, finish, note)]"""
+    with reader() as conn:
+        return conn.execute(SQL_SELECT_PHASES, (project_id,)).fetchall()
+
+
+def count_projects(query=""):
+    init_db()
+    clause, params = _search_clause(query)
+    with reader() as conn:
+        return conn.execute(f"SELECT count(*) {clause}", params).fetchone()[0]
@@ -0,0 +1,222 @@
+import argparse
+import csv
+import datetime
+import io
+import math
+import os
+import sys
+
+from history_db import PROJECT_COLUMNS, SQL_INSERT_PROJECT, configure, rebuild_search_index, submit_write, suspend_search_index
+
+# ==========================================
+# 📥 歷史專案批次匯入 (Excel / CSV 串流)
+# ==========================================
+# - Excel 以 openpyxl read_only 逐列讀取、CSV 以 csv 模組逐列讀取，不整檔載入記憶體
+# - 表頭依別名對應到 projects 欄位，逐列驗證；不合格的列略過並記錄原因
+# - 每 batch_size 列一個交易 executemany 寫入；寫入在寫入執行緒進行，與讀檔重疊
+# - 匯入期間暫停全文索引觸發器，結束後一次重建
+
+BATCH_SIZE = 5000
+MAX_ERRORS = 200  # 只保留前 N 筆錯誤明細
+
+COLUMN_ALIASES = {
+    "save_date": ["save_date", "儲存日期", "建檔日期"],
+    "project_name": ["project_name", "工程名稱", "專案名稱", "案名"],
+    "location": ["location", "地點", "地號位置", "基地位置"],
+    "design_unit": ["design_unit", "設計單位", "建築師"],
+    "b_type": ["b_type", "建物類型", "建物用途"],
+    "struct_above": ["struct_above", "地上結構"],
+    "base_area": ["base_area", "基地面積", "基地面積(m²)", "基地面積(m2)"],
+    "floors_up": ["floors_up", "地上層數", "地上樓層"],
+    "floors_down": ["floors_down", "地下層數", "地下樓層"],
+    "total_cal_days": ["total_cal_days", "工期(天)", "日曆天", "總工期"],
+    "final_finish_date": ["final_finish_date", "完工日", "預計完工日", "完工日期"],
+    "note": ["note", "備註"],
+}
+REQUIRED_COLUMNS = ["project_name"]
+_FLOAT_COLUMNS = {"base_area", "floors_down"}
+_INT_COLUMNS = {"floors_up", "total_cal_days"}
+_NUMERIC_COLUMNS = _FLOAT_COLUMNS | _INT_COLUMNS
+_DATE_COLUMNS = {"save_date", "final_finish_date"}
+
+
+def _norm_header(text):
+    return "".join(str(text or "").split()).lower().replace("（", "(").replace("）", ")")
+
+
+_ALIAS_LOOKUP = {_norm_header(alias): col for col, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+def map_columns(header):
+    """表頭 → {欄位: 欄位序}；缺必要欄位時丟 ValueError"""
+    mapping = {}
+    for idx, name in enumerate(header):
+        col = _ALIAS_LOOKUP.get(_norm_header(name))
+        if col and col not in mapping: mapping[col] = idx
+    missing = [c for c in REQUIRED_COLUMNS if c not in mapping]
+    if missing: raise ValueError(f"缺少必要欄位: {', '.join(missing)} (表頭: {list(header)})")
+    return mapping
+
+
+def _to_number(value, col):
+    if isinstance(value, str):
+        value = value.replace(",", "").replace("天", "").replace("m²", "").strip()
+        if not value: return None
+    number = float(value)
+    if not math.isfinite(number): raise ValueError(f"{col} 需為有限數值: {value}")
+    if col in _INT_COLUMNS:
+        if number != int(number): raise ValueError(f"{col} 應為整數: {value}")
+        return int(number)
+    return number
+
+
+def _to_date_text(value):
+    if isinstance(value, datetime.datetime): return value.date().isoformat()
+    if isinstance(value, datetime.date): return value.isoformat()
+    # 2028-01-05 / 2028/1/5 / 2028-01-05 00:00:00
+    y, m, d = (int(x) for x in str(value).strip().split()[0].replace("/", "-").split("-"))
+    return datetime.date(y, m, d).isoformat()
+
+
+def convert_row(values, mapping, now_text):
+    """單列 → projects 欄位順序的 list；資料不合格時丟 ValueError"""
+    row = []
+    for col in PROJECT_COLUMNS:
+        idx = mapping.get(col)
+        value = values[idx] if idx is not None and idx < len(values) else None
+        if isinstance(value, str) and not value.strip(): value = None
+        if value is None:
+            if col in REQUIRED_COLUMNS: raise ValueError(f"{col} 不可空白")
+            row.append(now_text if col == "save_date" else None)
+            continue
+        try:
+            if col in _NUMERIC_COLUMNS: value = _to_number(value, col)
+            elif col in _DATE_COLUMNS: value = _to_date_text(value)
+            else: value = str(value).strip()
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{col} 格式錯誤: {value!r}") from e
+        if col in _NUMERIC_COLUMNS and value is not None and value < 0: raise ValueError(f"{col} 不可為負: {value}")
+        row.append(value)
+    return row
+
+
+def _open_binary(source):
+    """路徑或檔案物件 (如 Streamlit UploadedFile) → (二進位串流, 檔名, 是否需關閉)"""
+    if isinstance(source, (str, os.PathLike)): return open(source, "rb"), os.fspath(source), True
+    return source, getattr(source, "name", ""), False
+
+
+def _file_size(stream):
+    pos = stream.tell()
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(pos)
+    return size
+
+
+def iter_excel(stream, sheet=None):
+    """逐列產生 (列號, header 或 values, 進度 0~1)；read_only 模式不載入整本活頁簿，空白列略過但不影響列號"""
+    from openpyxl import load_workbook
+    wb = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        total = ws.max_row or 0
+        for i, values in enumerate(ws.iter_rows(values_only=True), start=1):
+            if values and any(v is not None for v in values):
+                yield i, values, (i / total if total else None)
+    finally: wb.close()
+
+
+def iter_csv(stream, encoding="utf-8-sig"):
+    """逐列產生 (列號, values, 進度 0~1)；列號為該筆起始的實體行號 (含空白列、欄位內換行)，進度以已讀取位元組估算"""
+    size = _file_size(stream)
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    reader = csv.reader(text)
+    line_no = 1
+    try:
+        for values in reader:
+            if any(v.strip() for v in values):
+                yield line_no, values, (min(stream.tell() / size, 1.0) if size else None)
+            line_no = reader.line_num + 1
+    finally:
+        # 交還串流給呼叫端；串流已關閉時 detach 會丟錯 (如 generator 於回收時才結束)
+        if not stream.closed: text.detach()
+
+
+def import_projects(source, fmt=None, sheet=None, batch_size=BATCH_SIZE, progress=None, dry_run=False):
+    """串流匯入歷史專案；progress(已讀列數, 進度 0~1 或 None)。回傳匯入統計 dict"""
+    stream, name, should_close = _open_binary(source)
+    fmt = (fmt or os.path.splitext(name)[1].lstrip(".")).lower()
+    if fmt not in ("xlsx", "xlsm", "csv"): raise ValueError(f"不支援的檔案格式: {fmt or name}")
+    rows = iter_csv(stream) if fmt == "csv" else iter_excel(stream, sheet)
+    now_text = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    report = {"read": 0, "valid": 0, "inserted": 0, "skipped": 0, "errors": [], "columns": {}}
+    batch, pending = [], None
+
+    def wait():
+        nonlocal pending
+        if pending is not None: report["inserted"] += pending.result()
+        pending = None
+
+    def flush():
+        # 等上一批寫完再送下一批：最多一批在寫、一批在讀，記憶體固定
+        nonlocal batch, pending
+        wait()
+        report["valid"] += len(batch)
+        if batch and not dry_run:
+            rows_to_write = batch
+            pending = submit_write(lambda conn: conn.executemany(SQL_INSERT_PROJECT, rows_to_write).rowcount)
+        batch = []
+
+    if not dry_run: suspend_search_index()
+    try:
+        mapping = None
+        for line_no, values, fraction in rows:
+            if mapping is None:
+                mapping = map_columns(values)
+                report["columns"] = {col: str(values[idx]) for col, idx in mapping.items()}
+                continue
+            report["read"] += 1
+            try: batch.append(convert_row(values, mapping, now_text))
+            except ValueError as e:
+                report["skipped"] += 1
+                if len(report["errors"]) < MAX_ERRORS: report["errors"].append((line_no, str(e)))
+            if len(batch) >= batch_size:
+                flush()
+                if progress: progress(report["read"], fraction)
+        if mapping is None: raise ValueError("檔案沒有資料列")
+        flush()
+        wait()
+        if progress: progress(report["read"], 1.0)
+    finally:
+        rows.close()  # 先結束讀檔 generator 再關閉串流
+        # 寫入佇列依序執行，重建必在最後一批之後
+        if not dry_run: rebuild_search_index()
+        if should_close: stream.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次匯入歷史專案 (Excel/CSV) 至歷史資料庫")
+    parser.add_argument("files", nargs="+", help=".xlsx / .xlsm / .csv 檔案")
+    parser.add_argument("--db", help="資料庫檔案 (預設 construction_history_v2.db)")
+    parser.add_argument("--sheet", help="Excel 工作表名稱 (預設第一張)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="只驗證不寫入")
+    args = parser.parse_args(argv)
+    if args.db: configure(args.db)
+
+    def show(n, fraction):
+        pct = f" ({fraction:.0%})" if fraction is not None else ""
+        print(f"\r  已讀取 {n:,} 列{pct}", end="", file=sys.stderr, flush=True)
+
+    for path in args.files:
+        print(f"匯入 {path}", file=sys.stderr)
+        report = import_projects(path, sheet=args.sheet, batch_size=args.batch_size, progress=show, dry_run=args.dry_run)
+        print(file=sys.stderr)
+        print(f"{path}: 讀取 {report['read']:,} 列，有效 {report['valid']:,} 列，寫入 {report['inserted']:,} 列，略過 {report['skipped']:,} 列")
+        for line_no, msg in report["errors"][:20]: print(f"  第 {line_no} 列: {msg}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+# ==========================================
+# ⏱️ 重跑計時 / cProfile (選用)
+# ==========================================
+# - 側邊欄勾選後，每次重跑記錄各階段耗時 (同名階段累加)，未歸入任何階段的時間列為「其他」
+# - 每次重跑一行 JSON 附加到 perf_logs/rerun_timings.jsonl，之後可用 pandas.read_json(lines=True) 分析
+# - 按「下次重跑 cProfile」只擷取下一次重跑，統計存成 .prof 並在面板顯示前幾名
+# - 未啟用時 stage() 直接 yield，幾乎沒有額外負擔
+
+LOG_DIR = "perf_logs"
+LOG_FILE = "rerun_timings.jsonl"
+ENABLE_KEY = "perf_on"
+PROFILE_KEY = "perf_profile_next"
+OTHER = "其他"
+TOP_N = 25
+
+
+class RerunProfiler:
+    def __init__(self, session_state):
+        self.state = session_state
+        self.enabled = bool(session_state.get(ENABLE_KEY, False))
+        self.label = ""
+        self.stages = {}
+        self._open = None
+        self._panel = None
+        self._profile = None
+        self._finished = False
+        self._t0 = time.perf_counter()
+        if self.enabled and session_state.get(PROFILE_KEY):
+            session_state[PROFILE_KEY] = False
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def sidebar(self):
+        """側邊欄開關與結果面板 (結果於 finish() 時填入)"""
+        with st.sidebar.expander("⏱️ 重跑計時", expanded=self.enabled):
+            st.checkbox("記錄每次重跑各階段耗時", key=ENABLE_KEY, help=f"附加寫入 {LOG_DIR}/{LOG_FILE}")
+            if self.enabled:
+                st.button("下次重跑擷取 cProfile", key="perf_profile_btn", on_click=self.state.__setitem__, args=(PROFILE_KEY, True))
+                self._panel = st.empty()
+
+    def begin(self, name):
+        """開始一個階段 (會先結束尚未結束的階段)"""
+        if not self.enabled: return
+        self.end()
+        self._open = (name, time.perf_counter())
+
+    def end(self):
+        if self._open is None: return
+        name, t = self._open
+        self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t
+        self._open = None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        outer = self._open
+        if outer is not None: self.end()  # 巢狀時外層暫停，時間不重複計
+        self._open = (name, time.perf_counter())
+        try: yield
+        finally:
+            self.end()
+            if outer is not None: self._open = (outer[0], time.perf_counter())
+
+    def finish(self):
+        """結束本次重跑：寫入紀錄並顯示於面板 (st.stop() / st.rerun() 前也要呼叫)"""
+        if not self.enabled or self._finished: return
+        self._finished = True
+        self.end()
+        profile_text = profile_path = None
+        if self._profile is not None:
+            self._profile.disable()
+            try:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                profile_path = os.path.join(LOG_DIR, f"rerun_{datetime.datetime.now():%Y%m%d_%H%M%S}.prof")
+                self._profile.dump_stats(profile_path)
+            except OSError: profile_path = None
+            buffer = io.StringIO()
+            pstats.Stats(self._profile, stream=buffer).sort_stats("cumulative").print_stats(TOP_N)
+            profile_text = buffer.getvalue()
+        total = time.perf_counter() - self._t0
+        stages = dict(self.stages)
+        stages[OTHER] = max(total - sum(stages.values()), 0.0)
+        record = {"time": datetime.datetime.now().isoformat(timespec="milliseconds"), "page": self.label, "total_ms": round(total * 1e3, 2),
+                  "stages_ms": {k: round(v * 1e3, 2) for k, v in stages.items()}, "profile": profile_path}
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            with open(os.path.join(LOG_DIR, LOG_FILE), "a", encoding="utf-8") as f: f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError: pass  # 唯讀環境 (如雲端部署) 仍顯示面板
+        if self._panel is None: return
+        with self._panel.container():
+            st.caption(f"本次重跑 {record['total_ms']:,.1f} ms")
+            st.dataframe(stage_rows(record), hide_index=True, use_container_width=True)
+            if profile_text:
+                if profile_path: st.caption(f"cProfile 已存 {profile_path}")
+                st.code(profile_text, language=None)
+
+
+def stage_rows(record):
+    """紀錄 → [{階段, 毫秒, 比例}]，耗時長的在前"""
+    total = record["total_ms"] or 1.0
+    return [{"階段": k, "毫秒": v, "比例": f"{v / total:.0%}"} for k, v in sorted(record["stages_ms"].items(), key=lambda kv: -kv[1])]
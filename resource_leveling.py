@@ -0,0 +1,220 @@
+import heapq
+import math
+from dataclasses import dataclass
+from itertools import product
+
+from cpm import (
+    NETWORK_COMMON, NETWORK_REVERSE, NETWORK_STANDARD, PHASE_IDS, Activity, Dependency,
+    compute_cpm, earliest_start, offsets_to_dates, resolve_lag, topological_order, workday_ratio,
+)
+from schedule_engine import area_factors, calculate_schedule, floor_cycle, soil_volume_m3, standard_excavation_days
+from workday_calendar import get_calendar
+
+# ==========================================
+# 🏗️ 資源平衡排程 (塔吊 / 每日出土量)
+# ==========================================
+# 資源為固定容量 (塔吊台數、每日可運棄 m³)，工項在工期內持續佔用固定用量。
+# 事件驅動的平行排程：heap 依時間取出「完工釋放資源」與「前置條件滿足」事件，
+# 每個決策時點依 CPM 最晚開始 (小者優先) 把可開工且資源足夠的工項排入；
+# 資源只在完工時釋放，等待中的工項只需在下一個事件時點重新檢查。
+
+EPS = 1e-9
+
+
+@dataclass(frozen=True, slots=True)
+class Resource:
+    id: str
+    capacity: float
+    name: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class LevelingResult:
+    ids: tuple
+    names: tuple
+    duration: tuple
+    start: tuple
+    finish: tuple
+    delay: tuple  # 相對 CPM 最早開始延後的工作天
+    project_duration: int
+    cpm_duration: int  # 不受資源限制時的總工期
+    usage: tuple  # ((工作天序, {資源: 使用量}), ...)，階梯曲線的轉折點
+
+    def rows(self):
+        return [
+            {"id": self.ids[i], "工項": self.names[i], "工期": self.duration[i], "開始": self.start[i],
+             "完成": self.finish[i], "延後": self.delay[i]}
+            for i in range(len(self.ids))
+        ]
+
+
+def level_resources(activities, dependencies, resources, demands, priority=None):
+    """資源受限排程；demands = {工項 id: {資源 id: 用量}}，priority = {工項 id: 排序鍵} (預設 CPM 最晚開始)"""
+    cpm = compute_cpm(activities, dependencies)  # 同時檢查 id / 相依關係 / 循環
+    index = {a.id: i for i, a in enumerate(activities)}
+    n = len(activities)
+    dur = list(cpm.duration)
+    cap = {r.id: float(r.capacity) for r in resources}
+    need = [{} for _ in range(n)]
+    for aid, req in demands.items():
+        if aid not in index: raise ValueError(f"資源需求指向不存在的工項: {aid}")
+        for rid, units in req.items():
+            if rid not in cap: raise ValueError(f"未定義的資源: {rid}")
+            if units > cap[rid] + EPS: raise ValueError(f"{aid} 需要 {rid} {units:g}，超過容量 {cap[rid]:g}")
+            if units > 0 and dur[index[aid]] > 0: need[index[aid]][rid] = float(units)
+    key = [priority[a.id] if priority else (cpm.ls[i], cpm.es[i], i) for i, a in enumerate(activities)]
+    edges = [(index[d.pred], index[d.succ], d.type, int(d.lag)) for d in dependencies]
+    _, out = topological_order(n, edges)
+
+    remaining = [0] * n
+    for e in edges: remaining[e[1]] += 1
+    est = [0] * n
+    start = [0] * n
+    used = {rid: 0.0 for rid in cap}
+    usage = []
+    # 事件 (時間, 種類, 工項序)：種類 0 = 完工釋放資源 (同時點先處理)、1 = 前置條件滿足
+    events = []
+    ready = []
+
+    def release(i, t):
+        # 工項 i 已排定：推算後續最早開始；不用資源的後續工項直接依最早開始排定 (同 CPM 順推)，
+        # 需要資源的排入事件佇列 (已到時點者於同一時點再決策一輪)
+        stack = [i]
+        while stack:
+            p = stack.pop()
+            for _, s, dep_type, lag in out[p]:
+                est[s] = max(est[s], earliest_start(dep_type, lag, start[p], start[p] + dur[p], dur[s]))
+                remaining[s] -= 1
+                if remaining[s]: continue
+                if not need[s]:
+                    start[s] = est[s]
+                    stack.append(s)
+                else: heapq.heappush(events, (max(est[s], t), 1, s))
+
+    for i in [i for i in range(n) if remaining[i] == 0]:
+        if need[i]: heapq.heappush(events, (0, 1, i))
+        else: release(i, 0)
+    while events:
+        t = events[0][0]
+        while events and events[0][0] == t:
+            _, kind, i = heapq.heappop(events)
+            if kind == 0:
+                for rid, units in need[i].items(): used[rid] -= units
+            else: heapq.heappush(ready, (key[i], i))
+        waiting = []
+        while ready:
+            # 資源全數用罄時其餘工項都排不進，不必逐一檢查
+            if all(used[rid] >= cap[rid] - EPS for rid in cap): break
+            item = heapq.heappop(ready)
+            i = item[1]
+            if any(used[rid] + units > cap[rid] + EPS for rid, units in need[i].items()):
+                waiting.append(item)
+                continue
+            start[i] = t
+            for rid, units in need[i].items(): used[rid] += units
+            heapq.heappush(events, (t + dur[i], 0, i))
+            release(i, t)
+        for item in waiting: heapq.heappush(ready, item)
+        if usage and usage[-1][0] == t: usage.pop()
+        if not usage or usage[-1][1] != used: usage.append((t, {rid: round(v, 6) for rid, v in used.items()}))
+
+    finish = [start[i] + dur[i] for i in range(n)]
+    return LevelingResult(
+        ids=cpm.ids, names=cpm.names, duration=cpm.duration, start=tuple(start), finish=tuple(finish),
+        delay=tuple(start[i] - cpm.es[i] for i in range(n)), project_duration=max(finish, default=0),
+        cpm_duration=cpm.project_duration, usage=tuple(usage),
+    )
+
+
+# ==========================================
+# 🏙️ 本案網圖依棟展開 + 資源需求
+# ==========================================
+# 開挖、地下結構、地上結構、外牆、機電逐棟展開，其餘為全案工項。
+# 地上結構/外牆/機電工期依各棟結構層數對最高棟比例縮放；各棟地上結構各佔用 1 台塔吊。
+# 逐層循環的外牆/機電進場層只適用與本案相同層數的棟，其餘棟依工期比例。
+# 各棟開挖區以標準工期同時進行，出土量平均分攤，受每日出土上限 (啟用土方管制時) 約束。
+
+CRANE = "crane"
+HAUL = "haul_m3"
+RESOURCE_LABELS = {CRANE: "塔吊 (台)", HAUL: "出土 (m³/日)"}
+BUILDING_PHASES = ("excav", "struct_below", "struct_body", "ext_wall", "mep")
+FLOOR_SCALED_PHASES = ("struct_body", "ext_wall", "mep")
+
+
+def project_resource_network(inp, is_reverse_method, buildings=None, crane_count=1, result=None):
+    """buildings = [(棟名, 結構層數), ...]；回傳 (activities, dependencies, resources, demands)"""
+    result = result or calculate_schedule(inp, is_reverse_method)
+    _, area_multiplier = area_factors(inp)
+    ratio = workday_ratio(inp)
+    if not buildings:
+        buildings = [(f"第{b + 1}棟", inp.calc_floors_struct) for b in range(max(int(inp.building_count), 1))]
+    floors = [max(int(f or 0), 0) for _, f in buildings]
+    top = max(max(floors), 1)
+    multi = len(buildings) > 1
+    cycle = floor_cycle(inp)
+    floor_offsets = {f"struct_body@{b}": cycle for b, f in enumerate(floors, start=1) if f == inp.calc_floors_struct}
+    phases = {PHASE_IDS[p.name]: (max(int(p.days), 0), p.name) for p in result.phases}
+
+    haul_cap = inp.daily_soil_limit if inp.enable_soil_limit and inp.daily_soil_limit else None
+    d_zone = standard_excavation_days(inp, area_multiplier)
+    zone_m3 = soil_volume_m3(inp) / len(buildings)
+    zone_rate = zone_m3 / d_zone if d_zone > 0 else 0.0
+    if haul_cap and zone_rate > haul_cap:  # 單區即超過上限：該區以上限速率拉長工期
+        d_zone = math.ceil(zone_m3 / haul_cap)
+        zone_rate = zone_m3 / d_zone
+
+    activities, demands, dur = [], {}, {}
+    for pid, (days, name) in phases.items():
+        if pid not in BUILDING_PHASES:
+            activities.append(Activity(pid, days, name))
+            dur[pid] = days
+            continue
+        for b, ((b_name, _), f) in enumerate(zip(buildings, floors), start=1):
+            aid = f"{pid}@{b}"
+            d = days
+            if pid == "excav" and days > 0: d = d_zone
+            elif pid in FLOOR_SCALED_PHASES: d = math.ceil(days * f / top)
+            activities.append(Activity(aid, d, f"{name} - {b_name}" if multi else name))
+            dur[aid] = d
+            if pid == "excav" and haul_cap and zone_rate > 0: demands[aid] = {HAUL: zone_rate}
+            if pid == "struct_body" and "tower" in phases: demands[aid] = {CRANE: 1}
+
+    def expand(pid):
+        return [f"{pid}@{b}" for b in range(1, len(buildings) + 1)] if pid in BUILDING_PHASES else [pid]
+
+    dependencies = []
+    for pred, succ, dep_type, lag in NETWORK_COMMON + (NETWORK_REVERSE if is_reverse_method else NETWORK_STANDARD):
+        if pred not in phases or succ not in phases: continue
+        # 同為逐棟工項時只連同一棟，否則全案工項與各棟兩兩相連
+        pairs = zip(expand(pred), expand(succ)) if pred in BUILDING_PHASES and succ in BUILDING_PHASES else product(expand(pred), expand(succ))
+        dependencies += [Dependency(p, s, dep_type, resolve_lag(lag, dur[p], ratio, area_multiplier, floor_offsets.get(p))) for p, s in pairs]
+
+    resources = []
+    if "tower" in phases: resources.append(Resource(CRANE, max(int(crane_count), 1), RESOURCE_LABELS[CRANE]))
+    if haul_cap: resources.append(Resource(HAUL, float(haul_cap), RESOURCE_LABELS[HAUL]))
+    return activities, dependencies, resources, demands
+
+
+def level_project(inp, is_reverse_method, buildings=None, crane_count=1, result=None):
+    """本案資源平衡排程：回傳 (LevelingResult, 各工項日期表 list of dict)"""
+    activities, dependencies, resources, demands = project_resource_network(inp, is_reverse_method, buildings, crane_count, result)
+    leveled = level_resources(activities, dependencies, resources, demands)
+    cal = get_calendar(inp.exclude_sat, inp.exclude_sun, inp.exclude_cny)
+    start_dates = offsets_to_dates(inp.start_date, leveled.start, cal)
+    finish_dates = offsets_to_dates(inp.start_date, leveled.finish, cal)
+    table = []
+    for i, row in enumerate(leveled.rows()):
+        row.update({"開始日": start_dates[i], "完成日": finish_dates[i]})
+        table.append(row)
+    return leveled, table
+
+
+def usage_rows(inp, leveled):
+    """資源使用階梯曲線 → [{"日期", "資源", "使用量"}, ...]"""
+    if not leveled.usage: return []
+    cal = get_calendar(inp.exclude_sat, inp.exclude_sun, inp.exclude_cny)
+    dates = offsets_to_dates(inp.start_date, [t for t, _ in leveled.usage], cal)
+    return [
+        {"日期": d, "資源": RESOURCE_LABELS.get(rid, rid), "使用量": units}
+        for d, (_, used) in zip(dates, leveled.usage) for rid, units in used.items()
+    ]
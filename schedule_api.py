@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_runner import build_inputs, parse_record
+from schedule_engine import LiteInputs, calculate_lite, calculate_schedule
+
+# ==========================================
+# 🌐 工期估算 HTTP JSON API (本機服務)
+# ==========================================
+# GET  /health           服務狀態
+# POST /pro              單案估算 (欄位同 Pro 表單，可用表單標籤或 ScheduleInputs 欄位名)
+# POST /compare          順打 vs 逆打 比較 (施工方式可省略)
+# POST /lite             快速估算 (純工作天)
+# POST /batch            {"projects": [...]} 多案估算，逐案回傳結果或錯誤
+# - HTTP/1.1 keep-alive：每個連線一個執行緒，回應一律帶 Content-Length
+# - 運算交給工作行程池 (--workers，預設 CPU 核心數)；1 = 在連線執行緒內直接計算
+
+MAX_BODY = 8 * 1024 * 1024
+BATCH_CHUNK = 50
+COMPARE_METHOD = "順打工法"  # 比較模式不需施工方式，僅供必要欄位檢查
+LITE_FIELDS = {"floors_up": int, "floors_down": int, "struct_above": str, "base_area_m2": float, "b_type": str, "method": str,
+               "has_old_building": bool}
+LITE_MIN = {"floors_up": 1, "floors_down": 0, "base_area_m2": 10.0}  # 同 Lite 表單下限
+
+
+def _result_json(result, is_reverse):
+    return {
+        "is_reverse": is_reverse, "eff_days": result.eff_days, "cal_days": result.cal_days, "final_finish": result.final_finish.isoformat(),
+        "phases": [{"name": p.name, "days": p.days, "start": p.start.isoformat(), "finish": p.finish.isoformat(), "note": p.note}
+                   for p in result.phases],
+        "key_metrics": result.key_metrics(),
+    }
+
+
+def estimate_pro(record):
+    inp, is_reverse = build_inputs(parse_record(record))
+    return _result_json(calculate_schedule(inp, is_reverse), is_reverse)
+
+
+def estimate_compare(record):
+    form = parse_record(record)
+    form.setdefault("method", COMPARE_METHOD)
+    inp, _ = build_inputs(form)
+    std, rev = calculate_schedule(inp, False), calculate_schedule(inp, True)
+    diff = {k: rev.key_metrics()[k] - std.key_metrics()[k] for k in std.key_metrics()}
+    return {"standard": _result_json(std, False), "reverse": _result_json(rev, True), "cal_days_diff": rev.cal_days - std.cal_days,
+            "key_metrics_diff": diff}
+
+
+def lite_inputs(record):
+    """JSON → LiteInputs；未給的欄位用 Lite 表單預設值"""
+    unknown = set(record) - set(LITE_FIELDS)
+    if unknown: raise ValueError(f"未知欄位: {', '.join(sorted(unknown))}")
+    values = {}
+    for key, kind in LITE_FIELDS.items():
+        if key not in record: continue
+        value = record[key]
+        if kind is bool:
+            if not isinstance(value, bool): raise ValueError(f"{key} 應為 true/false")
+        elif kind is str:
+            if not isinstance(value, str): raise ValueError(f"{key} 應為字串")
+        else:
+            if isinstance(value, bool) or not isinstance(value, (int, float)): raise ValueError(f"{key} 應為數字")
+            if kind is int and value != int(value): raise ValueError(f"{key} 應為整數")
+            value = kind(value)
+            if value < LITE_MIN[key]: raise ValueError(f"{key} 不可小於 {LITE_MIN[key]}")
+        values[key] = value
+    return LiteInputs(**values)
+
+
+def estimate_lite(record):
+    result = calculate_lite(lite_inputs(record))
+    return {"total_days": result.total_days, "wall_type": result.wall_type, "tasks": result.rows()}
+
+
+def _estimate_many(records):
+    out = []
+    for record in records:
+        try: out.append({"ok": True, "result": estimate_pro(record)})
+        except ValueError as e: out.append({"ok": False, "error": str(e)})
+    return out
+
+
+class ScheduleServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        super().__init__(address, ScheduleHandler)
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args):
+        return self.pool.submit(fn, *args).result() if self.pool else fn(*args)
+
+    def run_chunks(self, fn, items, size):
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        if not self.pool: return [x for chunk in chunks for x in fn(chunk)]
+        return [x for part in self.pool.map(fn, chunks) for x in part]
+
+    def count(self):
+        with self._lock: self.requests += 1
+
+    def server_close(self):
+        super().server_close()
+        if self.pool: self.pool.shutdown(cancel_futures=True)
+
+
+class ScheduleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # 標頭與內容分兩次寫出，避免 keep-alive 下每個回應等 40ms 延遲確認
+    server_version = "ScheduleAPI/1.0"
+    quiet = False
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        # 內容須讀完，keep-alive 連線才能接著處理下一個請求；長度不合法或過大時不讀，回應後關閉連線
+        try: length = int(self.headers.get("Content-Length") or 0)
+        except ValueError: length = -1
+        if length < 0:
+            self.close_connection = True
+            raise ValueError(f"Content-Length 格式錯誤: {self.headers.get('Content-Length')}")
+        if length > MAX_BODY:
+            self.close_connection = True
+            return None
+        return self.rfile.read(length) if length else b""
+
+    def log_message(self, format, *args):
+        if not self.quiet: super().log_message(format, *args)
+
+    def do_GET(self):
+        self.server.count()
+        if self.path.split("?")[0] != "/health": return self._send(404, {"error": f"未知路徑: {self.path}"})
+        self._send(200, {"status": "ok", "workers": self.server.workers, "requests": self.server.requests,
+                         "uptime_s": round(time.time() - self.server.started, 1)})
+
+    def do_POST(self):
+        self.server.count()
+        path = self.path.split("?")[0]
+        routes = {"/pro": estimate_pro, "/compare": estimate_compare, "/lite": estimate_lite}
+        try: raw = self._read_body()
+        except ValueError as e: return self._send(400, {"error": str(e)})
+        if raw is None: return self._send(413, {"error": f"請求內容超過 {MAX_BODY // 1024 // 1024} MB"})
+        if path not in routes and path != "/batch": return self._send(404, {"error": f"未知路徑: {path}"})
+        try:
+            body = json.loads(raw or b"{}")
+            if path == "/batch":
+                projects = body.get("projects") if isinstance(body, dict) else body
+                if not isinstance(projects, list) or not all(isinstance(p, dict) for p in projects):
+                    raise ValueError("projects 應為物件陣列")
+                results = self.server.run_chunks(_estimate_many, projects, BATCH_CHUNK)
+                return self._send(200, {"count": len(results), "errors": sum(not r["ok"] for r in results), "results": results})
+            if not isinstance(body, dict): raise ValueError("請求內容應為 JSON 物件")
+            self._send(200, self.server.run(routes[path], body))
+        except json.JSONDecodeError as e: self._send(400, {"error": f"JSON 格式錯誤: {e}"})
+        except ValueError as e: self._send(400, {"error": str(e)})
+        except Exception as e:  # 引擎未預期的錯誤：回 500，連線照常可用
+            self.log_error("%s %s: %r", self.command, path, e)
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="工期估算 HTTP JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="工作行程數 (預設 CPU 核心數；1 = 不開行程池)")
+    parser.add_argument("--quiet", action="store_true", help="不輸出逐筆存取紀錄")
+    args = parser.parse_args(argv)
+    ScheduleHandler.quiet = args.quiet
+    server = ScheduleServer((args.host, args.port), args.workers)
+    # SIGTERM 同 Ctrl+C：收掉工作行程 (fork 出的行程會帶著監聽 socket)
+    signal.signal(signal.SIGTERM, _interrupt)
+    print(f"listening on http://{args.host}:{server.server_port} ({server.workers} workers)", file=sys.stderr)
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import datetime
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+
+from schedule_engine import (
+    ScheduleInputs, STRUCT_MAP_ABOVE, USAGE_FACTORS, EXT_WALL_MAP, WALL_FACTORS, SUPPORT_FACTORS,
+    EXT_START_RATIO, MEP_START_RATIO, TRANSFER_CYCLE_FACTOR, ROOF_CYCLE_FACTOR,
+)
+from workday_calendar import get_calendar
+
+# ==========================================
+# 📊 批次情境運算 (欄位向量化)
+# ==========================================
+# 與 schedule_engine.calculate_schedule 相同邏輯，但每個輸入都是一整欄：
+# 字串條件只對「不重複值」判斷一次再展開，日期以日序陣列經工作日曆一次換算。
+# 除 ScheduleInputs 欄位外另接受兩個覆蓋欄 (直接代入係數，如風險模擬的抽樣值)：
+# - base_days_per_floor：地上結構標準層 天/層，取代依樓版型式/地上結構查表的值
+# - days_per_floor_bd：地下結構 天/層 (未給時為 45)
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_INPUT_FIELDS = {f.name: f for f in fields(ScheduleInputs)}
+
+PHASE_KEYS = ["prep", "demo", "soil", "retain", "strut", "excav", "struct_below", "struct_body", "ext_wall", "mep", "fit_out", "landscape", "insp", "tower"]
+PHASE_NAMES = {
+    "prep": "1.前期", "demo": "2.拆除", "soil": "3.地改", "retain": "4.擋土壁", "strut": "5.支撐", "excav": "6.開挖",
+    "struct_below": "7.地下結構", "struct_body": "8.地上結構", "ext_wall": "9.外牆", "mep": "10.機電",
+    "fit_out": "11.裝修", "landscape": "12.景觀", "insp": "13.驗收", "tower": "7.5 塔吊",
+}
+
+
+def inputs_to_columns(inputs_list):
+    """list[ScheduleInputs] -> {欄位: 陣列}"""
+    return {name: [getattr(inp, name) for inp in inputs_list] for name in _INPUT_FIELDS}
+
+
+def _default(name):
+    f = _INPUT_FIELDS[name]
+    return f.default_factory() if callable(f.default_factory) else f.default
+
+
+def _get(cols, name, n):
+    if name in cols:
+        value = cols[name]
+        if isinstance(value, np.ndarray): return value
+        return pd.Series(value if isinstance(value, pd.Series) else list(value), dtype=None).to_numpy()
+    values = np.empty(n, dtype=object)
+    values.fill(_default(name))
+    return values
+
+
+def _factorize(values):
+    values = pd.Series(values, dtype=object)
+    try:
+        return pd.factorize(values, use_na_sentinel=False)
+    except TypeError:  # list 不可雜湊
+        return pd.factorize(values.map(lambda v: tuple(v) if isinstance(v, list) else v), use_na_sentinel=False)
+
+
+def _text(cols, name, n):
+    """字串欄 -> (代碼, 不重複值)；None/NaN 視為 None，list/tuple 以 | 串接"""
+    codes, uniques = _factorize(_get(cols, name, n))
+    uniques = ["|".join(u) if isinstance(u, (list, tuple)) else (u if isinstance(u, str) else None) for u in uniques]
+    return codes, uniques
+
+
+def _num(cols, name, n, dtype=np.float64):
+    values = _get(cols, name, n)
+    return pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(dtype=dtype)
+
+
+def _flag(cols, name, n):
+    values = _get(cols, name, n)
+    if values.dtype == bool: return values
+    codes, uniques = _factorize(values)
+    table = np.array([bool(v) and v == v and str(v).strip().lower() not in ("false", "0", "no", "nan") for v in uniques], dtype=bool)
+    return table[codes]
+
+
+def _per_unique(coded, fn, dtype):
+    """對不重複值套用 fn 後展開回整欄 (字串判斷不需逐列迴圈)"""
+    codes, uniques = coded
+    return np.array([fn(u) for u in uniques], dtype=dtype)[codes] if len(uniques) else np.zeros(len(codes), dtype=dtype)
+
+
+def _truthy(coded):
+    return _per_unique(coded, bool, bool)
+
+
+def _has(coded, *keywords):
+    return _per_unique(coded, lambda v: v is not None and any(k in v for k in keywords), bool)
+
+
+def _lookup(values, table, default):
+    return _per_unique(values, lambda v: table.get(v, default), np.float64)
+
+
+def _trunc(x):
+    return np.asarray(x, dtype=np.float64).astype(np.int64)
+
+
+def _start_floor(n_floors, ratio):
+    # 同 schedule_engine.start_floor
+    return np.ceil(np.round(n_floors * ratio, 6)).astype(np.int64)
+
+
+def _floor_cycle_factor(cols, n, floors, n_up):
+    """逐層循環：1F 至第 floors 層的累計循環係數 (同 schedule_engine.floor_cycle_offsets 的累計式)"""
+    codes, uniques = _factorize(_get(cols, "transfer_floors", n))
+    transfer = np.zeros(n, dtype=np.int64)
+    top = np.minimum(floors, n_up)  # 轉換層只在地上層
+    for code, floors_list in enumerate(uniques):
+        if not isinstance(floors_list, (list, tuple)) or not floors_list: continue
+        listed = np.unique([int(f) for f in floors_list])
+        listed = listed[listed >= 1]
+        idx = codes == code
+        transfer[idx] = np.searchsorted(listed, top[idx], side="right")
+    roof = np.maximum(floors - np.maximum(n_up, 0), 0)
+    return floors + (TRANSFER_CYCLE_FACTOR - 1) * transfer + (ROOF_CYCLE_FACTOR - 1) * roof
+
+
+def _start_ordinals(cols, n):
+    if "start_date" not in cols: return np.full(n, datetime.date.today().toordinal(), dtype=np.int64)
+    days = pd.to_datetime(pd.Series(_get(cols, "start_date", n))).to_numpy().astype("datetime64[D]").astype(np.int64)
+    return days + _EPOCH_ORDINAL
+
+
+def batch_durations(cols, is_reverse_method, n):
+    """各工項工期 (工作天) 欄位運算；cols 可另含覆蓋欄 base_days_per_floor / days_per_floor_bd (見檔頭)"""
+    rev = np.broadcast_to(np.asarray(is_reverse_method, dtype=bool), (n,))
+    b_type = _text(cols, "b_type", n)
+    struct_above = _text(cols, "struct_above", n)
+    wall = _text(cols, "selected_wall", n)
+    support = _text(cols, "selected_support", n)
+    site = _text(cols, "site_condition", n)
+    obstruction = _text(cols, "obstruction_method", n)
+    deep_gw = _text(cols, "deep_gw_seq", n)
+    prep_type = _text(cols, "prep_type_select", n)
+    foundation = _text(cols, "foundation_type", n)
+    scope = _text(cols, "scope_options", n)
+    aux = _text(cols, "rw_aux_options", n)
+
+    base_area_m2 = _num(cols, "base_area_m2", n)
+    floors_down = _num(cols, "floors_down", n)
+    cfs = _num(cols, "calc_floors_struct", n, np.int64)
+    building_count = _num(cols, "building_count", n, np.int64)
+
+    base_area_ping = base_area_m2 * 0.3025
+    total_fa_ping = _num(cols, "total_fa_m2", n) * 0.3025
+    base_area_factor = np.maximum(0.8, np.minimum(1 + ((base_area_ping - 500) / 100) * 0.02, 1.5))
+    vol_factor = np.where(total_fa_ping > 3000, np.minimum(1 + ((total_fa_ping - 3000) / 5000) * 0.05, 1.2), 1.0)
+    am = base_area_factor * vol_factor
+
+    if "base_days_per_floor" in cols: base_days_per_floor = _num(cols, "base_days_per_floor", n)
+    else:
+        deck = _per_unique(_text(cols, "slab_type", n), lambda v: v == "鋼承板 (Deck)", bool)
+        base_days_per_floor = np.where(deck, 15, _lookup(struct_above, STRUCT_MAP_ABOVE, 28)).astype(np.int64)
+
+    k_usage = _lookup(b_type, USAGE_FACTORS, 1.0)
+    is_multi = _has(b_type, "集合住宅")
+    multi = is_multi & (building_count > 1)
+    compound = _flag(cols, "compound_building_factor", n)
+    k_usage = np.where(multi & compound, k_usage * (1.0 + (building_count - 1) * 0.03), k_usage)
+    k_usage = np.where(multi & ~compound, k_usage + (building_count - 1) * 0.03, k_usage)
+
+    ext_wall_multiplier = _lookup(_text(cols, "ext_wall", n), EXT_WALL_MAP, 1.0)
+    w_fac = _lookup(wall, WALL_FACTORS, 1.0)
+    s_fac = _lookup(support, SUPPORT_FACTORS, 1.0)
+    both = _truthy(wall) & _truthy(support)
+    excav_multiplier = np.where(both, np.where(_has(support, "島式"), w_fac * s_fac, (w_fac + s_fac) / 2), 1.0)
+
+    aux_wall_factor = np.where(_has(aux, "地中壁"), 0.20, 0) + np.where(_has(aux, "扶壁"), 0.10, 0)
+
+    add_review = np.where(_flag(cols, "enable_manual_review", n), _num(cols, "manual_review_days", n, np.int64), 0)
+    custom_days = pd.to_numeric(pd.Series(_get(cols, "prep_days_custom", n)), errors="coerce").to_numpy()
+    is_custom = _has(prep_type, "自訂") & ~np.isnan(custom_days)
+    d_prep_base = np.where(_has(prep_type, "一般"), 120, np.where(_has(prep_type, "鄰捷運"), 210, 300))
+    d_prep_base = np.where(is_custom, _trunc(np.nan_to_num(custom_days)), d_prep_base)
+    d_prep = d_prep_base + add_review
+
+    is_deep_demo = _has(site, "舊地下室")
+    d_old_basement = np.where(
+        _has(obstruction, "全套管切削"), _trunc((180 + 45) * am),
+        np.where(_has(obstruction, "深導溝"), np.where(_has(deep_gw, "先回填"), _trunc(180 * am), _trunc(150 * am)), _trunc(135 * am)),
+    )
+    d_demo = np.where(_has(site, "無地下室"), _trunc(55 * am), d_old_basement)
+    d_demo = np.where(is_deep_demo | _has(site, "有舊建物"), d_demo, 0)
+    d_demo = np.where(_has(site, "純空地"), 0, d_demo)
+
+    soil_improvement = _text(cols, "soil_improvement", n)
+    d_soil = _trunc(np.where(_has(soil_improvement, "局部"), 30, np.where(_has(soil_improvement, "全區"), 60, 0)) * am)
+
+    foundation_add = np.where(_has(foundation, "全套管"), 90, np.where(_has(foundation, "壁樁"), 80,
+                     np.where(_has(foundation, "一般鑽掘"), 60, np.where(_has(foundation, "微型樁"), 30, 0))))
+
+    dw_reality_factor = _num(cols, "dw_reality_factor", n) if "dw_reality_factor" in cols else np.full(n, _default("dw_reality_factor"))
+    base_retain = np.where(_has(wall, "連續壁"), _trunc(60 * dw_reality_factor),
+                  np.where(_has(wall, "全套管"), 50, np.where(_has(wall, "預壘樁"), 40,
+                  np.where(_has(wall, "鋼板樁"), 25, np.where(_has(wall, "鋼軌樁"), 30, 15)))))
+    d_plunge = np.where(rev, _trunc(45 * am), 0)
+    manual_retain = _num(cols, "manual_retain_days", n, np.int64)
+    d_retain = np.where(manual_retain > 0, manual_retain, _trunc((base_retain * am) + 0 + _trunc(60 * aux_wall_factor) + d_plunge))
+
+    d_excav_std = _trunc((floors_down * 22 * excav_multiplier) * am)
+    daily_soil_limit = _num(cols, "daily_soil_limit", n)
+    soil_limited = _flag(cols, "enable_soil_limit", n) & (daily_soil_limit != 0)
+    soil_m3 = np.where(_flag(cols, "is_complex_excavation", n), _num(cols, "complex_soil_vol", n), base_area_m2 * (floors_down * 3.5)) * 1.25
+    d_excav_limited = np.ceil(soil_m3 / np.where(soil_limited, daily_soil_limit, 1.0)).astype(np.int64)
+    d_excav_phase = np.where(soil_limited, np.maximum(d_excav_std, d_excav_limited), d_excav_std)
+
+    is_open_cut = _has(support, "斜坡") | _has(wall, "無")
+    d_strut = np.where(rev | is_open_cut, 0, d_excav_phase)
+    days_per_floor_bd = _num(cols, "days_per_floor_bd", n) if "days_per_floor_bd" in cols else 45
+    d_strut_removal = np.where(is_open_cut | rev, 0, floors_down * 10)
+    struct_efficiency_factor = np.where(rev, 1.3, 1.0)
+    d_struct_below = _trunc(((floors_down * days_per_floor_bd * struct_efficiency_factor) + d_strut_removal + foundation_add) * am)
+
+    d_struct_body = _trunc(cfs * base_days_per_floor * am * k_usage)
+    lag_ext = _trunc(d_struct_body * EXT_START_RATIO)
+    lag_mep = _trunc(d_struct_body * MEP_START_RATIO)
+    floor_cycle = _flag(cols, "floor_cycle_schedule", n)
+    if floor_cycle.any():
+        n_up = _num(cols, "display_max_floor", n, np.int64)
+        cfs_pos = np.maximum(cfs, 0)
+
+        def floor_offset(floors):
+            return _trunc(_floor_cycle_factor(cols, n, floors, n_up) * base_days_per_floor * am * k_usage)
+        d_struct_body = np.where(floor_cycle, floor_offset(cfs_pos), d_struct_body)
+        lag_ext = np.where(floor_cycle, floor_offset(_start_floor(cfs_pos, EXT_START_RATIO)), lag_ext)
+        lag_mep = np.where(floor_cycle, floor_offset(_start_floor(cfs_pos, MEP_START_RATIO)), lag_mep)
+    d_ext_wall = _trunc(cfs * 15 * am * ext_wall_multiplier * k_usage)
+    d_mep = np.where(_has(scope, "機電管線工程"), _trunc((60 + cfs * 2) * am * k_usage), 0)
+    d_fit_out = np.where(_has(scope, "室內裝修工程"), _trunc((60 + cfs * 10) * am * k_usage), 0)
+    d_landscape = np.where(_has(scope, "景觀工程"), _trunc(75 * base_area_factor), 0)
+    d_insp = np.where(_per_unique(b_type, lambda v: v in ["百貨", "醫院", "飯店"], bool), 150, 120)
+    d_insp = np.where(is_multi, d_insp + (building_count - 1) * 15, d_insp)
+
+    needs_tower_crane = _per_unique(struct_above, lambda v: v in ["SS造", "SC造", "SRC造"], bool) | (_num(cols, "display_max_floor", n) >= 15)
+    manual_crane = _num(cols, "manual_crane_days", n, np.int64)
+    d_tower = np.where(needs_tower_crane, np.where(manual_crane > 0, manual_crane, 60), 0)
+
+    return {
+        "area_multiplier": am, "base_area_factor": base_area_factor, "rev": rev, "needs_tower_crane": needs_tower_crane,
+        "d_prep": d_prep, "d_demo": d_demo, "d_soil": d_soil, "d_retain": d_retain, "d_plunge": d_plunge,
+        "d_strut": d_strut, "d_earth_work": d_excav_phase, "d_struct_below": d_struct_below,
+        "d_struct_body": d_struct_body, "lag_ext": lag_ext, "lag_mep": lag_mep, "d_ext_wall": d_ext_wall, "d_mep": d_mep, "d_fit_out": d_fit_out,
+        "d_landscape": d_landscape, "d_insp": d_insp, "d_tower": d_tower,
+    }
+
+
+def _timeline(d, start, cal, sat_and_sun, sun_only):
+    """單一工作日曆下的日期推算 (全部為日序陣列)"""
+    add, sub = cal.add_workdays_ord, cal.sub_workdays_ord
+    am, rev = d["area_multiplier"], d["rev"]
+    out = {}
+    p1_s = start; p1_e = add(p1_s, d["d_prep"])
+    p2_s = p1_e + 1; p2_e = add(p2_s, d["d_demo"])
+    p_soil_s = p2_e + 1; p_soil_e = add(p_soil_s, d["d_soil"])
+    p4_s = p_soil_e + 1; p4_e = add(p4_s, d["d_retain"])
+    p5_s = p4_e + 1; p5_e = add(p5_s, d["d_strut"])
+    p6_s = p5_s
+    d_earth_work = d["d_earth_work"]
+
+    # 逆打
+    r7_s = add(p6_s, _trunc(30 * am))
+    r7_e = add(r7_s, d["d_struct_below"])
+    r6_e = np.maximum(r7_e - 20, add(p6_s, d_earth_work))
+    avg_ratio = np.where(sat_and_sun, 5/7, np.where(sun_only, 6/7, 1.0))
+    r_excav_days = _trunc((r6_e - p6_s) * avg_ratio)
+    r8_pre = add(p6_s, _trunc(60 * am))
+    # 順打
+    s6_e = add(p6_s, d_earth_work)
+    s7_s = np.maximum(p5_e, s6_e) + 1
+    s7_e = add(s7_s, d["d_struct_below"])
+    s8_pre = s7_e + 1
+
+    p6_e = np.where(rev, r6_e, s6_e); p7_s = np.where(rev, r7_s, s7_s); p7_e = np.where(rev, r7_e, s7_e)
+    p8_s_pre = np.where(rev, r8_pre, s8_pre)
+    out["d_excav"] = np.where(rev, r_excav_days, d_earth_work)
+
+    needs = d["needs_tower_crane"]
+    t_s = (p8_s_pre - 1) - 25
+    t_e = add(t_s, d["d_tower"])
+    p_tower_s = np.where(needs, t_s, p1_s); p_tower_e = np.where(needs, t_e, p1_s)
+    p8_s = np.where(needs, np.maximum(p8_s_pre, t_e + 1), p8_s_pre)
+
+    d_struct_body = d["d_struct_body"]
+    p8_e = add(p8_s, d_struct_body)
+    p_ext_s = add(p8_s, d["lag_ext"]); p_ext_e = add(p_ext_s, d["d_ext_wall"])
+    p10_s = add(p8_s, d["lag_mep"]); p10_e = add(p10_s, d["d_mep"])
+    p11_e = p_ext_e + 90; p11_s = sub(p11_e, d["d_fit_out"])
+    p12_s = p_ext_e - 15; p12_e = add(p12_s, d["d_landscape"])
+    p13_s = np.maximum.reduce([p_ext_e, p10_e, p11_e, p12_e]) - 30; p13_e = add(p13_s, d["d_insp"])
+
+    final = np.maximum.reduce([p7_e, p8_e, p_ext_e, p10_e, p11_e, p12_e, p13_e])
+    cal_days = final - p1_s
+    out["cal_days"] = cal_days
+    out["eff_days"] = _trunc(cal_days * np.where(sat_and_sun, 5/7, 6/7))
+    out["final_finish"] = final
+    for key, s, e in [("prep", p1_s, p1_e), ("demo", p2_s, p2_e), ("soil", p_soil_s, p_soil_e), ("retain", p4_s, p4_e),
+                      ("strut", p5_s, p5_e), ("excav", p6_s, p6_e), ("struct_below", p7_s, p7_e), ("struct_body", p8_s, p8_e),
+                      ("ext_wall", p_ext_s, p_ext_e), ("mep", p10_s, p10_e), ("fit_out", p11_s, p11_e),
+                      ("landscape", p12_s, p12_e), ("insp", p13_s, p13_e), ("tower", p_tower_s, p_tower_e)]:
+        out[f"{key}_start"] = s; out[f"{key}_finish"] = e
+    return out
+
+
+def batch_arrays(cols, is_reverse_method=False):
+    """批次運算核心：回傳 {欄名: numpy 陣列}，日期為日序 (date.toordinal)"""
+    if isinstance(cols, pd.DataFrame): cols = {c: cols[c] for c in cols.columns}
+    n = len(next(iter(cols.values()))) if cols else 0
+    d = batch_durations(cols, is_reverse_method, n)
+    start = _start_ordinals(cols, n)
+    sat, sun, cny = _flag(cols, "exclude_sat", n), _flag(cols, "exclude_sun", n), _flag(cols, "exclude_cny", n)
+
+    out = {}
+    combo = sat.astype(np.int64) * 4 + sun.astype(np.int64) * 2 + cny.astype(np.int64)
+    for code in np.unique(combo):
+        # 同一組排除條件共用一份工作日曆
+        idx = np.flatnonzero(combo == code)
+        cal = get_calendar(bool(code & 4), bool(code & 2), bool(code & 1))
+        sub_d = {k: (v[idx] if isinstance(v, np.ndarray) and v.shape == (n,) else v) for k, v in d.items()}
+        part = _timeline(sub_d, start[idx], cal, sat[idx] & sun[idx], sun[idx])
+        for k, v in part.items():
+            if k not in out: out[k] = np.empty(n, dtype=v.dtype)
+            out[k][idx] = v
+    for key in PHASE_KEYS:
+        if key in ("excav", "tower"): continue
+        out[f"d_{key}"] = d[f"d_{key}"]
+    out["d_tower"] = d["d_tower"]
+    out["d_plunge"] = d["d_plunge"]
+    out["area_multiplier"] = d["area_multiplier"]
+    return out
+
+
+def calculate_schedule_batch(cols, is_reverse_method=False):
+    """批次計算多組情境，回傳 DataFrame (每列一個情境，日期欄為 datetime64)"""
+    arrays = batch_arrays(cols, is_reverse_method)
+    frame = {}
+    for key in PHASE_KEYS:
+        frame[f"d_{key}"] = arrays[f"d_{key}"]
+    for key in PHASE_KEYS:
+        for part in ("start", "finish"):
+            frame[f"{key}_{part}"] = (arrays[f"{key}_{part}"] - _EPOCH_ORDINAL).astype("datetime64[D]")
+    frame["d_plunge"] = arrays["d_plunge"]
+    frame["area_multiplier"] = arrays["area_multiplier"]
+    frame["final_finish"] = (arrays["final_finish"] - _EPOCH_ORDINAL).astype("datetime64[D]")
+    frame["cal_days"] = arrays["cal_days"]
+    frame["eff_days"] = arrays["eff_days"]
+    index = cols.index if isinstance(cols, pd.DataFrame) else None
+    return pd.DataFrame(frame, index=index)
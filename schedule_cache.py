@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import fields
+
+from schedule_engine import calculate_schedule
+
+# ==========================================
+# ⚡ 工期運算快取 (內容雜湊 + LRU)
+# ==========================================
+# 以「會影響工期的輸入」做正規化雜湊當 key，整個伺服器行程共用一份；
+# 只改工程名稱等文字欄位時不會重算。結果物件皆為不可變，可安全跨 session 共用。
+# 快取未命中時，若有該 session 的增量運算物件，只重算與上一次輸入不同之處的下游節點。
+
+CACHE_VERSION = 1  # 引擎邏輯變更時遞增，使舊 key 失效
+
+
+class LRUCache:
+    """執行緒安全的 LRU 快取，附命中率統計"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+def canonical_key(record, *extra):
+    """dataclass 輸入 (+ 額外參數) 的正規化 SHA-256"""
+    payload = [CACHE_VERSION, type(record).__name__]
+    payload += [[f.name, getattr(record, f.name)] for f in fields(record)]
+    payload += list(extra)
+    text = json.dumps(payload, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+SCHEDULE_CACHE = LRUCache(maxsize=2048)
+
+
+def cached_calculate_schedule(inp, is_reverse_method, incremental=None):
+    """calculate_schedule 的快取版本；incremental 為該 session 的 IncrementalSchedule，未命中時只重算受影響的節點"""
+    key = canonical_key(inp, bool(is_reverse_method))
+    result = SCHEDULE_CACHE.get(key)
+    if result is None:
+        result = incremental.compute(inp, is_reverse_method) if incremental is not None else calculate_schedule(inp, is_reverse_method)
+        SCHEDULE_CACHE.put(key, result)
+    return result
+
+
+def cache_status_text():
+    s = SCHEDULE_CACHE.stats()
+    return f"⚡ 工期快取：命中率 {s['hit_rate']:.0%} ({s['hits']}/{s['hits'] + s['misses']})，已存 {s['size']}/{s['maxsize']} 筆"
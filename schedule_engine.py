@@ -0,0 +1,698 @@
+import datetime
+import inspect
+import math
+from dataclasses import dataclass, field, fields
+from datetime import timedelta
+from typing import Optional
+
+import numpy as np
+
+from workday_calendar import get_calendar
+
+# ==========================================
+# ⚙️ 工期核心運算引擎 (不依賴 Streamlit)
+# ==========================================
+
+DW_REALITY_FACTOR = 1.75
+STRUCT_MAP_ABOVE = {"RC造": 28, "SRC造": 25, "SS造": 18, "SC造": 21}
+USAGE_FACTORS = {"住宅": 1.0, "集合住宅 (多棟)": 1.0, "辦公大樓": 1.1, "飯店": 1.4, "百貨": 1.1, "廠房": 0.8, "醫院": 1.4}
+EXT_WALL_MAP = {"標準磁磚/塗料": 1.3, "石材吊掛 (工期較長)": 1.1, "玻璃帷幕 (工期較短)": 0.8, "預鑄PC板": 0.85, "金屬三明治板 (極快)": 0.85}
+WALL_FACTORS = {"連續壁 (Diaphragm Wall)": 1.0, "全套管切削樁 (All-Casing)": 0.95, "預壘樁/排樁 (PIP/Soldier Pile)": 0.85, "鋼板樁 (Sheet Pile)": 0.70, "鋼軌樁 (H-Pile)": 0.75, "無 (純明挖/放坡)": 0.50}
+SUPPORT_FACTORS = {"型鋼內支撐 (Strut)": 1.0, "地錨 (Anchor)": 0.8, "結構樓板 (逆打標準)": 1.0, "島式工法 (Island Method)": 1.25, "斜坡/明挖 (Slope/Open Cut)": 0.6}
+DEFAULT_SCOPE = ("機電管線工程", "室內裝修工程", "景觀工程")
+EXT_START_RATIO = 0.7  # 外牆於地上結構 70% 進場
+MEP_START_RATIO = 0.3  # 機電於地上結構 30% 進場
+TRANSFER_CYCLE_FACTOR = 2.0  # 轉換層 (大梁/厚版) 約為兩個標準層循環
+ROOF_CYCLE_FACTOR = 0.6  # 屋突層面積小
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleInputs:
+    """影響工期的全部輸入 (工程名稱等純文字資料不在此列)"""
+    start_date: datetime.date = field(default_factory=datetime.date.today)
+    b_type: Optional[str] = None
+    struct_above: Optional[str] = None
+    slab_type: str = "一般 RC 樓版"
+    base_area_m2: float = 0.0
+    total_fa_m2: float = 0.0
+    calc_floors_struct: int = 0
+    display_max_floor: int = 0
+    building_count: int = 1
+    floors_down: float = 0.0
+    is_complex_excavation: bool = False
+    complex_soil_vol: float = 0.0
+    enable_soil_limit: bool = False
+    daily_soil_limit: float = 300
+    site_condition: Optional[str] = None
+    obstruction_method: Optional[str] = "一般怪手破除"
+    deep_gw_seq: Optional[str] = "無"
+    soil_improvement: Optional[str] = None
+    prep_type_select: Optional[str] = None
+    prep_days_custom: Optional[int] = None
+    enable_manual_review: bool = False
+    manual_review_days: int = 0
+    selected_wall: Optional[str] = None
+    selected_support: Optional[str] = None
+    rw_aux_options: tuple = ()
+    foundation_type: Optional[str] = None
+    ext_wall: Optional[str] = None
+    scope_options: tuple = DEFAULT_SCOPE
+    manual_retain_days: int = 0
+    manual_crane_days: int = 0
+    exclude_sat: bool = True
+    exclude_sun: bool = True
+    exclude_cny: bool = True
+    dw_reality_factor: float = DW_REALITY_FACTOR
+    compound_building_factor: bool = False  # 舊版 (sim)：多棟係數與用途係數相乘
+    plunge_label: str = "逆打鋼柱"
+    floor_cycle_schedule: bool = False  # 地上結構逐層循環排程 (超高層)
+    transfer_floors: tuple = ()  # 轉換層樓層 (1F 起算)
+
+    def __post_init__(self):
+        # multiselect 回傳 list，轉 tuple 以維持不可變/可雜湊
+        for name in ("rw_aux_options", "scope_options", "transfer_floors"):
+            value = getattr(self, name)
+            if not isinstance(value, tuple): object.__setattr__(self, name, tuple(value or ()))
+
+
+@dataclass(frozen=True, slots=True)
+class Phase:
+    name: str
+    days: int
+    start: datetime.date
+    finish: datetime.date
+    note: str
+
+    def to_dict(self):
+        return {"工項": self.name, "天數": self.days, "Start": self.start, "Finish": self.finish, "備註": self.note}
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleResult:
+    eff_days: int
+    cal_days: int
+    final_finish: datetime.date
+    phases: tuple
+    d_retain: int
+    d_plunge: int
+    d_strut: int
+    d_struct_down: int
+
+    def s_data(self):
+        """舊版 s_data 格式 (list of dict)，每次回傳新的 list"""
+        return [p.to_dict() for p in self.phases]
+
+    def key_metrics(self):
+        return {'d_retain': self.d_retain, 'd_plunge': self.d_plunge, 'd_strut': self.d_strut, 'd_struct_down': self.d_struct_down}
+
+
+def excavation_multiplier(selected_wall, selected_support):
+    """擋土壁 + 支撐組合的開挖係數"""
+    if not (selected_wall and selected_support): return 1.0
+    w_fac = WALL_FACTORS.get(selected_wall, 1.0)
+    s_fac = SUPPORT_FACTORS.get(selected_support, 1.0)
+    if "島式" in selected_support: return w_fac * s_fac
+    return (w_fac + s_fac) / 2
+
+
+def _soil_volume(is_complex_excavation, complex_soil_vol, base_area_m2, floors_down):
+    return (complex_soil_vol if is_complex_excavation else base_area_m2 * (floors_down * 3.5)) * 1.25
+
+
+def _excavation_std(floors_down, selected_wall, selected_support, area_multiplier):
+    return int((floors_down * 22 * excavation_multiplier(selected_wall, selected_support)) * area_multiplier)
+
+
+def base_days_per_floor(slab_type, struct_above):
+    """地上結構標準層循環 (天/層)"""
+    return 15 if slab_type == "鋼承板 (Deck)" else STRUCT_MAP_ABOVE.get(struct_above, 28)
+
+
+# ==========================================
+# 🏢 逐層結構循環 (超高層)
+# ==========================================
+# 地上結構不再視為一整段：每層循環 = 標準層循環 × 層別係數 (轉換層、屋突層)，
+# 各層完成的累計工作天以陣列一次算出，外牆/機電改為「第 k 層結構完成」後進場。
+# 累計係數以「層數 + 轉換層數 × (係數-1) + 屋突層數 × (係數-1)」計算 (批次運算可用同一式子逐欄求值)，
+# 全為標準層時第 n 層完成 = 原本 int(n × 天/層 × 係數)，與整段計算一致。
+
+def floor_kinds(calc_floors_struct, display_max_floor, transfer_floors=()):
+    """(是否轉換層, 是否屋突層) 兩個布林陣列，索引 0 為 1F；屋突層不計轉換層"""
+    floor_no = np.arange(1, max(int(calc_floors_struct), 0) + 1)
+    roof = floor_no > int(display_max_floor)
+    transfer = np.isin(floor_no, [int(f) for f in transfer_floors]) & ~roof
+    return transfer, roof
+
+
+def floor_cycle_offsets(calc_floors_struct, display_max_floor, transfer_floors, days_per_floor, area_multiplier, k_usage):
+    """各層結構完成的累計工作天 (int64 陣列，索引 0 為 1F)"""
+    transfer, roof = floor_kinds(calc_floors_struct, display_max_floor, transfer_floors)
+    cum = np.arange(1, len(roof) + 1) + (TRANSFER_CYCLE_FACTOR - 1) * np.cumsum(transfer) + (ROOF_CYCLE_FACTOR - 1) * np.cumsum(roof)
+    return (cum * days_per_floor * area_multiplier * k_usage).astype(np.int64)
+
+
+def start_floor(n_floors, ratio):
+    """第幾層結構完成後進場 (比例向上取整；無樓層時為 0)"""
+    return math.ceil(round(n_floors * ratio, 6))
+
+
+def floor_lag(offsets, ratio):
+    """逐層循環下，後續工項相對地上結構開工的工作天"""
+    k = start_floor(len(offsets), ratio)
+    return int(offsets[k - 1]) if k else 0
+
+
+# ==========================================
+# 🔗 工期相依圖 (輸入 → 工期節點 → 日期節點 → 結果)
+# ==========================================
+# 每個節點是純函式，參數名稱即其依賴：ScheduleInputs 欄位、is_reverse_method 或先前定義的節點。
+# calculate_schedule 依定義順序全部計算一次；IncrementalSchedule 只重算受改變輸入影響的下游節點，
+# 節點值與上次相同時即停止往下傳遞。
+
+INPUT_FIELDS = tuple(f.name for f in fields(ScheduleInputs))
+GRAPH_SOURCES = frozenset(INPUT_FIELDS) | {"is_reverse_method"}
+NODES = []  # (名稱, 函式, 依賴)，定義順序即拓撲順序
+
+
+def node(name):
+    """註冊相依圖節點；依賴只能是輸入或已註冊的節點"""
+    def register(fn):
+        deps = tuple(inspect.signature(fn).parameters)
+        known = GRAPH_SOURCES | {n for n, _, _ in NODES}
+        if name in known: raise ValueError(f"節點名稱重複: {name}")
+        missing = [d for d in deps if d not in known]
+        if missing: raise ValueError(f"節點 {name} 依賴未定義的輸入/節點: {missing}")
+        NODES.append((name, fn, deps))
+        return fn
+    return register
+
+
+@node("area")
+def _area(base_area_m2, total_fa_m2):
+    base_area_ping = base_area_m2 * 0.3025
+    total_fa_ping = total_fa_m2 * 0.3025
+    base_area_factor = max(0.8, min(1 + ((base_area_ping - 500) / 100) * 0.02, 1.5))
+    vol_factor = 1.0
+    if total_fa_ping > 3000:
+        vol_factor = min(1 + ((total_fa_ping - 3000) / 5000) * 0.05, 1.2)
+    return base_area_factor, base_area_factor * vol_factor
+
+
+@node("k_usage")
+def _usage(b_type, building_count, compound_building_factor):
+    k_usage = USAGE_FACTORS.get(b_type, 1.0)
+    if "集合住宅" in str(b_type) and building_count > 1:
+        if compound_building_factor: k_usage *= 1.0 + (building_count - 1) * 0.03
+        else: k_usage += (building_count - 1) * 0.03
+    return k_usage
+
+
+@node("prep")
+def _prep(prep_type_select, prep_days_custom, enable_manual_review, manual_review_days):
+    add_review_days = manual_review_days if enable_manual_review else 0
+    if prep_type_select and "自訂" in prep_type_select and prep_days_custom is not None: d_prep_base = int(prep_days_custom)
+    elif "一般" in str(prep_type_select): d_prep_base = 120
+    elif "鄰捷運" in str(prep_type_select): d_prep_base = 210
+    else: d_prep_base = 300
+    prep_note = f"含危評 (+{add_review_days}天)" if add_review_days > 0 else "要徑"
+    return d_prep_base + add_review_days, prep_note
+
+
+@node("demo")
+def _demo(site_condition, obstruction_method, deep_gw_seq, area):
+    area_multiplier = area[1]
+    is_deep_demo = site_condition and "舊地下室" in site_condition
+    demo_note = "純空地"
+    if site_condition and "純空地" in site_condition: d_demo = 0
+    elif is_deep_demo or ("有舊建物" in str(site_condition)):
+        if site_condition and "無地下室" in site_condition:
+            d_demo = int(55 * area_multiplier); demo_note = "地上拆除"
+        else:
+            if "全套管切削" in str(obstruction_method): d_demo = int((180 + 45) * area_multiplier); demo_note = "全套管清障"
+            elif "深導溝" in str(obstruction_method):
+                d_demo = int(180 * area_multiplier) if deep_gw_seq and "先回填" in deep_gw_seq else int(150 * area_multiplier)
+                demo_note = "先回填" if "先回填" in str(deep_gw_seq) else "邊回填"
+            else: d_demo = int(135 * area_multiplier); demo_note = "舊地下室破除"
+    else: d_demo = 0
+    return d_demo, demo_note
+
+
+@node("soil")
+def _soil(soil_improvement, area):
+    return int((30 if "局部" in str(soil_improvement) else 60 if "全區" in str(soil_improvement) else 0) * area[1])
+
+
+@node("retain")
+def _retain(selected_wall, rw_aux_options, dw_reality_factor, manual_retain_days, plunge_label, is_reverse_method, area):
+    area_multiplier = area[1]
+    aux_wall_factor = 0
+    if any("地中壁" in o for o in rw_aux_options): aux_wall_factor += 0.20
+    if any("扶壁" in o for o in rw_aux_options): aux_wall_factor += 0.10
+    d_aux_wall_days = int(60 * aux_wall_factor)
+    d_dw_setup = 0
+    dw_note_str = ""
+    if selected_wall and "連續壁" in selected_wall: base_retain = int(60 * dw_reality_factor); dw_note_str = "連續壁(含係數)"
+    elif selected_wall and "全套管" in selected_wall: base_retain = 50; dw_note_str = "全套管"
+    elif selected_wall and "預壘樁" in selected_wall: base_retain = 40; dw_note_str = "預壘樁"
+    elif selected_wall and "鋼板樁" in selected_wall: base_retain = 25; dw_note_str = "鋼板樁"
+    elif selected_wall and "鋼軌樁" in selected_wall: base_retain = 30; dw_note_str = "鋼軌樁"
+    else: base_retain = 15; dw_note_str = "一般"
+
+    d_plunge_col = 0
+    if is_reverse_method: d_plunge_col = int(45 * area_multiplier); dw_note_str += f" + {plunge_label}"
+
+    if manual_retain_days > 0: d_retain_work = manual_retain_days; excav_str_display = "依廠商預估"
+    else:
+        d_retain_work = int((base_retain * area_multiplier) + d_dw_setup + d_aux_wall_days + d_plunge_col)
+        excav_str_display = f"{dw_note_str}"
+        if aux_wall_factor > 0: excav_str_display += " (+輔助)"
+    return d_retain_work, excav_str_display, d_plunge_col
+
+
+@node("excav")
+def _excav(floors_down, selected_wall, selected_support, enable_soil_limit, daily_soil_limit,
+           is_complex_excavation, complex_soil_vol, base_area_m2, area):
+    d_excav_std = _excavation_std(floors_down, selected_wall, selected_support, area[1])
+    excav_note = "出土/支撐"
+    if enable_soil_limit and daily_soil_limit:
+        d_excav_limited = math.ceil(_soil_volume(is_complex_excavation, complex_soil_vol, base_area_m2, floors_down) / daily_soil_limit)
+        d_excav_phase = max(d_excav_std, d_excav_limited)
+        if d_excav_limited > d_excav_std: excav_note = f"限每日{daily_soil_limit}m³"
+    else: d_excav_phase = d_excav_std
+    return d_excav_phase, excav_note
+
+
+@node("open_cut")
+def _open_cut(selected_wall, selected_support):
+    return bool((selected_support and "斜坡" in selected_support) or (selected_wall and "無" in selected_wall))
+
+
+@node("strut")
+def _strut(is_reverse_method, open_cut, excav):
+    """(支撐架設天數, 開挖天數, 備註)"""
+    d_excav_phase = excav[0]
+    if is_reverse_method: return 0, d_excav_phase, "樓板支撐"
+    if open_cut: return 0, d_excav_phase, "明挖/斜坡"
+    return d_excav_phase, d_excav_phase, "開挖併行"
+
+
+@node("struct_below")
+def _struct_below(floors_down, foundation_type, is_reverse_method, open_cut, area):
+    foundation_add = 0
+    if foundation_type and "全套管" in foundation_type: foundation_add = 90
+    elif foundation_type and "壁樁" in foundation_type: foundation_add = 80
+    elif foundation_type and "一般鑽掘" in foundation_type: foundation_add = 60
+    elif foundation_type and "微型樁" in foundation_type: foundation_add = 30
+
+    days_per_floor_bd = 45
+    days_per_strut_remove = 10
+    if open_cut or is_reverse_method: d_strut_removal = 0
+    else: d_strut_removal = floors_down * days_per_strut_remove
+
+    struct_efficiency_factor = 1.3 if is_reverse_method else 1.0
+    d_struct_below_raw = ((floors_down * days_per_floor_bd * struct_efficiency_factor) + d_strut_removal + foundation_add)
+    d_struct_below = int(d_struct_below_raw * area[1])
+
+    struct_note_base = f"{days_per_floor_bd}天/層"
+    if is_reverse_method: struct_note_base += " x 1.3(逆打)"
+    if d_strut_removal > 0: struct_note_base += f" + 拆撐{days_per_strut_remove}天"
+    return d_struct_below, struct_note_base
+
+
+@node("floor_cycle")
+def _floor_cycle(floor_cycle_schedule, calc_floors_struct, display_max_floor, transfer_floors, slab_type, struct_above, k_usage, area):
+    """各層完成累計工作天 (tuple)；未啟用逐層循環時為 None"""
+    if not floor_cycle_schedule: return None
+    days_per_floor = base_days_per_floor(slab_type, struct_above)
+    return tuple(floor_cycle_offsets(calc_floors_struct, display_max_floor, transfer_floors, days_per_floor, area[1], k_usage).tolist())
+
+
+@node("struct_body")
+def _struct_body(calc_floors_struct, slab_type, struct_above, k_usage, area, floor_cycle):
+    if floor_cycle is not None: return floor_cycle[-1] if floor_cycle else 0
+    return int(calc_floors_struct * base_days_per_floor(slab_type, struct_above) * area[1] * k_usage)
+
+
+@node("d_ext_wall")
+def _ext_wall(calc_floors_struct, ext_wall, k_usage, area):
+    return int(calc_floors_struct * 15 * area[1] * EXT_WALL_MAP.get(ext_wall, 1.0) * k_usage)
+
+
+@node("mep")
+def _mep(calc_floors_struct, scope_options, k_usage, area):
+    return int((60 + calc_floors_struct * 2) * area[1] * k_usage) if "機電管線工程" in scope_options else 0
+
+
+@node("fit_out")
+def _fit_out(calc_floors_struct, scope_options, k_usage, area):
+    return int((60 + calc_floors_struct * 10) * area[1] * k_usage) if "室內裝修工程" in scope_options else 0
+
+
+@node("landscape")
+def _landscape(scope_options, area):
+    return int(75 * area[0]) if "景觀工程" in scope_options else 0
+
+
+@node("insp")
+def _insp(b_type, building_count):
+    d_insp = 150 if b_type in ["百貨", "醫院", "飯店"] else 120
+    if "集合住宅" in str(b_type): d_insp += (building_count - 1) * 15
+    return d_insp
+
+
+@node("tower")
+def _tower(manual_crane_days, struct_above, display_max_floor):
+    """(塔吊天數, 備註, 是否需要塔吊)"""
+    d_tower_crane = 60
+    crane_note = "含安檢"
+    if manual_crane_days > 0: d_tower_crane = manual_crane_days; crane_note = "廠商預估"
+    needs_tower_crane = (struct_above in ["SS造", "SC造", "SRC造"]) or (display_max_floor >= 15)
+    if not needs_tower_crane: d_tower_crane = 0
+    return d_tower_crane, crane_note, needs_tower_crane
+
+
+@node("work_cal")
+def _work_cal(exclude_sat, exclude_sun, exclude_cny):
+    return get_calendar(exclude_sat, exclude_sun, exclude_cny)
+
+
+# --- 時間軸：各節點回傳 (開始, 完成) ---
+
+def _after(prev, days, work_cal):
+    # 前一工項完成隔天開工
+    start = prev[1] + timedelta(days=1)
+    return start, work_cal.add_workdays(start, days)
+
+
+@node("t_prep")
+def _t_prep(start_date, prep, work_cal):
+    return start_date, work_cal.add_workdays(start_date, prep[0])
+
+
+@node("t_demo")
+def _t_demo(t_prep, demo, work_cal):
+    return _after(t_prep, demo[0], work_cal)
+
+
+@node("t_soil")
+def _t_soil(t_demo, soil, work_cal):
+    return _after(t_demo, soil, work_cal)
+
+
+@node("t_retain")
+def _t_retain(t_soil, retain, work_cal):
+    return _after(t_soil, retain[0], work_cal)
+
+
+@node("t_strut")
+def _t_strut(t_retain, strut, work_cal):
+    return _after(t_retain, strut[0], work_cal)
+
+
+@node("t_below")
+def _t_below(is_reverse_method, t_strut, strut, struct_below, excav, area, work_cal, exclude_sat, exclude_sun, display_max_floor):
+    """開挖 / 地下結構時間軸與地上結構可開工日 (dict)"""
+    get_end = work_cal.add_workdays
+    p5_s, p5_e = t_strut
+    p6_s = p5_s
+    d_earth_work = strut[1]
+    d_struct_below, struct_note_base = struct_below
+    excav_note = excav[1]
+    if is_reverse_method:
+        lag_excav = int(30 * area[1])
+        p7_s = get_end(p6_s, lag_excav)
+        p7_e = get_end(p7_s, d_struct_below)
+        target_excav_end = p7_e - timedelta(days=20)
+        std_excav_end = get_end(p6_s, d_earth_work)
+        p6_e = max(target_excav_end, std_excav_end)
+        cal_diff = (p6_e - p6_s).days
+        avg_ratio = 5/7 if exclude_sat and exclude_sun else 6/7 if exclude_sun else 1.0
+        d_earth_work_display = int(cal_diff * avg_ratio)
+        lag_1f_slab = int(60 * area[1])
+        p8_s_pre = get_end(p6_s, lag_1f_slab)
+        struct_note_below = f"併行 ({struct_note_base})"
+        struct_note_above = f"併行 ({display_max_floor}F)"
+        excav_note = "配合逆打"
+    else:
+        p6_e = get_end(p6_s, d_earth_work)
+        d_earth_work_display = d_earth_work
+        p_excav_finish = max(p5_e, p6_e)
+        p7_s = p_excav_finish + timedelta(days=1)
+        p7_e = get_end(p7_s, d_struct_below)
+        p8_s_pre = p7_e + timedelta(days=1)
+        struct_note_below = f"要徑 ({struct_note_base})"
+        struct_note_above = f"順打 ({display_max_floor}F)"
+    return {
+        "p6_s": p6_s, "p6_e": p6_e, "d_earth_work_display": d_earth_work_display, "excav_note": excav_note,
+        "p7_s": p7_s, "p7_e": p7_e, "p8_s_pre": p8_s_pre,
+        "struct_note_below": struct_note_below, "struct_note_above": struct_note_above,
+    }
+
+
+@node("t_tower")
+def _t_tower(start_date, t_below, tower, work_cal):
+    """(塔吊開始, 塔吊完成, 地上結構開工日)"""
+    p8_s_pre = t_below["p8_s_pre"]
+    d_tower_crane, _, needs_tower_crane = tower
+    if not needs_tower_crane: return start_date, start_date, p8_s_pre
+    p_tower_e = p8_s_pre - timedelta(days=1)
+    p_tower_s = p_tower_e - timedelta(days=25)
+    p_tower_e = work_cal.add_workdays(p_tower_s, d_tower_crane)
+    return p_tower_s, p_tower_e, max(p8_s_pre, p_tower_e + timedelta(days=1))
+
+
+@node("t_body")
+def _t_body(t_tower, struct_body, work_cal):
+    p8_s = t_tower[2]
+    return p8_s, work_cal.add_workdays(p8_s, struct_body)
+
+
+@node("t_ext")
+def _t_ext(t_body, struct_body, floor_cycle, d_ext_wall, work_cal):
+    lag_ext = floor_lag(floor_cycle, EXT_START_RATIO) if floor_cycle is not None else int(struct_body * EXT_START_RATIO)
+    p_ext_s = work_cal.add_workdays(t_body[0], lag_ext)
+    return p_ext_s, work_cal.add_workdays(p_ext_s, d_ext_wall)
+
+
+@node("t_mep")
+def _t_mep(t_body, struct_body, floor_cycle, mep, work_cal):
+    lag_mep = floor_lag(floor_cycle, MEP_START_RATIO) if floor_cycle is not None else int(struct_body * MEP_START_RATIO)
+    p10_s = work_cal.add_workdays(t_body[0], lag_mep)
+    return p10_s, work_cal.add_workdays(p10_s, mep)
+
+
+@node("t_fit_out")
+def _t_fit_out(t_ext, fit_out, work_cal):
+    p11_e = t_ext[1] + timedelta(days=90)
+    return work_cal.sub_workdays(p11_e, fit_out), p11_e
+
+
+@node("t_landscape")
+def _t_landscape(t_ext, landscape, work_cal):
+    p12_s = t_ext[1] - timedelta(days=15)
+    return p12_s, work_cal.add_workdays(p12_s, landscape)
+
+
+@node("t_insp")
+def _t_insp(t_ext, t_mep, t_fit_out, t_landscape, insp, work_cal):
+    p13_s = max(t_ext[1], t_mep[1], t_fit_out[1], t_landscape[1]) - timedelta(days=30)
+    return p13_s, work_cal.add_workdays(p13_s, insp)
+
+
+@node("result")
+def _result(start_date, exclude_sat, exclude_sun, prep, demo, soil, retain, strut, struct_below, struct_body, d_ext_wall,
+            mep, fit_out, landscape, insp, tower, floor_cycle, t_prep, t_demo, t_soil, t_retain, t_strut, t_below, t_tower, t_body,
+            t_ext, t_mep, t_fit_out, t_landscape, t_insp):
+    final_finish = max(t_below["p7_e"], t_body[1], t_ext[1], t_mep[1], t_fit_out[1], t_landscape[1], t_insp[1])
+    cal_days = (final_finish - start_date).days
+    eff_days = int(cal_days * (5/7 if exclude_sat and exclude_sun else 6/7))
+
+    d_retain_work, excav_str_display, d_plunge_col = retain
+    d_strut_install, _, strut_note = strut
+    d_struct_below = struct_below[0]
+    d_tower_crane, crane_note, needs_tower_crane = tower
+    ext_note, mep_note = "70%進場", "30%進場"
+    if floor_cycle is not None:
+        ext_note = f"{start_floor(len(floor_cycle), EXT_START_RATIO)}F結構完成進場"
+        mep_note = f"{start_floor(len(floor_cycle), MEP_START_RATIO)}F結構完成進場"
+    phases = [
+        Phase("1.前期", prep[0], *t_prep, prep[1]),
+        Phase("2.拆除", demo[0], *t_demo, demo[1]),
+        Phase("3.地改", soil, *t_soil, "地質改良"),
+        Phase("4.擋土壁", d_retain_work, *t_retain, excav_str_display),
+        Phase("5.支撐", d_strut_install, *t_strut, strut_note),
+        Phase("6.開挖", t_below["d_earth_work_display"], t_below["p6_s"], t_below["p6_e"], t_below["excav_note"]),
+        Phase("7.地下結構", d_struct_below, t_below["p7_s"], t_below["p7_e"], t_below["struct_note_below"]),
+        Phase("8.地上結構", struct_body, *t_body, t_below["struct_note_above"]),
+        Phase("9.外牆", d_ext_wall, *t_ext, ext_note),
+        Phase("10.機電", mep, *t_mep, mep_note),
+        Phase("11.裝修", fit_out, *t_fit_out, "外牆後3個月完成"),
+        Phase("12.景觀", landscape, *t_landscape, "收尾工程"),
+        Phase("13.驗收", insp, *t_insp, "標準驗收"),
+    ]
+    if needs_tower_crane: phases.append(Phase("7.5 塔吊", d_tower_crane, t_tower[0], t_tower[1], crane_note))
+
+    return ScheduleResult(
+        eff_days=eff_days, cal_days=cal_days, final_finish=final_finish, phases=tuple(phases),
+        d_retain=d_retain_work, d_plunge=d_plunge_col, d_strut=d_strut_install, d_struct_down=d_struct_below,
+    )
+
+
+# ==========================================
+# 對外介面
+# ==========================================
+
+def area_factors(inp):
+    """(基地面積係數, 面積總係數)：基地坪數與總樓地板坪數的規模修正"""
+    return _area(inp.base_area_m2, inp.total_fa_m2)
+
+
+def soil_volume_m3(inp):
+    """出土量 (m³，含 1.25 鬆方係數)"""
+    return _soil_volume(inp.is_complex_excavation, inp.complex_soil_vol, inp.base_area_m2, inp.floors_down)
+
+
+def standard_excavation_days(inp, area_multiplier):
+    """不受出土管制時的開挖工期"""
+    return _excavation_std(inp.floors_down, inp.selected_wall, inp.selected_support, area_multiplier)
+
+
+def floor_cycle(inp):
+    """本案各層完成累計工作天 (tuple)；未啟用逐層循環時為 None"""
+    area = area_factors(inp)
+    k_usage = _usage(inp.b_type, inp.building_count, inp.compound_building_factor)
+    return _floor_cycle(inp.floor_cycle_schedule, inp.calc_floors_struct, inp.display_max_floor, inp.transfer_floors,
+                        inp.slab_type, inp.struct_above, k_usage, area)
+
+
+def _source_values(inp, is_reverse_method):
+    values = {name: getattr(inp, name) for name in INPUT_FIELDS}
+    values["is_reverse_method"] = bool(is_reverse_method)
+    return values
+
+
+def schedule_nodes(inp, is_reverse_method):
+    """全部節點值 {名稱: 值}；延伸計算 (如分棟排程) 取用中間結果"""
+    values = _source_values(inp, is_reverse_method)
+    for name, fn, deps in NODES: values[name] = fn(*[values[d] for d in deps])
+    return values
+
+
+def calculate_schedule(inp, is_reverse_method):
+    """依輸入計算各工項工期與日期，回傳 ScheduleResult"""
+    return schedule_nodes(inp, is_reverse_method)["result"]
+
+
+def _same(a, b):
+    # 300 與 300.0 相等但備註文字不同，輸入比對須連型別一起比
+    return type(a) is type(b) and a == b
+
+
+class IncrementalSchedule:
+    """增量運算 (每個 session 一份)：記住上次的輸入與節點值，只重算受改變輸入影響的節點"""
+
+    def __init__(self):
+        self._values = None
+        self.recomputed = ()  # 上一次實際重算的節點名稱
+
+    def compute(self, inp, is_reverse_method):
+        sources = _source_values(inp, is_reverse_method)
+        if self._values is None:
+            values, changed = dict(sources), None  # 第一次：全部計算
+        else:
+            changed = {name for name, value in sources.items() if not _same(self._values[name], value)}
+            values = {**self._values, **sources}
+        recomputed = []
+        for name, fn, deps in NODES:
+            if changed is not None and changed.isdisjoint(deps): continue
+            value = fn(*[values[d] for d in deps])
+            recomputed.append(name)
+            if changed is None: values[name] = value
+            elif value != values[name]:
+                values[name] = value
+                changed.add(name)
+        self._values = values
+        self.recomputed = tuple(recomputed)
+        return values["result"]
+
+
+# ==========================================
+# ⚡ 快速估算 (Lite)：純工作天、不排日曆
+# ==========================================
+
+LITE_WALL_DEPTH = 1  # 地下 1 層以內用鋼板樁，以上用連續壁
+
+
+@dataclass(frozen=True, slots=True)
+class LiteInputs:
+    floors_up: int = 15
+    floors_down: int = 3
+    struct_above: str = "RC造"
+    base_area_m2: float = 1000.0
+    b_type: str = "住宅"
+    method: str = "順打工法"
+    has_old_building: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class LiteResult:
+    total_days: int
+    tasks: tuple  # ((工項, 開始工作天, 天數), ...)
+    wall_type: str
+
+    def rows(self):
+        return [{"Task": t, "Start": s, "Duration": d} for t, s, d in self.tasks]
+
+
+def calculate_lite(inp):
+    """Lite 版總工期與工項序列 (工作日累加)"""
+    base_area_ping = inp.base_area_m2 * 0.3025
+    est_total_fa_ping = base_area_ping * 0.65 * (inp.floors_up + inp.floors_down) * 1.4
+    base_area_factor = max(0.8, min(1 + ((base_area_ping - 500) / 100) * 0.02, 1.5))
+    vol_factor = min(1 + ((est_total_fa_ping - 3000) / 5000) * 0.05, 1.2) if est_total_fa_ping > 3000 else 1.0
+    am = base_area_factor * vol_factor
+    is_reverse = inp.method == "逆打工法"
+    wall_type = "鋼板樁" if inp.floors_down <= LITE_WALL_DEPTH else "連續壁"
+    days_per_floor = STRUCT_MAP_ABOVE.get(inp.struct_above, 28)
+    k_usage = 1.1 if inp.b_type in ["辦公大樓", "飯店"] else (0.8 if inp.b_type == "廠房" else 1.0)
+
+    d_prep = 120
+    d_demo = int(60 * am) if inp.has_old_building else 0
+    d_retain = int((int(60 * DW_REALITY_FACTOR) if wall_type == "連續壁" else 30) * am)
+    d_plunge = int(45 * am) if is_reverse else 0
+    d_excav = int(max(inp.base_area_m2 * (inp.floors_down * 3.5) / 300, inp.floors_down * 25 * am))
+    days_bs_floor = 45
+    if is_reverse: d_struct_down = int(inp.floors_down * days_bs_floor * 1.3 * am)
+    else: d_struct_down = int((inp.floors_down * days_bs_floor + inp.floors_down * 10) * am)
+    d_struct_up = int(inp.floors_up * days_per_floor * am * k_usage)
+    d_ext = int(inp.floors_up * 15 * am)
+    d_fit_out_buffer = 90
+    d_insp = 120
+
+    tasks = [("前置作業", 0, d_prep)]
+    day = d_prep
+    if d_demo > 0: tasks.append(("拆除工程", day, d_demo)); day += d_demo
+    tasks.append(("擋土設施", day, d_retain)); day += d_retain
+    if is_reverse:
+        tasks.append(("逆打鋼柱", day, d_plunge)); day += d_plunge
+        d_1f_slab = int(60 * am)
+        tasks.append(("1F結構(逆打)", day, d_1f_slab)); day += d_1f_slab
+        tasks.append(("地下開挖&結構", day, d_excav + d_struct_down))
+        finish_down = day + d_excav + d_struct_down
+        tasks.append(("地上結構", day, d_struct_up))
+        finish_struct_up = day + d_struct_up
+    else:
+        tasks.append(("開挖支撐", day, d_excav)); day += d_excav
+        tasks.append(("地下結構", day, d_struct_down)); day += d_struct_down
+        tasks.append(("地上結構", day, d_struct_up)); finish_struct_up = day + d_struct_up
+        finish_down = day
+
+    start_ext = finish_struct_up - d_struct_up + int(d_struct_up * 0.7)
+    finish_ext = start_ext + d_ext
+    finish_fit_out = finish_ext + d_fit_out_buffer
+    start_fit_out = finish_fit_out - int(d_struct_up * 0.8)
+    tasks.append(("外牆工程", start_ext, d_ext))
+    tasks.append(("室內裝修", start_fit_out, finish_fit_out - start_fit_out))
+    project_finish = max(finish_struct_up, finish_ext, finish_fit_out, finish_down)
+    tasks.append(("驗收使照", project_finish, d_insp))
+    return LiteResult(total_days=project_finish + d_insp, tasks=tuple(tasks), wall_type=wall_type)
@@ -0,0 +1,71 @@
+import datetime
+from dataclasses import fields
+
+import numpy as np
+
+from schedule_batch import batch_arrays
+from schedule_engine import ScheduleInputs, STRUCT_MAP_ABOVE
+
+# ==========================================
+# 🎲 工期風險模擬 (Monte Carlo)
+# ==========================================
+# 對固定係數抽樣後，整批丟進 schedule_batch 向量運算，一次算完所有迭代。
+
+# 預設分佈：三角分佈 (最小, 最可能, 最大)；struct_rate 為地上結構每層天數的倍率
+DEFAULT_DISTRIBUTIONS = {
+    "dw_reality_factor": {"dist": "triangular", "low": 1.5, "mode": 1.75, "high": 2.2},
+    "days_per_floor_bd": {"dist": "triangular", "low": 38, "mode": 45, "high": 60},
+    "struct_rate": {"dist": "triangular", "low": 0.9, "mode": 1.0, "high": 1.3},
+}
+RISK_LABELS = {"dw_reality_factor": "連續壁現實係數", "days_per_floor_bd": "地下結構 天/層", "struct_rate": "地上結構工率倍率"}
+PERCENTILES = (50, 80, 90)
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def _sample(rng, spec, n):
+    dist = spec.get("dist", "triangular")
+    if dist == "triangular":
+        low, mode, high = spec["low"], spec["mode"], spec["high"]
+        if high <= low: return np.full(n, float(mode))
+        return rng.triangular(low, min(max(mode, low), high), high, n)
+    if dist == "uniform": return rng.uniform(spec["low"], spec["high"], n)
+    if dist == "normal": return np.maximum(rng.normal(spec["mean"], spec["sd"], n), spec.get("min", 0.0))
+    raise ValueError(f"未知的分佈型式: {dist}")
+
+
+def _repeat_inputs(inp, n):
+    cols = {}
+    for f in fields(ScheduleInputs):
+        values = np.empty(n, dtype=object)
+        values.fill(getattr(inp, f.name))
+        cols[f.name] = values
+    return cols
+
+
+def simulate_schedule(inp, is_reverse_method, iterations=20000, distributions=None, seed=None):
+    """以抽樣係數跑 N 次排程，回傳完工日分佈與 P50/P80/P90"""
+    distributions = DEFAULT_DISTRIBUTIONS if distributions is None else distributions
+    rng = np.random.default_rng(seed)
+    cols = _repeat_inputs(inp, iterations)
+    samples = {}
+    for name, spec in distributions.items():
+        samples[name] = _sample(rng, spec, iterations)
+        if name == "struct_rate":
+            base = 15 if inp.slab_type == "鋼承板 (Deck)" else STRUCT_MAP_ABOVE.get(inp.struct_above, 28)
+            cols["base_days_per_floor"] = base * samples[name]
+        else: cols[name] = samples[name]
+
+    arrays = batch_arrays(cols, is_reverse_method)
+    finish = arrays["final_finish"]
+    cal_days = arrays["cal_days"]
+    pct = {p: datetime.date.fromordinal(int(np.percentile(finish, p, method="higher"))) for p in PERCENTILES}
+    return {
+        "iterations": iterations,
+        "finish_dates": (finish - _EPOCH_ORDINAL).astype("datetime64[D]"),
+        "cal_days": cal_days,
+        "percentiles": pct,
+        "percentile_cal_days": {p: (d - inp.start_date).days for p, d in pct.items()},
+        "mean_cal_days": float(cal_days.mean()),
+        "samples": samples,
+    }
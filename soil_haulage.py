@@ -0,0 +1,96 @@
+import datetime
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from schedule_engine import area_factors, schedule_nodes, soil_volume_m3, standard_excavation_days
+
+# ==========================================
+# 🚚 出土運棄逐日模擬 (車數 / 趟次 / 時段)
+# ==========================================
+# 每日可運土方 = min(土方車數 × 每車趟次 × 每車載運量, 每日出土管制, 開挖產能)，
+# 每車趟次 = 可運時段 ÷ 單趟循環時間 (取整趟)；不可施工日不運土，週六可另設時段。
+# 整段期間的每日運能以工作日曆旗標一次組成陣列，累計和 (cumsum) 後二分搜尋出土完成日。
+# 與引擎相同，開挖開始日的隔一個工作天起算；運能固定時完成日 = add_workdays(開始, ⌈土方 / 運能⌉)。
+
+EPS = 1e-6
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+LIMIT_PERMIT = "每日出土管制"
+LIMIT_TRUCKS = "車輛運能"
+LIMIT_DIGGING = "開挖產能"
+
+
+@dataclass(frozen=True, slots=True)
+class HaulPlan:
+    volume_m3: float
+    start: datetime.date
+    finish: datetime.date
+    haul_days: int  # 運土工作天
+    daily_capacity: float  # 平日每日可運 m³
+    limited_by: str
+    dates: np.ndarray  # 各運土工作天 (datetime64[D])
+    daily_m3: np.ndarray
+    cum_m3: np.ndarray
+
+    def curve(self):
+        """逐日出土曲線 (DataFrame 欄位)"""
+        return {"日期": self.dates, "出土量(m³)": self.daily_m3, "累計出土(m³)": self.cum_m3}
+
+
+def truck_capacity(trucks, truck_m3, cycle_hours, window_hours):
+    """車隊每日可運 m³：每車只計完整趟次"""
+    if cycle_hours <= 0 or window_hours <= 0: return 0.0
+    return max(int(trucks), 0) * math.floor(window_hours / cycle_hours + EPS) * float(truck_m3)
+
+
+def simulate_haulage(volume_m3, start_date, calendar, trucks, truck_m3, cycle_hours, window_hours,
+                     saturday_hours=None, daily_limit=None, dig_rate=None):
+    """逐日運土模擬；saturday_hours=None 表示週六與平日同時段，daily_limit / dig_rate 為 None 表示不限"""
+    caps = {LIMIT_TRUCKS: truck_capacity(trucks, truck_m3, cycle_hours, window_hours)}
+    if daily_limit: caps[LIMIT_PERMIT] = float(daily_limit)
+    if dig_rate: caps[LIMIT_DIGGING] = float(dig_rate)
+    limited_by = min(caps, key=caps.get)
+    weekday_cap = caps[limited_by]
+    sat_cap = weekday_cap
+    if saturday_hours is not None:
+        sat_cap = min([truck_capacity(trucks, truck_m3, cycle_hours, saturday_hours)] + [v for k, v in caps.items() if k != LIMIT_TRUCKS])
+    start_ord = start_date.toordinal()
+    empty = np.array([], dtype="datetime64[D]")
+    if volume_m3 <= EPS:
+        return HaulPlan(0.0, start_date, start_date, 0, weekday_cap, limited_by, empty, np.zeros(0), np.zeros(0))
+    no_capacity = "每日可運土方為 0，請確認車數、載運量與可運時段"
+    if max(weekday_cap, sat_cap) <= 0: raise ValueError(no_capacity)
+
+    # 先估期間，運能不足 (週六不運、過年等) 時加倍重算
+    span = math.ceil(volume_m3 / max(weekday_cap, sat_cap)) * 2 + 30
+    while True:
+        ords = np.arange(start_ord + 1, start_ord + 1 + span, dtype=np.int64)
+        work = calendar.workday_flags(int(ords[0]), int(ords[-1]))
+        saturday = (ords - 1) % 7 == 5  # date(1,1,1) 為週一
+        cap = np.where(work, np.where(saturday, sat_cap, weekday_cap), 0.0)
+        cum = np.cumsum(cap)
+        if cum[-1] <= 0: raise ValueError(no_capacity)  # 有運能的日子皆不施工 (如僅週六可運但排除週六)
+        if cum[-1] >= volume_m3 - EPS: break
+        span *= 2
+    last = int(np.searchsorted(cum, volume_m3 - EPS, side="left"))
+    hauled = np.minimum(cum[:last + 1], volume_m3)
+    daily = np.diff(hauled, prepend=0.0)
+    keep = work[:last + 1] & (daily > 0)
+    return HaulPlan(
+        volume_m3=float(volume_m3), start=start_date, finish=datetime.date.fromordinal(int(ords[last])),
+        haul_days=int(np.count_nonzero(keep)), daily_capacity=weekday_cap, limited_by=limited_by,
+        dates=(ords[:last + 1][keep] - _EPOCH_ORDINAL).astype("datetime64[D]"), daily_m3=daily[keep], cum_m3=hauled[keep],
+    )
+
+
+def simulate_project_haulage(inp, is_reverse_method, trucks, truck_m3, cycle_hours, window_hours, saturday_hours=None, nodes=None):
+    """本案出土模擬：土方量、開挖開始日、每日管制與開挖產能取自引擎"""
+    nodes = nodes or schedule_nodes(inp, is_reverse_method)
+    volume = soil_volume_m3(inp)
+    d_std = standard_excavation_days(inp, area_factors(inp)[1])
+    daily_limit = inp.daily_soil_limit if inp.enable_soil_limit and inp.daily_soil_limit else None
+    return simulate_haulage(
+        volume, nodes["t_below"]["p6_s"], nodes["work_cal"], trucks, truck_m3, cycle_hours, window_hours,
+        saturday_hours, daily_limit, volume / d_std if d_std > 0 else None,
+    )
@@ -1,13 +1,14 @@
 import streamlit as st
 import datetime
-from datetime import timedelta
-import pandas as pd
-import io
-import plotly.express as px 
-import plotly.graph_objects as go
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from dataclasses import fields
 import math
-import sqlite3
+from history_db import init_db, search_projects, count_projects, delete_from_db, save_estimate, load_estimate, PAGE_SIZE
+from history_import import import_projects
+from excel_report import cached_report_xlsx, phase_report_rows, portfolio_xlsx, XLSX_MIME
+from schedule_engine import ScheduleInputs, IncrementalSchedule, DW_REALITY_FACTOR
+from schedule_cache import cached_calculate_schedule, cache_status_text
+from dwall_schedule import PANEL_DAYS, RIG_METHODS, panel_units, schedule_panels
+from ui_common import pd, px, go, MORANDI_COLORS_SIM  # pandas / plotly 第一次用到才載入
 
 # --- 1. 頁面配置 ---
 st.set_page_config(page_title="建築工期估算系統 v6.92", layout="wide")
@@ -15,69 +16,6 @@ st.set_page_config(page_title="建築工期估算系統 v6.92", layout="wide")
 # ==========================================
 # 💾 資料庫管理模組 (SQLite) - v2
 # ==========================================
-DB_NAME = "construction_history_v2.db"
-
-def init_db():
-    """初始化資料庫"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            save_date TEXT,
-            project_name TEXT,
-            location TEXT,
-            design_unit TEXT,
-            b_type TEXT,
-            struct_above TEXT,
-            base_area REAL,
-            floors_up INTEGER,
-            floors_down REAL,
-            total_cal_days INTEGER,
-            final_finish_date TEXT,
-            note TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-# 保留函數以免報錯
-def save_to_db(data_dict):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO projects (save_date, project_name, location, design_unit, b_type, struct_above, base_area, floors_up, floors_down, total_cal_days, final_finish_date, note)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
-        data_dict['project_name'],
-        data_dict['location'],
-        data_dict['design_unit'],
-        data_dict['b_type'],
-        data_dict['struct_above'],
-        data_dict['base_area'],
-        data_dict['floors_up'],
-        data_dict['floors_down'],
-        data_dict['total_cal_days'],
-        data_dict['final_finish_date'],
-        data_dict['note']
-    ))
-    conn.commit()
-    conn.close()
-
-def load_from_db():
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("SELECT * FROM projects ORDER BY id DESC", conn)
-    conn.close()
-    return df
-
-def delete_from_db(project_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("DELETE FROM projects WHERE id=?", (project_id,))
-    conn.commit()
-    conn.close()
-
 init_db()
 
 # ==========================================
@@ -152,12 +90,31 @@ page_mode = st.sidebar.radio("請選擇功能", ["單案詳細估算", "順打 v
 # ==========================================
 if page_mode == "🗄️ 歷史專案資料庫":
     st.title("🗄️ 歷史專案資料庫")
-    df_history = load_from_db()
-    
-    if not df_history.empty:
-        search_query = st.text_input("🔍 搜尋專案名稱", "")
-        if search_query:
-            df_history = df_history[df_history['project_name'].str.contains(search_query, case=False)]
+
+    with st.expander("📥 批次匯入歷史資料 (Excel / CSV)", expanded=False):
+        import_file = st.file_uploader("選擇檔案 (表頭需含「工程名稱」，其餘欄位依名稱自動對應)", type=["xlsx", "xlsm", "csv"], key="hist_import_file")
+        if import_file is not None and st.button("開始匯入", key="hist_import_go"):
+            import_bar = st.progress(0.0, text="匯入中...")
+            try:
+                report = import_projects(
+                    import_file,
+                    progress=lambda n, f: import_bar.progress(f or 0.0, text=f"已讀取 {n:,} 列"),
+                )
+                st.success(f"匯入完成：寫入 {report['inserted']:,} 列，略過 {report['skipped']:,} 列")
+                if report["errors"]:
+                    st.dataframe(pd.DataFrame(report["errors"], columns=["列", "原因"]), hide_index=True, use_container_width=True)
+            except ValueError as e:
+                st.error(f"匯入失敗：{e}")
+
+    if count_projects():
+        search_query = st.text_input("🔍 搜尋專案 (名稱/地點/設計單位)", "").strip()
+        # 伺服器端搜尋 + keyset 分頁：cursors 存每頁的起點 id，換關鍵字時歸零
+        if st.session_state.get("hist_query") != search_query:
+            st.session_state.hist_query = search_query
+            st.session_state.hist_cursors = [None]
+        cursors = st.session_state.hist_cursors
+        total = count_projects(search_query)
+        df_history = search_projects(search_query, PAGE_SIZE, cursors[-1])
         
         st.dataframe(
             df_history, 
@@ -172,6 +129,42 @@ if page_mode == "🗄️ 歷史專案資料庫":
             use_container_width=True,
             hide_index=True
         )
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("⬅️ 上一頁", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with p2:
+            st.caption(f"第 {len(cursors)} / {max(1, -(-total // PAGE_SIZE))} 頁，共 {total} 筆")
+        with p3:
+            if st.button("下一頁 ➡️", disabled=len(cursors) * PAGE_SIZE >= total):
+                cursors.append(int(df_history['id'].min()))
+                st.rerun()
+
+        with st.expander("📦 匯出專案組合報表 (Excel)", expanded=False):
+            scope_text = "目前搜尋結果" if search_query else "全部專案"
+            st.caption(f"總表依工期排名 + 每案一張詳細工期報告；範圍：{scope_text} {total} 筆")
+            if st.button("產生專案組合報表", key="hist_portfolio_make"):
+                with st.spinner("匯出中..."):
+                    portfolio_bytes = portfolio_xlsx(search_query)
+                st.download_button(
+                    "📥 下載專案組合報表",
+                    data=portfolio_bytes,
+                    file_name=f"專案組合報表_{datetime.date.today()}.xlsx",
+                    mime=XLSX_MIME,
+                )
+
+        with st.expander("📋 查看工項明細 / 估算參數", expanded=False):
+            detail_labels = dict(zip(df_history['id'], df_history['project_name'].fillna("") + " (ID:" + df_history['id'].astype(str) + ")"))
+            detail_id = st.selectbox("選擇專案", list(detail_labels), format_func=detail_labels.get, key="hist_detail")
+            estimate = load_estimate(int(detail_id)) if detail_id is not None else None
+            if estimate and estimate["phases"]:
+                st.caption("工法：" + ("逆打" if estimate["is_reverse"] else "順打"))
+                st.dataframe(pd.DataFrame([p.to_dict() for p in estimate["phases"]]), hide_index=True, use_container_width=True)
+                input_rows = [[f.name, str(getattr(estimate["inputs"], f.name))] for f in fields(estimate["inputs"])]
+                st.dataframe(pd.DataFrame(input_rows, columns=["參數", "值"]), hide_index=True, use_container_width=True)
+            elif estimate:
+                st.caption("此筆為舊版紀錄，未保存工項明細。")
         
         st.markdown("### 🗑️ 管理資料")
         d1, d2 = st.columns([3, 1])
@@ -205,7 +198,7 @@ with info_c3:
     design_unit = st.text_input("設計單位", placeholder="例如：某某建築師事務所")
 
 # 全域變數
-dw_reality_factor = 1.75
+dw_reality_factor = DW_REALITY_FACTOR
 
 # --- 參數輸入區 ---
 st.subheader("📋 建築規模參數")
@@ -372,7 +365,6 @@ with st.expander("點擊展開/隱藏 一般參數面板", expanded=True):
     g1, g2, g3 = st.columns(3)
     selected_wall = None
     selected_support = None
-    excavation_map_val = 1.0 
     rw_aux_options = []
     with g1:
         wall_type_options = ["連續壁 (Diaphragm Wall)", "全套管切削樁 (All-Casing)", "預壘樁/排樁 (PIP/Soldier Pile)", "鋼板樁 (Sheet Pile)", "鋼軌樁 (H-Pile)", "無 (純明挖/放坡)"]
@@ -382,27 +374,13 @@ with st.expander("點擊展開/隱藏 一般參數面板", expanded=True):
         selected_support = st.selectbox("B. 支撐/開挖方式", support_type_options, index=default_idx, placeholder="請選擇...")
         excavation_system = f"{selected_wall} + {selected_support}" if (selected_wall and selected_support) else "未選擇"
         
-        wall_factors = {
-            "連續壁 (Diaphragm Wall)": 1.0, 
-            "全套管切削樁 (All-Casing)": 0.95, 
-            "預壘樁/排樁 (PIP/Soldier Pile)": 0.85, 
-            "鋼板樁 (Sheet Pile)": 0.70, 
-            "鋼軌樁 (H-Pile)": 0.75,
-            "無 (純明挖/放坡)": 0.50
-        }
-        support_factors = {"型鋼內支撐 (Strut)": 1.0, "地錨 (Anchor)": 0.8, "結構樓板 (逆打標準)": 1.0, "島式工法 (Island Method)": 1.25, "斜坡/明挖 (Slope/Open Cut)": 0.6}
-        
-        if selected_wall and selected_support:
-            w_fac = wall_factors.get(selected_wall, 1.0)
-            s_fac = support_factors.get(selected_support, 1.0)
-            if "島式" in selected_support: excavation_map_val = w_fac * s_fac 
-            else: excavation_map_val = (w_fac + s_fac) / 2
         if selected_wall and "連續壁" in selected_wall:
             rw_aux_options = st.multiselect("連續壁輔助措施", ["地中壁 (Cross Wall)", "扶壁 (Buttress Wall)"])
     with g2:
         foundation_type = st.selectbox("基礎型式", ["標準筏式基礎 (無基樁)", "筏式基礎 + 一般鑽掘/預力樁", "筏式基礎 + 全套管基樁 (工期長)", "筏式基礎 + 壁樁 (Barrette)", "筏式基礎 + 微型樁 (工期短)", "獨立基腳 (無地下室)"], index=None, placeholder="請選擇...")
         
     # 連續壁詳細
+    dw_retain_days = 0
     if selected_wall and "連續壁" in selected_wall:
         with st.expander("🧱 工具：連續壁工期詳細試算 (點擊展開)", expanded=False):
             st.markdown("##### 📏 連續壁施作工期詳細估算")
@@ -423,6 +401,9 @@ with st.expander("點擊展開/隱藏 一般參數面板", expanded=True):
                 qty_rect_pile = st.number_input("矩形壁樁 (單元)", value=0)
                 default_bf = int(floors_down) if floors_down > 0 else 4
                 basement_floors_calc = st.number_input("結構體養護-地下室層數", value=default_bf, min_value=1)
+                st.markdown("---")
+                dw_rigs = st.number_input("成槽機台數 (抓斗/銑溝機)", min_value=1, value=1, step=1, key="dw_rigs")
+                dw_method = st.selectbox("單元分派方式", RIG_METHODS, key="dw_method")
             with dw_col2:
                 schedule_dw_data = [
                     {"項目": "擋土假設樁", "數量": qty_pile_temp, "單位": "M", "工率": "200 M/天", "工作天": math.ceil(qty_pile_temp/200)},
@@ -443,13 +424,22 @@ with st.expander("點擊展開/隱藏 一般參數面板", expanded=True):
                 df_schedule_dw = pd.DataFrame(schedule_dw_data)
                 df_display = df_schedule_dw[df_schedule_dw['數量'] > 0] if not df_schedule_dw[df_schedule_dw['數量'] > 0].empty else pd.DataFrame(columns=["項目", "數量", "單位", "工率", "工作天"])
                 st.dataframe(df_display, use_container_width=True, hide_index=True)
-                raw_work_days_dw = df_schedule_dw["工作天"].sum()
+                # 單元工項由多台機具平行施作，其餘前置工項依序
+                panel_plan = schedule_panels(*panel_units({
+                    "連續壁主體": qty_dw_main, "連續壁共構樁": qty_dw_co, "無筋扶壁": qty_buttress, "地中壁": qty_mid_wall, "矩形壁樁": qty_rect_pile,
+                }), dw_rigs, dw_method)
+                serial_work_days = df_schedule_dw.loc[~df_schedule_dw["項目"].isin(PANEL_DAYS), "工作天"].sum()
+                raw_work_days_dw = serial_work_days + panel_plan.makespan
                 adjusted_work_days = raw_work_days_dw 
                 calendar_factor = st.slider("日曆天換算係數 (工作天 x 係數)", 1.0, 1.5, 1.15, 0.01, key="dw_factor")
                 total_cal_days_dw = math.ceil(adjusted_work_days * calendar_factor)
-                st.markdown(f"**累計純工作天**: {raw_work_days_dw} 天")
+                st.markdown(f"**累計純工作天**: {raw_work_days_dw} 天 (前置 {serial_work_days} 天 + 成槽 {panel_plan.makespan} 天 / {dw_rigs} 台)")
+                if dw_rigs > 1 and panel_plan.kinds:
+                    st.dataframe(pd.DataFrame(panel_plan.rig_rows()), use_container_width=True, hide_index=True)
                 st.info(f"📊 **試算結果：連續壁工期約 {total_cal_days_dw} 天**")
-                st.markdown(f"💡 若您希望採用此結果，請將 `{total_cal_days_dw}` 填入下方的 **「廠商工期覆蓋」** > **「擋土壁施作工期」** 欄位中。")
+                # 覆蓋欄位以工作天計 (引擎再依日曆換算)，帶入純工作天而非換算後的日曆天
+                if st.checkbox("自動帶入擋土壁施作工期", value=True, key="dw_apply"): dw_retain_days = int(raw_work_days_dw)
+                else: st.markdown(f"💡 若您希望採用此結果，請將 `{total_cal_days_dw}` 填入下方的 **「廠商工期覆蓋」** > **「擋土壁施作工期」** 欄位中。")
 
     # Section 5
     st.markdown("<div class='section-header'>5. 外觀與機電裝修</div>", unsafe_allow_html=True)
@@ -469,6 +459,10 @@ with st.expander("🔧 進階：廠商工期覆蓋 (選填/點擊展開)", expan
         over_c1, over_c2 = st.columns(2)
         with over_c1:
             manual_retain_days = st.number_input("擋土壁施作工期 (天)", min_value=0, help="覆蓋系統計算")
+            # 未手動填寫時採用連續壁試算結果
+            if manual_retain_days == 0 and dw_retain_days > 0:
+                manual_retain_days = dw_retain_days
+                st.caption(f"採用連續壁試算：{dw_retain_days} 工作天")
         with over_c2:
             manual_crane_days = st.number_input("塔吊/鋼構吊裝工期 (天)", min_value=0, help="覆蓋系統計算")
 
@@ -513,270 +507,29 @@ if risk_reasons:
         st.markdown(f"""<div class='info-box'><b>✅ 設定完成：</b>已針對以下條件納入緩衝期：<br>{reasons_str}<br>已加入 <b>{manual_review_days_input} 天</b>。</div>""", unsafe_allow_html=True)
 
 # 核心運算
-def calculate_project_schedule(is_reverse_method):
-    base_area_factor = max(0.8, min(1 + ((base_area_ping - 500) / 100) * 0.02, 1.5))
-    vol_factor = 1.0
-    if total_fa_ping > 3000:
-        vol_factor = 1 + ((total_fa_ping - 3000) / 5000) * 0.05
-        vol_factor = min(vol_factor, 1.2)
-    area_multiplier = base_area_factor * vol_factor
-
-    struct_map_above = {"RC造": 28, "SRC造": 25, "SS造": 18, "SC造": 21}
-    if slab_type == "鋼承板 (Deck)": base_days_per_floor = 15  
-    else: base_days_per_floor = struct_map_above.get(struct_above, 28)
-
-    k_usage_base = {"住宅": 1.0, "集合住宅 (多棟)": 1.0, "辦公大樓": 1.1, "飯店": 1.4, "百貨": 1.1, "廠房": 0.8, "醫院": 1.4}.get(b_type, 1.0)
-    multi_building_factor = 1.0
-    if "集合住宅" in str(b_type) and building_count > 1:
-        multi_building_factor = 1.0 + (building_count - 1) * 0.03
-    k_usage = k_usage_base * multi_building_factor
-
-    ext_wall_map = {"標準磁磚/塗料": 1.3, "石材吊掛 (工期較長)": 1.1, "玻璃帷幕 (工期較短)": 0.8, "預鑄PC板": 0.85, "金屬三明治板 (極快)": 0.85}
-    ext_wall_multiplier = ext_wall_map.get(ext_wall, 1.0)
-    excav_multiplier = excavation_map_val
-    aux_wall_factor = 0
-    if "地中壁" in str(rw_aux_options): aux_wall_factor += 0.20
-    if "扶壁" in str(rw_aux_options): aux_wall_factor += 0.10
-
-    add_review_days = manual_review_days_input if enable_manual_review else 0
-    if prep_type_select and "自訂" in prep_type_select and prep_days_custom is not None: d_prep_base = int(prep_days_custom)
-    else: d_prep_base = 120 if "一般" in str(prep_type_select) else 210 if "鄰捷運" in str(prep_type_select) else 300
-    d_prep = d_prep_base + add_review_days
-    prep_note = f"含危評 (+{add_review_days}天)" if add_review_days > 0 else "要徑"
-
-    demo_note = "純空地"
-    if site_condition and "純空地" in site_condition: d_demo = 0
-    elif is_deep_demo or ("有舊建物" in str(site_condition)):
-        if site_condition and "無地下室" in site_condition: 
-            d_demo = int(55 * area_multiplier)
-            demo_note = "地上拆除"
-        else:
-            if "全套管切削" in str(obstruction_method): 
-                d_demo = int((180 + 45) * area_multiplier)
-                demo_note = "全套管清障"
-            elif "深導溝" in str(obstruction_method):
-                if deep_gw_seq and "先回填" in deep_gw_seq: 
-                    d_demo = int(180 * area_multiplier)
-                    demo_note = "先回填"
-                else: 
-                    d_demo = int(150 * area_multiplier)
-                    demo_note = "邊回填"
-            else: 
-                d_demo = int(135 * area_multiplier)
-                demo_note = "舊地下室破除"
-    else: d_demo = 0
-
-    d_soil = int((30 if "局部" in str(soil_improvement) else 60 if "全區" in str(soil_improvement) else 0) * area_multiplier)
-
-    foundation_add = 0
-    if foundation_type and "全套管" in foundation_type: foundation_add = 90
-    elif foundation_type and "壁樁" in foundation_type: foundation_add = 80
-    elif foundation_type and "一般鑽掘" in foundation_type: foundation_add = 60
-    elif foundation_type and "微型樁" in foundation_type: foundation_add = 30
-
-    d_aux_wall_days = int(60 * aux_wall_factor)
-    d_dw_setup = 0 
-    dw_note_str = ""
-    # [v6.89] 修正 Base Retain Logic
-    if selected_wall and "連續壁" in selected_wall:
-        base_retain = int(60 * dw_reality_factor)
-        dw_note_str = "連續壁(含係數)"
-    elif selected_wall and "全套管" in selected_wall: 
-        base_retain = 50
-        dw_note_str = "全套管"
-    elif selected_wall and "預壘樁" in selected_wall: 
-        base_retain = 40
-        dw_note_str = "預壘樁"
-    elif selected_wall and "鋼板樁" in selected_wall: 
-        base_retain = 25
-        dw_note_str = "鋼板樁"
-    elif selected_wall and "鋼軌樁" in selected_wall: 
-        base_retain = 30
-        dw_note_str = "鋼軌樁"
-    else: 
-        base_retain = 15
-        dw_note_str = "一般"
-
-    d_plunge_col = 0
-    if is_reverse_method: 
-        d_plunge_col = int(45 * area_multiplier) 
-        dw_note_str += " + 中間柱"
-
-    if manual_retain_days > 0: 
-        d_retain_work = manual_retain_days
-        excav_str_display = "依廠商預估"
-    else: 
-        d_retain_work = int((base_retain * area_multiplier) + d_dw_setup + d_aux_wall_days + d_plunge_col)
-        excav_str_display = f"{dw_note_str}"
-        if aux_wall_factor > 0: excav_str_display += " (+輔助)"
-
-    d_excav_std = int((floors_down * 22 * excav_multiplier) * area_multiplier) 
-    excav_note = "出土/支撐"
-    if enable_soil_limit and daily_soil_limit:
-        if is_complex_excavation: total_soil_m3 = complex_soil_vol * 1.25 
-        else: total_soil_m3 = base_area_m2 * (floors_down * 3.5) * 1.25
-        d_excav_limited = math.ceil(total_soil_m3 / daily_soil_limit)
-        d_excav_phase = max(d_excav_std, d_excav_limited)
-        if d_excav_limited > d_excav_std: excav_note = f"限每日{daily_soil_limit}m³"
-    else:
-        d_excav_phase = d_excav_std
-
-    d_strut_install = 0
-    strut_note = "開挖併行"
-    if is_reverse_method: 
-        d_strut_install = 0 
-        d_earth_work = d_excav_phase
-        strut_note = "樓板支撐"
-    elif (selected_support and "斜坡" in selected_support) or (selected_wall and "無" in selected_wall):
-        d_strut_install = 0
-        d_earth_work = d_excav_phase
-        strut_note = "明挖/斜坡"
-    else:
-        d_strut_install = d_excav_phase
-        d_earth_work = d_excav_phase
+schedule_inputs = ScheduleInputs(
+    start_date=start_date_val, b_type=b_type, struct_above=struct_above, slab_type=slab_type,
+    base_area_m2=base_area_m2, total_fa_m2=total_fa_m2,
+    calc_floors_struct=calc_floors_struct, display_max_floor=display_max_floor, building_count=building_count,
+    floors_down=floors_down, is_complex_excavation=is_complex_excavation, complex_soil_vol=complex_soil_vol,
+    enable_soil_limit=enable_soil_limit, daily_soil_limit=daily_soil_limit,
+    site_condition=site_condition, obstruction_method=obstruction_method, deep_gw_seq=deep_gw_seq,
+    soil_improvement=soil_improvement, prep_type_select=prep_type_select, prep_days_custom=prep_days_custom,
+    enable_manual_review=enable_manual_review, manual_review_days=manual_review_days_input,
+    selected_wall=selected_wall, selected_support=selected_support, rw_aux_options=rw_aux_options,
+    foundation_type=foundation_type, ext_wall=ext_wall, scope_options=scope_options,
+    manual_retain_days=manual_retain_days, manual_crane_days=manual_crane_days,
+    exclude_sat=exclude_sat, exclude_sun=exclude_sun, exclude_cny=exclude_cny,
+    dw_reality_factor=dw_reality_factor, compound_building_factor=True, plunge_label="中間柱",
+)
+
+# 每個 session 順打/逆打各一份增量運算，改一個輸入只重算其下游工項
+schedule_graphs = st.session_state.setdefault("schedule_graphs", {})
 
-    days_per_floor_bd = 45 
-    days_per_strut_remove = 10
-    if (selected_support and "斜坡" in selected_support) or (selected_wall and "無" in selected_wall) or is_reverse_method:
-        d_strut_removal = 0
-    else:
-        d_strut_removal = floors_down * days_per_strut_remove
-
-    struct_efficiency_factor = 1.3 if is_reverse_method else 1.0 
-    d_struct_below_raw = ((floors_down * days_per_floor_bd * struct_efficiency_factor) + d_strut_removal + foundation_add)
-    d_struct_below = int(d_struct_below_raw * area_multiplier)
-
-    struct_note_base = f"{days_per_floor_bd}天/層"
-    if is_reverse_method: struct_note_base += " x 1.3(逆打)"
-    if d_strut_removal > 0: struct_note_base += f" + 拆撐{days_per_strut_remove}天"
-    
-    d_struct_body = int(calc_floors_struct * base_days_per_floor * area_multiplier * k_usage)
-    d_ext_wall = int(calc_floors_struct * 15 * area_multiplier * ext_wall_multiplier * k_usage)
-    d_mep = int((60 + calc_floors_struct * 2) * area_multiplier * k_usage) if "機電管線工程" in scope_options else 0
-    d_fit_out = int((60 + calc_floors_struct * 10) * area_multiplier * k_usage) if "室內裝修工程" in scope_options else 0
-    fit_out_note = "外牆後3個月完成"
-    d_landscape = int(75 * base_area_factor) if "景觀工程" in scope_options else 0
-    d_insp = 150 if b_type in ["百貨", "醫院", "飯店"] else 120 
-    insp_note = "標準驗收"
-    if "集合住宅" in str(b_type): d_insp += (building_count - 1) * 15
-
-    d_tower_crane = 60
-    crane_note = "含安檢"
-    if manual_crane_days > 0: 
-        d_tower_crane = manual_crane_days
-        crane_note = "廠商預估"
-    needs_tower_crane = (struct_above in ["SS造", "SC造", "SRC造"]) or (display_max_floor >= 15)
-    if not needs_tower_crane: d_tower_crane = 0
-
-    def get_end(start, days):
-        curr = start
-        if days <= 0: return curr
-        added = 0
-        while added < days:
-            curr += timedelta(days=1)
-            if exclude_sat and curr.weekday() == 5: continue
-            if exclude_sun and curr.weekday() == 6: continue
-            if exclude_cny and curr.month == 2 and 1 <= curr.day <= 7: continue
-            added += 1
-        return curr
-    
-    def get_start_from_end(end, days): 
-        curr = end
-        if days <= 0: return curr
-        subtracted = 0
-        while subtracted < days:
-            curr -= timedelta(days=1)
-            is_work = True
-            if exclude_sat and curr.weekday() == 5: is_work = False
-            elif exclude_sun and curr.weekday() == 6: is_work = False
-            elif exclude_cny and curr.month == 2 and 1 <= curr.day <= 7: is_work = False
-            if is_work: subtracted += 1
-        return curr
-
-    p1_s = start_date_val
-    p1_e = get_end(p1_s, d_prep)
-    p2_s = p1_e + timedelta(days=1)
-    p2_e = get_end(p2_s, d_demo)
-    p_soil_s = p2_e + timedelta(days=1)
-    p_soil_e = get_end(p_soil_s, d_soil)
-    p4_s = p_soil_e + timedelta(days=1)
-    p4_e = get_end(p4_s, d_retain_work)
-    p5_s = p4_e + timedelta(days=1)
-    p5_e = get_end(p5_s, d_strut_install)
-    p6_s = p5_s 
-
-    if is_reverse_method:
-        lag_excav = int(30 * area_multiplier)
-        p7_s = get_end(p6_s, lag_excav)
-        p7_e = get_end(p7_s, d_struct_below)
-        target_excav_end = p7_e - timedelta(days=20) 
-        std_excav_end = get_end(p6_s, d_earth_work)
-        p6_e = max(target_excav_end, std_excav_end) 
-        cal_diff = (p6_e - p6_s).days
-        avg_ratio = 5/7 if exclude_sat and exclude_sun else 6/7 if exclude_sun else 1.0
-        d_earth_work_display = int(cal_diff * avg_ratio) 
-        lag_1f_slab = int(60 * area_multiplier)
-        p8_s_pre = get_end(p6_s, lag_1f_slab) 
-        struct_note_below = f"併行 ({struct_note_base})"
-        struct_note_above = f"併行 ({display_max_floor}F)"
-        excav_note = "配合逆打"
-    else:
-        p6_e = get_end(p6_s, d_earth_work)
-        d_earth_work_display = d_earth_work
-        p_excav_finish = max(p5_e, p6_e)
-        p7_s = p_excav_finish + timedelta(days=1)
-        p7_e = get_end(p7_s, d_struct_below)
-        p8_s_pre = p7_e + timedelta(days=1)
-        struct_note_below = f"要徑 ({struct_note_base})"
-        struct_note_above = f"順打 ({display_max_floor}F)"
-
-    p_tower_s = p1_s 
-    p_tower_e = p1_s
-    if needs_tower_crane:
-        p_tower_e = p8_s_pre - timedelta(days=1)
-        p_tower_s = p_tower_e - timedelta(days=25) 
-        p_tower_e = get_end(p_tower_s, d_tower_crane)
-        p8_s = max(p8_s_pre, p_tower_e + timedelta(days=1))
-    else:
-        p8_s = p8_s_pre
-
-    p8_e = get_end(p8_s, d_struct_body)
-    lag_ext = int(d_struct_body * 0.7) 
-    p_ext_s = get_end(p8_s, lag_ext)
-    p_ext_e = get_end(p_ext_s, d_ext_wall)
-    lag_mep = int(d_struct_body * 0.3) 
-    p10_s = get_end(p8_s, lag_mep)
-    p10_e = get_end(p10_s, d_mep)
-    p11_e = p_ext_e + timedelta(days=90) 
-    p11_s = get_start_from_end(p11_e, d_fit_out)
-    p12_s = p_ext_e - timedelta(days=15) 
-    p12_e = get_end(p12_s, d_landscape)
-    p13_s = max(p_ext_e, p10_e, p11_e, p12_e) - timedelta(days=30)
-    p13_e = get_end(p13_s, d_insp)
-
-    final_finish = max(p7_e, p8_e, p_ext_e, p10_e, p11_e, p12_e, p13_e)
-    cal_days = (final_finish - p1_s).days
-    eff_days = int(cal_days * (5/7 if exclude_sat and exclude_sun else 6/7))
-
-    s_data = [
-        {"工項": "1.前期", "天數": d_prep, "Start": p1_s, "Finish": p1_e, "備註": prep_note},
-        {"工項": "2.拆除", "天數": d_demo, "Start": p2_s, "Finish": p2_e, "備註": demo_note},
-        {"工項": "3.地改", "天數": d_soil, "Start": p_soil_s, "Finish": p_soil_e, "備註": "地質改良"},
-        {"工項": "4.擋土壁", "天數": d_retain_work, "Start": p4_s, "Finish": p4_e, "備註": excav_str_display},
-        {"工項": "5.支撐", "天數": d_strut_install, "Start": p5_s, "Finish": p5_e, "備註": strut_note},
-        {"工項": "6.開挖", "天數": d_earth_work_display, "Start": p6_s, "Finish": p6_e, "備註": excav_note},
-        {"工項": "7.地下結構", "天數": d_struct_below, "Start": p7_s, "Finish": p7_e, "備註": struct_note_below},
-        {"工項": "8.地上結構", "天數": d_struct_body, "Start": p8_s, "Finish": p8_e, "備註": struct_note_above},
-        {"工項": "9.外牆", "天數": d_ext_wall, "Start": p_ext_s, "Finish": p_ext_e, "備註": f"70%進場"},
-        {"工項": "10.機電", "天數": d_mep, "Start": p10_s, "Finish": p10_e, "備註": "30%進場"},
-        {"工項": "11.裝修", "天數": d_fit_out, "Start": p11_s, "Finish": p11_e, "備註": fit_out_note},
-        {"工項": "12.景觀", "天數": d_landscape, "Start": p12_s, "Finish": p12_e, "備註": "收尾工程"},
-        {"工項": "13.驗收", "天數": d_insp, "Start": p13_s, "Finish": p13_e, "備註": insp_note},
-    ]
-    if needs_tower_crane:
-        s_data.append({"工項": "7.5 塔吊", "天數": d_tower_crane, "Start": p_tower_s, "Finish": p_tower_e, "備註": crane_note})
-    
-    return eff_days, cal_days, final_finish, s_data
+def calculate_project_schedule(is_reverse_method):
+    incremental = schedule_graphs.setdefault(bool(is_reverse_method), IncrementalSchedule())
+    result = cached_calculate_schedule(schedule_inputs, is_reverse_method, incremental)
+    return result.eff_days, result.cal_days, result.final_finish, result.s_data()
 
 # 比較模式
 if page_mode == "順打 vs 逆打 比較":
@@ -842,12 +595,10 @@ else:
     st.dataframe(sched_df[["工項", "天數", "預計開始", "預計完成", "備註"]], hide_index=True, use_container_width=True)
 
     st.subheader("📊 專案進度甘特圖")
-    # [v6.92] Morandi Colors
-    morandi_colors = ["#8E9EAB", "#D4A5A5", "#96B3C2", "#B9C0C9", "#E0C9A6", "#A9B7C0", "#C4B7D7", "#8FA691", "#D9B48F", "#BFD7D1", "#E3D0B9", "#99A8A5", "#D6C6B0", "#B0A3D2", "#ABC3C5"]
     fig = px.timeline(
         sched_df, x_start="Start", x_end="Finish", y="工項", color="工項", text="工項",
         title=f"【{project_name}】工程進度模擬",
-        color_discrete_sequence=morandi_colors
+        color_discrete_sequence=MORANDI_COLORS_SIM
     )
     fig.update_traces(textposition='inside', insidetextanchor='start', opacity=0.9)
     fig.update_yaxes(autorange="reversed")
@@ -890,11 +641,7 @@ else:
         ["[ 進度分析 ]", ""]
     ]
 
-    for item in s_data:
-        if item["天數"] > 0:
-            s_date = str(item['Start']) if enable_date else "未定"
-            e_date = str(item['Finish']) if enable_date else "未定"
-            report_rows.append([item["工項"], f"{item['天數']} 天", f"{s_date} ~ {e_date}", item.get('備註','')])
+    report_rows += phase_report_rows(s_data, enable_date)
 
     report_rows.extend([
         ["", "", "", ""],
@@ -904,38 +651,21 @@ else:
         ["預估完工日期", str(final_date if enable_date else "日期未定"), "", ""]
     ])
 
-    df_export = pd.DataFrame(report_rows, columns=["項目", "數值/天數", "日期區間", "備註"])
-    buffer = io.BytesIO()
-
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        df_export.to_excel(writer, index=False, sheet_name='詳細工期報告')
-        worksheet = writer.sheets['詳細工期報告']
-        header_fill = PatternFill(start_color="2D2926", end_color="2D2926", fill_type="solid")
-        header_font = Font(name='微軟正黑體', size=12, bold=True, color="FFB81C")
-        section_fill = PatternFill(start_color="EFEFEF", end_color="EFEFEF", fill_type="solid")
-        section_font = Font(name='微軟正黑體', size=11, bold=True)
-        highlight_fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
-        normal_font = Font(name='微軟正黑體', size=11)
-        worksheet.column_dimensions['A'].width = 30
-        worksheet.column_dimensions['B'].width = 20
-        worksheet.column_dimensions['C'].width = 30
-        worksheet.column_dimensions['D'].width = 25
-        for row_idx, row in enumerate(worksheet.iter_rows(min_row=1, max_row=worksheet.max_row), 1):
-            for cell in row:
-                cell.font = normal_font
-                cell.alignment = Alignment(horizontal='left', vertical='center')
-                if row_idx == 1:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                if cell.value and isinstance(cell.value, str) and "[" in cell.value:
-                    cell.fill = section_fill
-                    cell.font = section_font
-                if cell.value == "[ 總結結果 ]":
-                    cell.fill = header_fill
-                    cell.font = header_font
-                if cell.value == "預估完工日期":
-                    cell.font = Font(name='微軟正黑體', size=12, bold=True, color="FF4438")
-                    cell.fill = highlight_fill
-
-    st.download_button(label="📊 下載 Excel 報表", data=buffer.getvalue(), file_name=f"{project_name}_工期.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
\ No newline at end of file
+    # 按下才產生 (write-only + NamedStyle)；內容未變時直接用快取
+    xlsx_bytes = cached_report_xlsx(report_rows, build=False)
+    if xlsx_bytes is None and st.button("📊 產生 Excel 報表"):
+        xlsx_bytes = cached_report_xlsx(report_rows)
+    if xlsx_bytes is not None:
+        st.download_button(label="📊 下載 Excel 報表", data=xlsx_bytes, file_name=f"{project_name}_工期.xlsx", mime=XLSX_MIME)
+
+    if st.button("💾 存入歷史資料庫"):
+        summary = {
+            "project_name": project_name, "location": project_location, "design_unit": design_unit,
+            "b_type": b_type_str, "struct_above": struct_above, "base_area": float(base_area_m2),
+            "floors_up": int(display_max_floor), "floors_down": float(floors_down),
+            "total_cal_days": int(cal_days), "final_finish_date": str(final_date), "note": b_method,
+        }
+        pid = save_estimate(summary, schedule_inputs, cached_calculate_schedule(schedule_inputs, is_reverse), is_reverse)
+        st.success(f"已存入歷史資料庫 (ID:{pid})")
+
+st.sidebar.caption(cache_status_text())
\ No newline at end of file
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# 專案為平鋪模組 (無套件)，測試從 repo 根目錄匯入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """歷史資料庫切到暫存檔，測試結束後切回原檔"""
+    import history_db
+    original = history_db.DB_NAME
+    history_db.configure(str(tmp_path / "history.db"))
+    yield history_db
+    history_db.configure(original)
@@ -0,0 +1,349 @@
+import datetime
+import math
+from datetime import timedelta
+
+from schedule_engine import (
+    ScheduleInputs, Phase, ScheduleResult, STRUCT_MAP_ABOVE, USAGE_FACTORS, EXT_WALL_MAP, DEFAULT_SCOPE,
+    excavation_multiplier, LiteResult,
+)
+
+# ==========================================
+# 🧪 對照用參考實作 (舊版逐日迴圈 / 改寫前的引擎)
+# ==========================================
+# 測試以固定亂數種子產生輸入，比對新路徑與這裡的舊寫法；這裡的程式碼不應隨引擎一起修改。
+
+B_TYPES = list(USAGE_FACTORS)
+STRUCT_ABOVE = list(STRUCT_MAP_ABOVE)
+SLAB_TYPES = ["一般 RC 樓版", "鋼承板 (Deck)"]
+SITE_CONDITIONS = ["純空地 (無須拆除)", "有舊建物 (無地下室)", "有舊建物 (含舊地下室)", "僅存舊地下室 (需回填/破除)", None]
+OBSTRUCTION = ["一般怪手破除", "深導溝 (Deep Guide Wall)", "全套管切削 (All-Casing)", None]
+DEEP_GW_SEQ = ["先回填後施作 (標準)", "邊回填邊施作 (重疊)", "無", None]
+SOIL_IMPROVEMENT = ["無", "局部改良 (JSP/CCP)", "全區改良", None]
+PREP_TYPES = ["一般 (120天)", "鄰捷運 (180-240天)", "大型公共工程/環評 (300天+)", "自訂", None]
+WALLS = ["連續壁 (Diaphragm Wall)", "全套管切削樁 (All-Casing)", "預壘樁/排樁 (PIP/Soldier Pile)", "鋼板樁 (Sheet Pile)", "鋼軌樁 (H-Pile)",
+         "無 (純明挖/放坡)", None]
+SUPPORTS = ["型鋼內支撐 (Strut)", "地錨 (Anchor)", "島式工法 (Island Method)", "斜坡/明挖 (Slope/Open Cut)", "結構樓板 (逆打標準)", None]
+AUX_OPTIONS = ["地中壁 (Cross Wall)", "扶壁 (Buttress Wall)"]
+FOUNDATIONS = ["標準筏式基礎 (無基樁)", "筏式基礎 + 一般鑽掘/預力樁", "筏式基礎 + 全套管基樁 (工期長)", "筏式基礎 + 壁樁 (Barrette)",
+               "筏式基礎 + 微型樁 (工期短)", "獨立基腳 (無地下室)", None]
+EXT_WALLS = list(EXT_WALL_MAP) + [None]
+
+
+def _pick(rng, options):
+    return options[rng.randrange(len(options))]
+
+
+def random_inputs(rng, floor_cycle=False):
+    """亂數 ScheduleInputs (rng 為 random.Random)；floor_cycle=False 時不啟用逐層循環 (參考引擎不支援)"""
+    floors_up = rng.randint(1, 60)
+    floors_roof = rng.randint(0, 3)
+    floors_down = rng.choice([rng.randint(0, 8), rng.randint(0, 16) / 2])
+    is_complex = rng.random() < 0.2
+    return ScheduleInputs(
+        start_date=datetime.date(2000, 1, 1) + timedelta(days=rng.randrange(365 * 90)),
+        b_type=_pick(rng, B_TYPES),
+        struct_above=_pick(rng, STRUCT_ABOVE + [None]),
+        slab_type=_pick(rng, SLAB_TYPES),
+        base_area_m2=round(rng.uniform(100, 20000), 1),
+        total_fa_m2=round(rng.uniform(0, 300000), 1),
+        calc_floors_struct=floors_up + floors_roof,
+        display_max_floor=floors_up,
+        building_count=rng.randint(1, 6),
+        floors_down=floors_down,
+        is_complex_excavation=is_complex,
+        complex_soil_vol=round(rng.uniform(1000, 200000), 1) if is_complex else 0.0,
+        enable_soil_limit=rng.random() < 0.4,
+        daily_soil_limit=rng.choice([300, 300.0, rng.randint(50, 1500), float(rng.randint(50, 1500))]),
+        site_condition=_pick(rng, SITE_CONDITIONS),
+        obstruction_method=_pick(rng, OBSTRUCTION),
+        deep_gw_seq=_pick(rng, DEEP_GW_SEQ),
+        soil_improvement=_pick(rng, SOIL_IMPROVEMENT),
+        prep_type_select=_pick(rng, PREP_TYPES),
+        prep_days_custom=rng.choice([None, rng.randint(0, 400)]),
+        enable_manual_review=rng.random() < 0.3,
+        manual_review_days=rng.choice([0, 60, 90, 120]),
+        selected_wall=_pick(rng, WALLS),
+        selected_support=_pick(rng, SUPPORTS),
+        rw_aux_options=tuple(o for o in AUX_OPTIONS if rng.random() < 0.3),
+        foundation_type=_pick(rng, FOUNDATIONS),
+        ext_wall=_pick(rng, EXT_WALLS),
+        scope_options=tuple(o for o in DEFAULT_SCOPE if rng.random() < 0.8),
+        manual_retain_days=rng.choice([0, 0, 0, rng.randint(1, 400)]),
+        manual_crane_days=rng.choice([0, 0, 0, rng.randint(1, 200)]),
+        exclude_sat=rng.random() < 0.7,
+        exclude_sun=rng.random() < 0.8,
+        exclude_cny=rng.random() < 0.7,
+        compound_building_factor=rng.random() < 0.3,
+        floor_cycle_schedule=floor_cycle and rng.random() < 0.5,
+        transfer_floors=tuple(sorted(rng.sample(range(1, floors_up + 1), min(floors_up, rng.randint(0, 2))))) if floor_cycle else (),
+    )
+
+
+# --- 工作日曆：原 Streamlit 頁面內的逐日迴圈 ---
+def _is_workday(d, exclude_sat, exclude_sun, exclude_cny):
+    if exclude_sat and d.weekday() == 5: return False
+    if exclude_sun and d.weekday() == 6: return False
+    if exclude_cny and d.month == 2 and 1 <= d.day <= 7: return False
+    return True
+
+
+def loop_add_workdays(start, days, exclude_sat, exclude_sun, exclude_cny):
+    curr = start
+    if days <= 0: return curr
+    added = 0
+    while added < days:
+        curr += timedelta(days=1)
+        if _is_workday(curr, exclude_sat, exclude_sun, exclude_cny): added += 1
+    return curr
+
+
+def loop_sub_workdays(end, days, exclude_sat, exclude_sun, exclude_cny):
+    curr = end
+    if days <= 0: return curr
+    subtracted = 0
+    while subtracted < days:
+        curr -= timedelta(days=1)
+        if _is_workday(curr, exclude_sat, exclude_sun, exclude_cny): subtracted += 1
+    return curr
+
+
+# --- 工期引擎：改成節點圖之前的單一函式版本，日期改用逐日迴圈 ---
+def reference_schedule(inp, is_reverse_method):
+    assert not inp.floor_cycle_schedule, "參考引擎不含逐層循環"
+    base_area_ping = inp.base_area_m2 * 0.3025
+    total_fa_ping = inp.total_fa_m2 * 0.3025
+    base_area_factor = max(0.8, min(1 + ((base_area_ping - 500) / 100) * 0.02, 1.5))
+    vol_factor = 1.0
+    if total_fa_ping > 3000: vol_factor = min(1 + ((total_fa_ping - 3000) / 5000) * 0.05, 1.2)
+    area_multiplier = base_area_factor * vol_factor
+
+    base_days_per_floor = 15 if inp.slab_type == "鋼承板 (Deck)" else STRUCT_MAP_ABOVE.get(inp.struct_above, 28)
+
+    k_usage = USAGE_FACTORS.get(inp.b_type, 1.0)
+    if "集合住宅" in str(inp.b_type) and inp.building_count > 1:
+        if inp.compound_building_factor: k_usage *= 1.0 + (inp.building_count - 1) * 0.03
+        else: k_usage += (inp.building_count - 1) * 0.03
+
+    ext_wall_multiplier = EXT_WALL_MAP.get(inp.ext_wall, 1.0)
+
+    aux_wall_factor = 0
+    if any("地中壁" in o for o in inp.rw_aux_options): aux_wall_factor += 0.20
+    if any("扶壁" in o for o in inp.rw_aux_options): aux_wall_factor += 0.10
+
+    add_review_days = inp.manual_review_days if inp.enable_manual_review else 0
+    prep_type_select = inp.prep_type_select
+    if prep_type_select and "自訂" in prep_type_select and inp.prep_days_custom is not None: d_prep_base = int(inp.prep_days_custom)
+    elif "一般" in str(prep_type_select): d_prep_base = 120
+    elif "鄰捷運" in str(prep_type_select): d_prep_base = 210
+    else: d_prep_base = 300
+    d_prep = d_prep_base + add_review_days
+    prep_note = f"含危評 (+{add_review_days}天)" if add_review_days > 0 else "要徑"
+
+    site_condition = inp.site_condition
+    is_deep_demo = site_condition and "舊地下室" in site_condition
+    demo_note = "純空地"
+    if site_condition and "純空地" in site_condition: d_demo = 0
+    elif is_deep_demo or ("有舊建物" in str(site_condition)):
+        if site_condition and "無地下室" in site_condition:
+            d_demo = int(55 * area_multiplier); demo_note = "地上拆除"
+        else:
+            if "全套管切削" in str(inp.obstruction_method): d_demo = int((180 + 45) * area_multiplier); demo_note = "全套管清障"
+            elif "深導溝" in str(inp.obstruction_method):
+                d_demo = int(180 * area_multiplier) if inp.deep_gw_seq and "先回填" in inp.deep_gw_seq else int(150 * area_multiplier)
+                demo_note = "先回填" if "先回填" in str(inp.deep_gw_seq) else "邊回填"
+            else: d_demo = int(135 * area_multiplier); demo_note = "舊地下室破除"
+    else: d_demo = 0
+
+    d_soil = int((30 if "局部" in str(inp.soil_improvement) else 60 if "全區" in str(inp.soil_improvement) else 0) * area_multiplier)
+
+    foundation_type = inp.foundation_type
+    foundation_add = 0
+    if foundation_type and "全套管" in foundation_type: foundation_add = 90
+    elif foundation_type and "壁樁" in foundation_type: foundation_add = 80
+    elif foundation_type and "一般鑽掘" in foundation_type: foundation_add = 60
+    elif foundation_type and "微型樁" in foundation_type: foundation_add = 30
+
+    selected_wall, selected_support = inp.selected_wall, inp.selected_support
+    d_aux_wall_days = int(60 * aux_wall_factor)
+    if selected_wall and "連續壁" in selected_wall: base_retain = int(60 * inp.dw_reality_factor); dw_note_str = "連續壁(含係數)"
+    elif selected_wall and "全套管" in selected_wall: base_retain = 50; dw_note_str = "全套管"
+    elif selected_wall and "預壘樁" in selected_wall: base_retain = 40; dw_note_str = "預壘樁"
+    elif selected_wall and "鋼板樁" in selected_wall: base_retain = 25; dw_note_str = "鋼板樁"
+    elif selected_wall and "鋼軌樁" in selected_wall: base_retain = 30; dw_note_str = "鋼軌樁"
+    else: base_retain = 15; dw_note_str = "一般"
+
+    d_plunge_col = 0
+    if is_reverse_method: d_plunge_col = int(45 * area_multiplier); dw_note_str += f" + {inp.plunge_label}"
+
+    if inp.manual_retain_days > 0: d_retain_work = inp.manual_retain_days; excav_str_display = "依廠商預估"
+    else:
+        d_retain_work = int((base_retain * area_multiplier) + d_aux_wall_days + d_plunge_col)
+        excav_str_display = f"{dw_note_str}"
+        if aux_wall_factor > 0: excav_str_display += " (+輔助)"
+
+    floors_down = inp.floors_down
+    d_excav_std = int((floors_down * 22 * excavation_multiplier(selected_wall, selected_support)) * area_multiplier)
+    excav_note = "出土/支撐"
+    if inp.enable_soil_limit and inp.daily_soil_limit:
+        soil_volume = (inp.complex_soil_vol if inp.is_complex_excavation else inp.base_area_m2 * (floors_down * 3.5)) * 1.25
+        d_excav_limited = math.ceil(soil_volume / inp.daily_soil_limit)
+        d_excav_phase = max(d_excav_std, d_excav_limited)
+        if d_excav_limited > d_excav_std: excav_note = f"限每日{inp.daily_soil_limit}m³"
+    else: d_excav_phase = d_excav_std
+
+    is_open_cut = (selected_support and "斜坡" in selected_support) or (selected_wall and "無" in selected_wall)
+    strut_note = "開挖併行"
+    if is_reverse_method: d_strut_install = 0; d_earth_work = d_excav_phase; strut_note = "樓板支撐"
+    elif is_open_cut: d_strut_install = 0; d_earth_work = d_excav_phase; strut_note = "明挖/斜坡"
+    else: d_strut_install = d_excav_phase; d_earth_work = d_excav_phase
+
+    days_per_floor_bd = 45
+    days_per_strut_remove = 10
+    d_strut_removal = 0 if is_open_cut or is_reverse_method else floors_down * days_per_strut_remove
+    struct_efficiency_factor = 1.3 if is_reverse_method else 1.0
+    d_struct_below = int(((floors_down * days_per_floor_bd * struct_efficiency_factor) + d_strut_removal + foundation_add) * area_multiplier)
+    struct_note_base = f"{days_per_floor_bd}天/層"
+    if is_reverse_method: struct_note_base += " x 1.3(逆打)"
+    if d_strut_removal > 0: struct_note_base += f" + 拆撐{days_per_strut_remove}天"
+
+    calc_floors_struct = inp.calc_floors_struct
+    scope_options = inp.scope_options
+    d_struct_body = int(calc_floors_struct * base_days_per_floor * area_multiplier * k_usage)
+    d_ext_wall = int(calc_floors_struct * 15 * area_multiplier * ext_wall_multiplier * k_usage)
+    d_mep = int((60 + calc_floors_struct * 2) * area_multiplier * k_usage) if "機電管線工程" in scope_options else 0
+    d_fit_out = int((60 + calc_floors_struct * 10) * area_multiplier * k_usage) if "室內裝修工程" in scope_options else 0
+    d_landscape = int(75 * base_area_factor) if "景觀工程" in scope_options else 0
+    d_insp = 150 if inp.b_type in ["百貨", "醫院", "飯店"] else 120
+    if "集合住宅" in str(inp.b_type): d_insp += (inp.building_count - 1) * 15
+
+    d_tower_crane = 60
+    crane_note = "含安檢"
+    if inp.manual_crane_days > 0: d_tower_crane = inp.manual_crane_days; crane_note = "廠商預估"
+    needs_tower_crane = (inp.struct_above in ["SS造", "SC造", "SRC造"]) or (inp.display_max_floor >= 15)
+    if not needs_tower_crane: d_tower_crane = 0
+
+    flags = (inp.exclude_sat, inp.exclude_sun, inp.exclude_cny)
+    get_end = lambda d, n: loop_add_workdays(d, n, *flags)
+    get_start_from_end = lambda d, n: loop_sub_workdays(d, n, *flags)
+    exclude_sat, exclude_sun = inp.exclude_sat, inp.exclude_sun
+    one = timedelta(days=1)
+
+    p1_s = inp.start_date
+    p1_e = get_end(p1_s, d_prep)
+    p2_s = p1_e + one; p2_e = get_end(p2_s, d_demo)
+    p_soil_s = p2_e + one; p_soil_e = get_end(p_soil_s, d_soil)
+    p4_s = p_soil_e + one; p4_e = get_end(p4_s, d_retain_work)
+    p5_s = p4_e + one; p5_e = get_end(p5_s, d_strut_install)
+    p6_s = p5_s
+
+    display_max_floor = inp.display_max_floor
+    if is_reverse_method:
+        p7_s = get_end(p6_s, int(30 * area_multiplier))
+        p7_e = get_end(p7_s, d_struct_below)
+        p6_e = max(p7_e - timedelta(days=20), get_end(p6_s, d_earth_work))
+        avg_ratio = 5/7 if exclude_sat and exclude_sun else 6/7 if exclude_sun else 1.0
+        d_earth_work_display = int((p6_e - p6_s).days * avg_ratio)
+        p8_s_pre = get_end(p6_s, int(60 * area_multiplier))
+        struct_note_below = f"併行 ({struct_note_base})"
+        struct_note_above = f"併行 ({display_max_floor}F)"
+        excav_note = "配合逆打"
+    else:
+        p6_e = get_end(p6_s, d_earth_work)
+        d_earth_work_display = d_earth_work
+        p7_s = max(p5_e, p6_e) + one
+        p7_e = get_end(p7_s, d_struct_below)
+        p8_s_pre = p7_e + one
+        struct_note_below = f"要徑 ({struct_note_base})"
+        struct_note_above = f"順打 ({display_max_floor}F)"
+
+    p_tower_s = p_tower_e = p1_s
+    if needs_tower_crane:
+        p_tower_s = p8_s_pre - timedelta(days=26)
+        p_tower_e = get_end(p_tower_s, d_tower_crane)
+        p8_s = max(p8_s_pre, p_tower_e + one)
+    else: p8_s = p8_s_pre
+
+    p8_e = get_end(p8_s, d_struct_body)
+    p_ext_s = get_end(p8_s, int(d_struct_body * 0.7)); p_ext_e = get_end(p_ext_s, d_ext_wall)
+    p10_s = get_end(p8_s, int(d_struct_body * 0.3)); p10_e = get_end(p10_s, d_mep)
+    p11_e = p_ext_e + timedelta(days=90); p11_s = get_start_from_end(p11_e, d_fit_out)
+    p12_s = p_ext_e - timedelta(days=15); p12_e = get_end(p12_s, d_landscape)
+    p13_s = max(p_ext_e, p10_e, p11_e, p12_e) - timedelta(days=30); p13_e = get_end(p13_s, d_insp)
+
+    final_finish = max(p7_e, p8_e, p_ext_e, p10_e, p11_e, p12_e, p13_e)
+    cal_days = (final_finish - p1_s).days
+    eff_days = int(cal_days * (5/7 if exclude_sat and exclude_sun else 6/7))
+
+    phases = [
+        Phase("1.前期", d_prep, p1_s, p1_e, prep_note),
+        Phase("2.拆除", d_demo, p2_s, p2_e, demo_note),
+        Phase("3.地改", d_soil, p_soil_s, p_soil_e, "地質改良"),
+        Phase("4.擋土壁", d_retain_work, p4_s, p4_e, excav_str_display),
+        Phase("5.支撐", d_strut_install, p5_s, p5_e, strut_note),
+        Phase("6.開挖", d_earth_work_display, p6_s, p6_e, excav_note),
+        Phase("7.地下結構", d_struct_below, p7_s, p7_e, struct_note_below),
+        Phase("8.地上結構", d_struct_body, p8_s, p8_e, struct_note_above),
+        Phase("9.外牆", d_ext_wall, p_ext_s, p_ext_e, "70%進場"),
+        Phase("10.機電", d_mep, p10_s, p10_e, "30%進場"),
+        Phase("11.裝修", d_fit_out, p11_s, p11_e, "外牆後3個月完成"),
+        Phase("12.景觀", d_landscape, p12_s, p12_e, "收尾工程"),
+        Phase("13.驗收", d_insp, p13_s, p13_e, "標準驗收"),
+    ]
+    if needs_tower_crane: phases.append(Phase("7.5 塔吊", d_tower_crane, p_tower_s, p_tower_e, crane_note))
+    return ScheduleResult(
+        eff_days=eff_days, cal_days=cal_days, final_finish=final_finish, phases=tuple(phases),
+        d_retain=d_retain_work, d_plunge=d_plunge_col, d_strut=d_strut_install, d_struct_down=d_struct_below,
+    )
+
+
+# --- Lite：原 Streamlit 頁面內的計算 ---
+def reference_lite(floors_up, floors_down, struct_above, base_area_m2, b_type, method, has_old):
+    wall_type = "鋼板樁" if floors_down <= 1 else "連續壁"
+    base_area_ping = base_area_m2 * 0.3025
+    est_total_fa_ping = base_area_ping * 0.65 * (floors_up + floors_down) * 1.4
+    base_area_factor = max(0.8, min(1 + ((base_area_ping - 500) / 100) * 0.02, 1.5))
+    vol_factor = min(1 + ((est_total_fa_ping - 3000) / 5000) * 0.05, 1.2) if est_total_fa_ping > 3000 else 1.0
+    am = base_area_factor * vol_factor
+
+    days_per_floor = {"RC造": 28, "SRC造": 25, "SS造": 18, "SC造": 21}.get(struct_above, 28)
+    k_usage = 1.1 if b_type in ["辦公大樓", "飯店"] else (0.8 if b_type == "廠房" else 1.0)
+
+    d_prep = 120
+    d_demo = int(60 * am) if has_old else 0
+    base_retain = int(60 * 1.75) if wall_type == "連續壁" else 30
+    d_retain = int(base_retain * am)
+    d_plunge = int(45 * am) if method == "逆打工法" else 0
+    d_excav_raw = int(max(base_area_m2 * (floors_down * 3.5) / 300, floors_down * 25 * am))
+    if method == "逆打工法": d_struct_down = int(floors_down * 45 * 1.3 * am)
+    else: d_struct_down = int((floors_down * 45 + floors_down * 10) * am)
+    d_struct_up = int(floors_up * days_per_floor * am * k_usage)
+    d_ext_wall = int(floors_up * 15 * am)
+
+    day = 0
+    tasks = [("前置作業", day, d_prep)]
+    day += d_prep
+    if d_demo > 0: tasks.append(("拆除工程", day, d_demo)); day += d_demo
+    tasks.append(("擋土設施", day, d_retain)); day += d_retain
+    if method == "逆打工法":
+        tasks.append(("逆打鋼柱", day, d_plunge)); day += d_plunge
+        d_1f_slab = int(60 * am)
+        tasks.append(("1F結構(逆打)", day, d_1f_slab)); day += d_1f_slab
+        tasks.append(("地下開挖&結構", day, d_excav_raw + d_struct_down))
+        finish_down = day + d_excav_raw + d_struct_down
+        tasks.append(("地上結構", day, d_struct_up))
+        finish_struct_up = day + d_struct_up
+    else:
+        tasks.append(("開挖支撐", day, d_excav_raw)); day += d_excav_raw
+        tasks.append(("地下結構", day, d_struct_down)); day += d_struct_down
+        tasks.append(("地上結構", day, d_struct_up)); finish_struct_up = day + d_struct_up
+        finish_down = day
+
+    start_ext = finish_struct_up - d_struct_up + int(d_struct_up * 0.7)
+    finish_ext = start_ext + d_ext_wall
+    finish_fitout = finish_ext + 90
+    start_fitout = finish_fitout - int(d_struct_up * 0.8)
+    tasks.append(("外牆工程", start_ext, d_ext_wall))
+    tasks.append(("室內裝修", start_fitout, finish_fitout - start_fitout))
+    project_finish = max(finish_struct_up, finish_ext, finish_fitout, finish_down)
+    tasks.append(("驗收使照", project_finish, 120))
+    return LiteResult(total_days=project_finish + 120, tasks=tuple(tasks), wall_type=wall_type)
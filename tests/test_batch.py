@@ -0,0 +1,47 @@
+import dataclasses
+import random
+
+import numpy as np
+import pytest
+
+from reference import random_inputs
+from schedule_batch import PHASE_NAMES, calculate_schedule_batch, inputs_to_columns
+from schedule_engine import calculate_schedule
+
+N_CASES = 3000
+
+
+def _check(frame, inputs, is_reverse):
+    for i, inp in enumerate(inputs):
+        result = calculate_schedule(inp, is_reverse)
+        row = frame.iloc[i]
+        phases = {p.name: p for p in result.phases}
+        for key, name in PHASE_NAMES.items():
+            if name not in phases: continue
+            phase = phases[name]
+            assert row[f"{key}_start"].date() == phase.start, (i, name)
+            assert row[f"{key}_finish"].date() == phase.finish, (i, name)
+            if key != "excav": assert row[f"d_{key}"] == phase.days, (i, name)
+        assert row["final_finish"].date() == result.final_finish
+        assert row["cal_days"] == result.cal_days
+        assert row["eff_days"] == result.eff_days
+        assert row["d_plunge"] == result.d_plunge
+
+
+@pytest.mark.parametrize("is_reverse", [False, True])
+@pytest.mark.parametrize("floor_cycle", [False, True])
+def test_batch_matches_row_by_row(is_reverse, floor_cycle):
+    rng = random.Random(3 + 2 * is_reverse + floor_cycle)
+    inputs = [random_inputs(rng, floor_cycle=floor_cycle) for _ in range(N_CASES)]
+    _check(calculate_schedule_batch(inputs_to_columns(inputs), is_reverse), inputs, is_reverse)
+
+
+def test_missing_columns_use_defaults():
+    rng = random.Random(5)
+    inputs = [random_inputs(rng) for _ in range(50)]
+    cols = inputs_to_columns(inputs)
+    for name in ("slab_type", "dw_reality_factor", "plunge_label", "exclude_sat"): cols.pop(name)
+    frame = calculate_schedule_batch(cols, False)
+    defaults = [dataclasses.replace(inp, slab_type="一般 RC 樓版", dw_reality_factor=1.75, plunge_label="逆打鋼柱", exclude_sat=True) for inp in inputs]
+    _check(frame, defaults, False)
+    assert np.all(frame.index == np.arange(50))
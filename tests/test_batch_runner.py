@@ -0,0 +1,76 @@
+import csv
+import datetime
+
+import pytest
+
+from batch_runner import OUTPUT_COLUMNS, build_inputs, main, map_form_columns, parse_form
+from schedule_engine import calculate_schedule
+
+FORM = {"工程名稱": "測試案", "建物類型": "住宅", "施工方式": "順打工法", "地上結構": "RC造", "地下結構": "RC造",
+        "基地面積": "1,200", "總樓地板面積": 15000, "地上層數": "15", "屋突層數": 2, "地下層數": 3.5, "開工日期": "2025/3/3"}
+
+
+def _parse(record):
+    keys = list(record)
+    return parse_form([record[k] for k in keys], map_form_columns(keys))
+
+
+def _form(**changes):
+    return _parse(dict(FORM, **changes))
+
+
+def test_parse_form_converts_fields():
+    form = _form(**{"排除週六": "否", "納入工項": "機電管線工程、景觀工程", "轉換層": "3F, 10F", "逐層循環排程": "是"})
+    assert form["base_area_m2"] == 1200.0 and form["floors_up"] == 15 and isinstance(form["floors_up"], int)
+    assert form["floors_down"] == 3.5 and form["start_date"] == datetime.date(2025, 3, 3)
+    assert form["exclude_sat"] is False and form["floor_cycle_schedule"] is True
+    assert form["scope_options"] == ("機電管線工程", "景觀工程") and form["transfer_floors"] == (3, 10)
+    assert map_form_columns(["案名", "基地面積 (m²)", "不相干"]) == {"project_name": 0, "base_area_m2": 1}
+
+
+@pytest.mark.parametrize("label, value, message", [
+    ("地上層數", "15.5", "地上層數 格式錯誤"),
+    ("地上層數", True, "地上層數 格式錯誤"),
+    ("地上層數", "inf", "地上層數 格式錯誤"),
+    ("地上層數", 1e400, "地上層數 格式錯誤"),
+    ("基地面積", "inf", "基地面積 格式錯誤"),
+    ("基地面積", float("nan"), "基地面積 格式錯誤"),
+    ("地下層數", "-1", "地下層數 不可為負"),
+    ("開工日期", "2025/13/1", "開工日期 格式錯誤"),
+])
+def test_parse_form_rejects_bad_values(label, value, message):
+    with pytest.raises(ValueError, match=message): _form(**{label: value})
+
+
+def test_build_inputs_matches_pro_defaults():
+    inp, is_reverse = build_inputs(_form())
+    assert not is_reverse
+    assert (inp.calc_floors_struct, inp.display_max_floor, inp.building_count) == (17, 15, 1)
+    assert inp.selected_support == "型鋼內支撐 (Strut)" and not inp.enable_soil_limit and inp.daily_soil_limit == 300
+    inp, is_reverse = build_inputs(_form(**{"施工方式": "逆打工法", "每日限出土": 500}))
+    assert is_reverse and inp.selected_support == "結構樓板 (逆打標準)"
+    assert inp.enable_soil_limit and inp.daily_soil_limit == 500
+    calculate_schedule(inp, is_reverse)
+
+
+def test_build_inputs_rejects_incomplete_forms():
+    record = dict(FORM)
+    del record["地上結構"]
+    with pytest.raises(ValueError, match="缺少必要欄位: 地上結構"): build_inputs(_parse(record))
+    with pytest.raises(ValueError, match="請輸入 基地面積"): build_inputs(_form(**{"基地面積": 0}))
+
+
+def test_cli_reports_physical_line_numbers(tmp_path, capsys):
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    header = list(FORM)
+    good = [FORM[k] for k in header]
+    bad = dict(FORM, 地上層數="inf")
+    src.write_text("\n".join([",".join(f'"{v}"' for v in header), ",".join(f'"{v}"' for v in good), "",
+                              ",".join(f'"{bad[k]}"' for k in header), ",".join(f'"{v}"' for v in good)]) + "\n", encoding="utf-8")
+    assert main([str(src), "-o", str(out), "--workers", "1"]) == 0
+    with open(out, encoding="utf-8-sig", newline="") as f: rows = list(csv.reader(f))
+    assert rows[0] == OUTPUT_COLUMNS
+    assert [r[0] for r in rows[1:]] == ["2", "4", "5"]
+    assert [bool(r[9]) for r in rows[1:]] == [False, True, False]
+    assert "地上層數 格式錯誤" in rows[2][9]
+    assert "3 案，錯誤 1 案" in capsys.readouterr().err
@@ -0,0 +1,59 @@
+import dataclasses
+import datetime
+import random
+
+from building_schedule import schedule_buildings
+from reference import random_inputs
+from schedule_engine import ScheduleInputs, calculate_schedule
+
+SITE_INPUTS = ScheduleInputs(
+    start_date=datetime.date(2025, 3, 3), b_type="集合住宅", struct_above="RC造", base_area_m2=3000.0, total_fa_m2=45000.0,
+    calc_floors_struct=22, display_max_floor=20, building_count=3, floors_down=3, selected_wall="連續壁 (Diaphragm Wall)",
+    selected_support="型鋼內支撐 (Strut)", foundation_type="標準筏式基礎 (無基樁)", ext_wall="標準磁磚/塗料", prep_type_select="一般 (120天)",
+)
+
+
+def test_single_building_matches_engine():
+    rng = random.Random(15)
+    for _ in range(200):
+        inp = dataclasses.replace(random_inputs(rng), building_count=1)
+        is_reverse = rng.random() < 0.5
+        result = calculate_schedule(inp, is_reverse)
+        site = schedule_buildings(inp, is_reverse, ["A"], [inp.display_max_floor], [inp.calc_floors_struct - inp.display_max_floor])
+        phases = {p.name: p for p in result.phases}
+        row = site.buildings[0]
+        assert (site.final_finish, site.cal_days, site.eff_days) == (result.final_finish, result.cal_days, result.eff_days)
+        assert site.substructure_finish == phases["7.地下結構"].finish
+        for name, start, finish in [("8.地上結構", "地上結構開始", "地上結構完成"), ("9.外牆", "外牆開始", "外牆完成")]:
+            if name in phases: assert (row[start], row[finish]) == (phases[name].start, phases[name].finish)
+        if "12.景觀" in phases: assert site.landscape == (phases["12.景觀"].start, phases["12.景觀"].finish)
+        if "13.驗收" in phases: assert site.inspection == (phases["13.驗收"].start, phases["13.驗收"].finish)
+
+
+def test_shared_cranes_are_assigned_in_waves():
+    names, floors = ["A", "B", "C", "D"], [24, 16, 20, 18]
+    own = schedule_buildings(SITE_INPUTS, False, names, floors, [2] * 4)
+    assert len({row["地上結構開始"] for row in own.buildings}) == 1
+    assert all(row["塔吊"] == "需要" and row["等候塔吊(日曆天)"] == 0 for row in own.buildings)
+
+    one = schedule_buildings(SITE_INPUTS, False, names, floors, [2] * 4, crane_count=1)
+    rows = one.buildings
+    for prev, row in zip(rows, rows[1:]):
+        # 塔吊於前一棟地上結構完成後拆移、重新安裝
+        assert row["地上結構開始"] > prev["地上結構完成"]
+    assert [row["等候塔吊(日曆天)"] > 0 for row in rows] == [False, True, True, True]
+    assert one.final_finish > own.final_finish
+
+    two = schedule_buildings(SITE_INPUTS, False, names, floors, [2] * 4, crane_count=2)
+    a, b, c, d = two.buildings
+    assert a["地上結構開始"] == b["地上結構開始"] == own.buildings[0]["地上結構開始"]
+    # 第二輪：最早空出的塔吊 (較矮的 B 棟) 給 C 棟，A 棟的塔吊給 D 棟
+    assert b["地上結構完成"] < a["地上結構完成"]
+    assert b["地上結構完成"] < c["地上結構開始"] < a["地上結構完成"] < d["地上結構開始"]
+
+
+def test_stagger_delays_each_building():
+    site = schedule_buildings(SITE_INPUTS, False, ["A", "B", "C"], [20, 20, 20], [2, 2, 2], stagger_days=20)
+    starts = [row["地上結構開始"] for row in site.buildings]
+    assert starts[0] < starts[1] < starts[2]
+    assert all(row["等候塔吊(日曆天)"] == 0 for row in site.buildings)
@@ -0,0 +1,63 @@
+import datetime
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from reference import loop_add_workdays, loop_sub_workdays
+from workday_calendar import WorkCalendar, get_calendar
+
+COMBOS = list(itertools.product([True, False], repeat=3))
+N_CASES = 2000
+
+
+def _cases(seed):
+    rng = random.Random(seed)
+    for _ in range(N_CASES):
+        start = datetime.date(1995, 1, 1) + datetime.timedelta(days=rng.randrange(365 * 120))
+        days = rng.choice([0, -3, rng.randint(1, 30), rng.randint(1, 2500), rng.uniform(0, 500)])
+        yield start, days
+
+
+@pytest.mark.parametrize("flags", COMBOS)
+def test_add_sub_match_day_loop(flags):
+    cal = get_calendar(*flags)
+    for start, days in _cases(seed=sum(b << i for i, b in enumerate(flags))):
+        assert cal.add_workdays(start, days) == loop_add_workdays(start, days, *flags), (start, days)
+        assert cal.sub_workdays(start, days) == loop_sub_workdays(start, days, *flags), (start, days)
+
+
+@pytest.mark.parametrize("flags", COMBOS)
+def test_vectorized_match_scalar(flags):
+    cal = get_calendar(*flags)
+    starts, days = zip(*_cases(seed=100))
+    ords = np.array([d.toordinal() for d in starts], dtype=np.int64)
+    added = cal.add_workdays_ord(ords, days)
+    subtracted = cal.sub_workdays_ord(ords, days)
+    for i, (start, n) in enumerate(zip(starts, days)):
+        assert added[i] == cal.add_workdays(start, n).toordinal()
+        assert subtracted[i] == cal.sub_workdays(start, n).toordinal()
+
+
+def test_is_workday_and_count_match_loop():
+    rng = random.Random(7)
+    for flags in COMBOS:
+        cal = get_calendar(*flags)
+        for _ in range(200):
+            start = datetime.date(2000, 1, 1) + datetime.timedelta(days=rng.randrange(365 * 80))
+            end = start + datetime.timedelta(days=rng.randint(0, 400))
+            d = start + datetime.timedelta(days=1)
+            expected = 0
+            while d <= end:
+                if loop_add_workdays(d - datetime.timedelta(days=1), 1, *flags) == d: expected += 1
+                d += datetime.timedelta(days=1)
+            assert cal.count_workdays(start, end) == expected
+            assert cal.is_workday(end) == (loop_add_workdays(end - datetime.timedelta(days=1), 1, *flags) == end)
+
+
+def test_extends_outside_precomputed_range():
+    cal = WorkCalendar(True, True, True)
+    for start, days in [(datetime.date(1980, 2, 3), 40), (datetime.date(2150, 12, 1), 900), (datetime.date(1990, 1, 10), 50)]:
+        assert cal.add_workdays(start, days) == loop_add_workdays(start, days, True, True, True)
+        assert cal.sub_workdays(start, days) == loop_sub_workdays(start, days, True, True, True)
@@ -0,0 +1,74 @@
+import datetime
+import random
+
+import pytest
+
+from cpm import Activity, Dependency, analyze_schedule, compute_cpm
+from reference import random_inputs
+from schedule_engine import ScheduleInputs, calculate_schedule
+
+# 網圖以工作天換算原時間軸的日曆天常數 (取整)，日期與引擎逐段推算會有數天落差；
+# 開挖另有引擎特例 (逆打週休比例、土方管制延長不計入完工日)，不列入誤差範圍
+MAX_DRIFT_DAYS = 20
+
+
+def test_hand_checked_network():
+    activities = [Activity("A", 3), Activity("B", 4), Activity("C", 2), Activity("D", 5), Activity("E", 1)]
+    dependencies = [
+        Dependency("A", "B", "FS", 1), Dependency("A", "C", "SS", 2), Dependency("C", "D", "FF", 3),
+        Dependency("B", "E", "SF", 6), Dependency("D", "E"),
+    ]
+    cpm = compute_cpm(activities, dependencies)
+    assert cpm.es == (0, 4, 2, 2, 9)
+    assert cpm.ef == (3, 8, 4, 7, 10)
+    assert cpm.ls == (0, 4, 4, 4, 9)
+    assert cpm.lf == (3, 8, 6, 9, 10)
+    assert cpm.total_float == (0, 0, 2, 2, 0)
+    assert cpm.free_float == (0, 0, 0, 2, 0)
+    assert cpm.project_duration == 10
+    assert cpm.critical_path == ("A", "B", "E")
+    assert [r["要徑"] for r in cpm.rows()] == [True, True, False, False, True]
+
+
+def test_invalid_networks_raise():
+    a, b, c = Activity("A", 1), Activity("B", 2), Activity("C", 3)
+    with pytest.raises(ValueError, match="循環"):
+        compute_cpm([a, b, c], [Dependency("A", "B"), Dependency("B", "C"), Dependency("C", "A", "SS")])
+    with pytest.raises(ValueError, match="重複"): compute_cpm([a, b, Activity("A", 5)], [])
+    with pytest.raises(ValueError, match="相依型式"): compute_cpm([a, b], [Dependency("A", "B", "XX")])
+    with pytest.raises(ValueError, match="不存在"): compute_cpm([a, b], [Dependency("A", "Z")])
+
+
+def _drift(inp, is_reverse):
+    result = calculate_schedule(inp, is_reverse)
+    _, table = analyze_schedule(inp, is_reverse, result)
+    finish = {p.name: p.finish for p in result.phases}
+    return {row["工項"]: (row["最早完成"] - finish[row["工項"]]).days for row in table if row["工期"] > 0}, result, table
+
+
+def test_dates_drift_from_engine_by_known_amount():
+    inp = ScheduleInputs(
+        start_date=datetime.date(2025, 3, 3), b_type="住宅", struct_above="SRC造", base_area_m2=2500.0, total_fa_m2=40000.0,
+        calc_floors_struct=27, display_max_floor=25, floors_down=4, site_condition="有舊建物 (無地下室)",
+        selected_wall="連續壁 (Diaphragm Wall)", selected_support="型鋼內支撐 (Strut)", foundation_type="筏式基礎 + 一般鑽掘/預力樁",
+        ext_wall="玻璃帷幕 (工期較短)", prep_type_select="一般 (120天)", soil_improvement="無",
+    )
+    standard, result, table = _drift(inp, False)
+    assert standard == {"1.前期": 0, "2.拆除": 0, "4.擋土壁": 4, "5.支撐": 5, "6.開挖": 5, "7.地下結構": 4,
+                        "8.地上結構": 5, "9.外牆": 3, "10.機電": 3, "11.裝修": 3, "12.景觀": 5, "13.驗收": 6, "7.5 塔吊": 5}
+    assert (max(row["最早完成"] for row in table) - result.final_finish).days == 6
+    reverse, result, table = _drift(inp, True)
+    assert reverse == {"1.前期": 0, "2.拆除": 0, "4.擋土壁": 2, "6.開挖": 8, "7.地下結構": 2,
+                       "8.地上結構": 6, "9.外牆": 6, "10.機電": 6, "11.裝修": 4, "12.景觀": 6, "13.驗收": 7, "7.5 塔吊": 5}
+    assert (max(row["最早完成"] for row in table) - result.final_finish).days == 7
+
+
+def test_drift_stays_bounded():
+    rng = random.Random(12)
+    for _ in range(1000):
+        inp, is_reverse = random_inputs(rng), rng.random() < 0.5
+        drift, result, table = _drift(inp, is_reverse)
+        drift.pop("6.開挖", None)
+        assert all(abs(d) <= MAX_DRIFT_DAYS for d in drift.values()), (inp, is_reverse, drift)
+        finish = max((row["最早完成"] for row in table if row["工期"] > 0 and row["工項"] != "6.開挖"), default=inp.start_date)
+        assert abs((finish - result.final_finish).days) <= MAX_DRIFT_DAYS, (inp, is_reverse)
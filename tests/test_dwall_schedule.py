@@ -0,0 +1,36 @@
+import random
+
+from dwall_schedule import LIST, LPT, PANEL_DAYS, panel_units, schedule_panels
+
+
+def test_panel_units_expand_in_table_order():
+    kinds, days = panel_units({"矩形壁樁": 1, "連續壁主體": 2, "地中壁": None, "無筋扶壁": -3})
+    assert kinds == ["連續壁主體", "連續壁主體", "矩形壁樁"]
+    assert days == [3, 3, 4]
+
+
+def test_single_rig_is_serial_sum():
+    rng = random.Random(18)
+    for _ in range(200):
+        kinds, days = panel_units({kind: rng.randint(0, 30) for kind in PANEL_DAYS})
+        for method in (LPT, LIST):
+            plan = schedule_panels(kinds, days, 1, method)
+            assert plan.makespan == sum(days) == plan.busy[0]
+            assert set(plan.rig) <= {0}
+
+
+def test_lpt_never_worse_than_list():
+    rng = random.Random(180)
+    for _ in range(500):
+        days = [rng.choice(list(PANEL_DAYS.values())) for _ in range(rng.randint(0, 60))]
+        kinds = ["單元"] * len(days)
+        rigs = rng.randint(1, 6)
+        lpt, lst = schedule_panels(kinds, days, rigs, LPT), schedule_panels(kinds, days, rigs, LIST)
+        assert lpt.makespan <= lst.makespan
+        for plan in (lpt, lst):
+            assert sum(plan.busy) == sum(days)
+            assert plan.makespan >= max([-(-sum(days) // rigs)] + days)
+            for r in range(rigs):
+                # 同一機台的單元不重疊
+                spans = sorted((plan.start[i], plan.finish[i]) for i in range(len(days)) if plan.rig[i] == r)
+                assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from excavation_zones import sequence_zones
+
+
+def test_binding_daily_limit_shares_haulage():
+    start, finish, haul = sequence_zones([100, 100, 100], [10, 10, 10], daily_limit=15, crews=3)
+    # 先開工者先取得全部產能，剩餘額度給下一區；額度用罄時第三區等到第一區完成
+    assert start == [0, 0, 10]
+    assert finish == pytest.approx([10, 15, 22.5])
+    assert haul == [(0, 15), (10, 15), (15, 10), (22.5, 0)]
+
+
+def test_unbounded_zones_run_at_full_rate():
+    start, finish, _ = sequence_zones([100, 60, 90], [10, 20, 30])
+    assert start == [0, 0, 0]
+    assert finish == pytest.approx([10, 3, 3])
+    start, finish, _ = sequence_zones([100, 60, 90], [10, 20, 30], crews=1, priority=[2, 0, 1])
+    assert start == pytest.approx([6, 0, 3]) and finish == pytest.approx([16, 3, 6])
+
+
+def test_random_plans_respect_limit_and_volume():
+    rng = random.Random(17)
+    for _ in range(300):
+        n = rng.randint(1, 30)
+        volumes = [rng.uniform(0, 5000) for _ in range(n)]
+        rates = [rng.uniform(50, 800) for _ in range(n)]
+        limit, crews = rng.choice([None, rng.uniform(100, 2000)]), rng.randint(1, 6)
+        start, finish, haul = sequence_zones(volumes, rates, limit, crews)
+        assert all(m3 <= (limit or float("inf")) * (1 + 1e-9) for _, m3 in haul)
+        hauled = sum(m3 * (t1 - t0) for (t0, m3), (t1, _) in zip(haul, haul[1:]))
+        assert hauled == pytest.approx(sum(volumes), rel=1e-6)
+        for i in range(n):
+            # 不會快於單區產能
+            assert finish[i] - start[i] >= volumes[i] / rates[i] * (1 - 1e-9)
+        for t, _ in haul[:-1]:
+            assert sum(1 for i in range(n) if start[i] <= t < finish[i] - 1e-9) <= crews
+        if limit is None and crews >= n: assert finish == pytest.approx([v / r for v, r in zip(volumes, rates)])
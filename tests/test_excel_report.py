@@ -0,0 +1,66 @@
+import io
+import random
+
+from openpyxl import load_workbook
+
+from excel_report import REPORT_CACHE, REPORT_COLUMNS, SUMMARY_COLUMNS, SUMMARY_SHEET, cached_report_xlsx, portfolio_xlsx, report_key
+from reference import random_inputs
+from schedule_engine import calculate_schedule
+
+ROWS = [["工程名稱", "測試案"], ["[ 進度分析 ]", ""], ["1.前期", "120 天", "2025-01-01 ~ 2025-05-01", ""],
+        ["[ 總結結果 ]", "", "", ""], ["預估完工日期", "2028-01-05", "", ""]]
+
+
+def _sheets(data):
+    wb = load_workbook(io.BytesIO(data), read_only=True)
+    # read_only 模式空白列讀回為空 tuple，略過
+    try: return {ws.title: [list(r) for r in ws.iter_rows(values_only=True) if r] for ws in wb.worksheets}
+    finally: wb.close()
+
+
+def test_report_built_once_and_looked_up_without_building():
+    REPORT_CACHE.clear()
+    assert cached_report_xlsx(ROWS, build=False) is None
+    assert REPORT_CACHE.stats()["size"] == 0
+    data = cached_report_xlsx(ROWS)
+    assert cached_report_xlsx(ROWS, build=False) is data
+    assert cached_report_xlsx([list(r) for r in ROWS]) is data  # 內容相同即命中
+    assert cached_report_xlsx(ROWS[:-1], build=False) is None
+    assert report_key(ROWS) != report_key(ROWS, "其他工作表")
+    sheet = _sheets(data)["詳細工期報告"]
+    assert sheet[0] == REPORT_COLUMNS
+    assert [r[0] for r in sheet[1:]] == [r[0] for r in ROWS]
+    assert sheet[-1][:2] == ["預估完工日期", "2028-01-05"]
+
+
+def test_portfolio_sheets_ranked_by_duration(temp_db):
+    projects = [("短工期案", 500), ("信義/住宅[A]:第*期?", 1200), ("同工期先存", 800), ("同工期後存", 800),
+                ("名稱非常長的集合住宅新建工程第一期第二標", 950), (None, 300)]
+    ids = {name: temp_db.save_to_db({"project_name": name, "total_cal_days": days}) for name, days in projects}
+    inp = random_inputs(random.Random(11))
+    result = calculate_schedule(inp, False)
+    ids["估算案"] = temp_db.save_estimate({"project_name": "估算案", "total_cal_days": 1000, "final_finish_date": str(result.final_finish)},
+                                          inp, result, False)
+
+    sheets = _sheets(portfolio_xlsx())
+    summary = sheets.pop(SUMMARY_SHEET)
+    assert summary[0] == SUMMARY_COLUMNS
+    order = ["信義/住宅[A]:第*期?", "估算案", "名稱非常長的集合住宅新建工程第一期第二標", "同工期先存", "同工期後存", "短工期案", None]
+    assert [r[0] for r in summary[1:]] == list(range(1, len(order) + 1))
+    assert [r[1] for r in summary[1:]] == [ids[name] for name in order]
+    titles = [r[-1] for r in summary[1:]]
+    assert titles[:2] == ["001_信義_住宅_A__第_期_", "002_估算案"]
+    assert titles[2] == "003_名稱非常長的集合住宅新建工程第一期第二標"[:31] and titles[-1] == "007_未命名"
+    assert list(sheets) == titles
+    assert sheets["006_短工期案"][0] == REPORT_COLUMNS
+    assert "(未保存工項明細)" in [r[0] for r in sheets["006_短工期案"]]
+    detail = sheets["002_估算案"]
+    phases = [p for p in result.phases if p.days > 0]
+    listed = [r for r in detail if r[0] in {p.name for p in phases}]
+    assert [r[0] for r in listed] == [p.name for p in phases]
+    assert listed[0][1:3] == [f"{phases[0].days} 天", f"{phases[0].start} ~ {phases[0].finish}"]
+    assert detail[-1][:2] == ["預估完工日期", str(result.final_finish)]
+
+    filtered = _sheets(portfolio_xlsx("同工期"))
+    assert [r[2] for r in filtered[SUMMARY_SHEET][1:]] == ["同工期先存", "同工期後存"]
+    assert list(filtered)[1:] == ["001_同工期先存", "002_同工期後存"]
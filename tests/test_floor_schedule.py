@@ -0,0 +1,49 @@
+import dataclasses
+import datetime
+import random
+
+from floor_schedule import floor_schedule
+from reference import random_inputs
+from schedule_engine import ScheduleInputs, calculate_schedule
+
+# 基地 1653 m² ≒ 500 坪，面積係數約為 1；RC 造標準層 28 天
+TOWER = ScheduleInputs(
+    start_date=datetime.date(2025, 3, 3), b_type="住宅", struct_above="RC造", base_area_m2=1653.0, total_fa_m2=5000.0,
+    calc_floors_struct=12, display_max_floor=10, floor_cycle_schedule=True, transfer_floors=(3,), ext_wall="標準磁磚/塗料",
+)
+
+
+def test_transfer_and_roof_floor_offsets():
+    fs = floor_schedule(TOWER, False)
+    assert fs.labels == tuple(f"{i}F" for i in range(1, 11)) + ("R1", "R2")
+    assert fs.kinds == ("標準層", "標準層", "轉換層") + ("標準層",) * 7 + ("屋突層", "屋突層")
+    # 轉換層 ×2；屋突層 ×0.6 以累計值取整 (11.6 × 28 → 324、12.2 × 28 → 341)
+    assert fs.cycle == (28, 28, 56) + (28,) * 7 + (16, 17)
+    assert all(b == a for a, b in zip(fs.finish, fs.start[1:]))
+
+    phases = {p.name: p for p in calculate_schedule(TOWER, False).phases}
+    body = phases["8.地上結構"]
+    assert sum(fs.cycle) == body.days
+    assert (fs.start[0], fs.finish[-1]) == (body.start, body.finish)
+    assert (fs.ext_start_floor, fs.mep_start_floor) == (9, 4)
+    assert phases["9.外牆"].start == fs.finish[8] and phases["10.機電"].start == fs.finish[3]
+
+
+def test_transfer_floor_in_roof_is_ignored():
+    fs = floor_schedule(dataclasses.replace(TOWER, transfer_floors=(3, 11)), False)
+    assert fs.kinds[10:] == ("屋突層", "屋突層")
+    assert fs.cycle == floor_schedule(TOWER, False).cycle
+
+
+def test_floors_match_engine_superstructure():
+    rng = random.Random(16)
+    for _ in range(300):
+        inp = dataclasses.replace(random_inputs(rng, floor_cycle=True), floor_cycle_schedule=True)
+        is_reverse = rng.random() < 0.5
+        phases = {p.name: p for p in calculate_schedule(inp, is_reverse).phases}
+        fs = floor_schedule(inp, is_reverse)
+        assert len(fs.labels) == inp.calc_floors_struct
+        if "8.地上結構" not in phases or not fs.labels: continue
+        body = phases["8.地上結構"]
+        assert sum(fs.cycle) == body.days, inp
+        assert fs.start[0] == body.start and fs.finish[-1] == body.finish, inp
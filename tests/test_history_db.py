@@ -0,0 +1,96 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from reference import random_inputs
+from schedule_engine import calculate_schedule
+
+
+def _summary(name):
+    return {"project_name": name, "location": "台北市", "design_unit": "某某建築師事務所", "b_type": "住宅", "struct_above": "RC造", "base_area": 1000.0,
+            "floors_up": 15, "floors_down": 3, "total_cal_days": 900, "final_finish_date": "2028-01-01", "note": ""}
+
+
+def test_save_load_delete(temp_db):
+    ids = [temp_db.save_to_db(_summary(f"案{i}")) for i in range(3)]
+    df = temp_db.load_from_db()
+    assert df["id"].tolist() == ids[::-1]
+    temp_db.delete_from_db(ids[1])
+    assert temp_db.load_from_db()["project_name"].tolist() == ["案2", "案0"]
+
+
+def test_concurrent_saves_are_serialized(temp_db):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda i: temp_db.save_to_db(_summary(f"並行{i}")), range(200)))
+    assert sorted(ids) == list(range(1, 201))
+    assert len(temp_db.load_from_db()) == 200
+
+
+def test_search_uses_fts_for_long_queries_and_like_for_short(temp_db):
+    for name in ["信義住宅新建工程", "板橋辦公大樓", "100%_完工案", "信義區商場"]: temp_db.save_to_db(_summary(name))
+    temp_db.init_db()
+    assert "MATCH" in temp_db._search_clause("信義住")[0]
+    assert "LIKE" in temp_db._search_clause("信義")[0]
+    assert temp_db.search_projects("信義住")["project_name"].tolist() == ["信義住宅新建工程"]
+    assert temp_db.search_projects("信義")["project_name"].tolist() == ["信義區商場", "信義住宅新建工程"]
+    assert temp_db.search_projects("辦公")["project_name"].tolist() == ["板橋辦公大樓"]
+    # LIKE 萬用字元與 FTS 引號皆視為一般字元
+    assert temp_db.search_projects("%_")["project_name"].tolist() == ["100%_完工案"]
+    assert temp_db.search_projects('"信義').empty
+    assert temp_db.search_projects("建築師")["project_name"].tolist()[-1] == "信義住宅新建工程"
+    assert temp_db.count_projects("信義") == 2 and temp_db.count_projects("信義住") == 1 and temp_db.count_projects() == 4
+
+
+def test_keyset_paging(temp_db):
+    for i in range(120): temp_db.save_to_db(_summary(f"{'信義' if i % 3 else '板橋'}案{i:03d}"))
+    for query, expected in [("", 120), ("信義案", 80), ("板橋", 40)]:
+        seen, before_id = [], None
+        while True:
+            page = temp_db.search_projects(query, limit=50, before_id=before_id)
+            if page.empty: break
+            assert len(page) <= 50
+            seen += page["id"].tolist()
+            before_id = page["id"].min()
+        assert len(seen) == expected == temp_db.count_projects(query)
+        assert seen == sorted(set(seen), reverse=True)
+
+
+def test_estimate_round_trip(temp_db):
+    rng = random.Random(8)
+    for _ in range(30):
+        inp, is_reverse = random_inputs(rng), rng.random() < 0.5
+        result = calculate_schedule(inp, is_reverse)
+        pid = temp_db.save_estimate(_summary("還原測試"), inp, result, is_reverse)
+        loaded = temp_db.load_estimate(pid)
+        assert loaded["inputs"] == inp
+        assert loaded["is_reverse"] == is_reverse
+        assert loaded["phases"] == result.phases
+        # 300 / 300.0 原樣存回
+        assert type(loaded["inputs"].daily_soil_limit) is type(inp.daily_soil_limit)
+        assert calculate_schedule(loaded["inputs"], loaded["is_reverse"]) == result
+    assert temp_db.load_estimate(10**6) is None
+
+
+def test_delete_cascades_to_inputs_and_phases(temp_db):
+    inp = random_inputs(random.Random(9))
+    result = calculate_schedule(inp, False)
+    keep = temp_db.save_estimate(_summary("保留"), inp, result, False)
+    gone = temp_db.save_estimate(_summary("刪除"), inp, result, False)
+    temp_db.delete_from_db(gone)
+
+    with temp_db.reader() as conn:
+        def count(table, pid): return conn.execute(f"SELECT count(*) FROM {table} WHERE project_id=?", (pid,)).fetchone()[0]
+        assert count("project_inputs", gone) == 0 and count("project_phases", gone) == 0
+        assert count("project_inputs", keep) == 1 and count("project_phases", keep) == len(result.phases)
+    assert temp_db.load_estimate(gone) is None
+
+
+def test_suspended_index_is_rebuilt(temp_db):
+    temp_db.save_to_db(_summary("索引前舊案"))
+    temp_db.suspend_search_index()
+    temp_db.save_to_db(_summary("暫停期間新案"))
+    assert temp_db.search_projects("期間新").empty  # 觸發器已停用，新列尚未進索引
+    temp_db.rebuild_search_index()
+    assert temp_db.search_projects("期間新")["project_name"].tolist() == ["暫停期間新案"]
+    assert temp_db.search_projects("前舊案")["project_name"].tolist() == ["索引前舊案"]
+    temp_db.save_to_db(_summary("重建後新案"))  # 觸發器已恢復
+    assert temp_db.search_projects("建後新")["project_name"].tolist() == ["重建後新案"]
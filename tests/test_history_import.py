@@ -0,0 +1,102 @@
+import io
+
+import pytest
+
+from history_import import COLUMN_ALIASES, import_projects, iter_csv, map_columns
+
+
+def _csv(text):
+    stream = io.BytesIO(text.encode("utf-8-sig"))
+    stream.name = "projects.csv"
+    return stream
+
+
+def test_header_aliases():
+    mapping = map_columns(["案名", " 地號 位置 ", "建築師", "工期（天）", "完工日期", "不相干", "專案名稱"])
+    assert mapping == {"project_name": 0, "location": 1, "design_unit": 2, "total_cal_days": 3, "final_finish_date": 4}
+    for col, aliases in COLUMN_ALIASES.items():
+        for alias in aliases: assert map_columns(["project_name", alias]).get(col) is not None
+    with pytest.raises(ValueError, match="project_name"): map_columns(["地點", "備註"])
+
+
+def test_validation_report_uses_physical_line_numbers(temp_db):
+    text = (
+        "工程名稱,地上層數,基地面積,完工日,總工期\n"
+        "甲案,12,\"1,200.5\",2028/1/5,900 天\n"
+        "\n"
+        "乙案,3.5,100,,\n"
+        ",5,100,,\n"
+        "丙案,-1,100,,\n"
+        "\"丁\n案\",8,abc,,\n"
+        "戊案,inf,100,,\n"
+        "己案,20,1e400,,\n"
+        "庚案,7,300,2027-02-30,\n"
+        "辛案,10,200,2029-12-31 00:00:00,1000\n"
+    )
+    report = import_projects(_csv(text))
+    assert (report["read"], report["valid"], report["inserted"], report["skipped"]) == (9, 2, 2, 7)
+    assert [line for line, _ in report["errors"]] == [4, 5, 6, 7, 9, 10, 11]
+    messages = dict(report["errors"])
+    assert "floors_up" in messages[4] and "project_name" in messages[5] and "不可為負" in messages[6]
+    assert "base_area" in messages[7] and "floors_up" in messages[9] and "base_area" in messages[10]
+    assert report["columns"] == {"project_name": "工程名稱", "floors_up": "地上層數", "base_area": "基地面積",
+                                 "final_finish_date": "完工日", "total_cal_days": "總工期"}
+    df = temp_db.load_from_db().set_index("project_name")
+    assert df.loc["甲案", "base_area"] == 1200.5 and df.loc["甲案", "total_cal_days"] == 900
+    assert df.loc["甲案", "final_finish_date"] == "2028-01-05" and df.loc["辛案", "final_finish_date"] == "2029-12-31"
+
+
+def test_batches_are_flushed_in_order(temp_db):
+    n = 2345
+    text = "project_name,floors_up\n" + "".join(f"案{i:05d},{i % 40}\n" for i in range(n))
+    calls = []
+    report = import_projects(_csv(text), batch_size=500, progress=lambda read, fraction: calls.append((read, fraction)))
+    assert (report["read"], report["valid"], report["inserted"], report["skipped"]) == (n, n, n, 0)
+    assert [read for read, _ in calls] == [500, 1000, 1500, 2000, n]
+    assert calls[-1][1] == 1.0
+    df = temp_db.load_from_db()
+    assert df["project_name"].tolist() == [f"案{i:05d}" for i in reversed(range(n))]
+
+
+def test_dry_run_writes_nothing(temp_db):
+    report = import_projects(_csv("project_name\n甲\n乙\n"), dry_run=True)
+    assert (report["valid"], report["inserted"]) == (2, 0)
+    assert temp_db.load_from_db().empty
+
+
+def test_search_index_rebuilt_after_failed_import(temp_db):
+    import_projects(_csv("工程名稱\n信義住宅新建工程\n"))
+    with pytest.raises(ValueError, match="缺少必要欄位"): import_projects(_csv("地點,備註\n台北,無\n"))
+    with pytest.raises(ValueError, match="檔案沒有資料列"): import_projects(_csv(""))
+    # 匯入失敗仍需恢復觸發器並重建索引
+    temp_db.save_to_db({"project_name": "板橋辦公大樓"})
+    assert temp_db.search_projects("信義住")["project_name"].tolist() == ["信義住宅新建工程"]
+    assert temp_db.search_projects("辦公大")["project_name"].tolist() == ["板橋辦公大樓"]
+
+
+def test_excel_rows_keep_sheet_row_numbers(temp_db, tmp_path):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["工程名稱", "地上層數"])
+    ws.append(["甲案", 10])
+    ws.append([None, None])
+    ws.append(["乙案", "十"])
+    ws.append(["丙案", "inf"])
+    path = tmp_path / "projects.xlsx"
+    wb.save(path)
+    report = import_projects(str(path))
+    assert (report["valid"], report["skipped"]) == (1, 2)
+    assert [line for line, _ in report["errors"]] == [4, 5]
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_csv_stream_left_open_for_caller():
+    stream = _csv("a\n1\n")
+    rows = iter_csv(stream)
+    assert next(rows)[:2] == (1, ["a"])
+    stream.close()
+    del rows  # generator 於串流關閉後才回收，不應再丟 I/O 錯誤
+    stream = _csv("a\n\n1\n")
+    assert [line for line, _, _ in iter_csv(stream)] == [1, 3]
+    assert not stream.closed
@@ -0,0 +1,64 @@
+import dataclasses
+import random
+
+import pytest
+
+from reference import random_inputs, reference_schedule
+from schedule_engine import IncrementalSchedule, ScheduleInputs, calculate_schedule
+
+N_CASES = 500  # 參考引擎逐日迴圈較慢
+
+
+@pytest.mark.parametrize("is_reverse", [False, True])
+def test_graph_matches_reference_engine(is_reverse):
+    rng = random.Random(14 + is_reverse)
+    for _ in range(N_CASES):
+        inp = random_inputs(rng)
+        assert calculate_schedule(inp, is_reverse) == reference_schedule(inp, is_reverse), inp
+
+
+def _mutate(rng, inp):
+    """隨機改 1~3 個欄位 (值取自另一組亂數輸入)"""
+    other = random_inputs(rng, floor_cycle=True)
+    names = rng.sample([f.name for f in dataclasses.fields(ScheduleInputs)], rng.randint(1, 3))
+    if "calc_floors_struct" in names or "display_max_floor" in names or "transfer_floors" in names:
+        names += ["calc_floors_struct", "display_max_floor", "transfer_floors"]
+    return dataclasses.replace(inp, **{n: getattr(other, n) for n in names})
+
+
+@pytest.mark.parametrize("is_reverse", [False, True])
+def test_incremental_matches_full_evaluation(is_reverse):
+    rng = random.Random(1400 + is_reverse)
+    for _ in range(50):
+        inc = IncrementalSchedule()
+        inp = random_inputs(rng, floor_cycle=True)
+        for _ in range(40):
+            assert inc.compute(inp, is_reverse) == calculate_schedule(inp, is_reverse), inp
+            inp = _mutate(rng, inp)
+
+
+def test_incremental_switches_method():
+    rng = random.Random(99)
+    inc = IncrementalSchedule()
+    for _ in range(200):
+        inp, is_reverse = random_inputs(rng, floor_cycle=True), rng.random() < 0.5
+        assert inc.compute(inp, is_reverse) == calculate_schedule(inp, is_reverse)
+
+
+def test_type_change_rerenders_note():
+    inp = ScheduleInputs(b_type="住宅", struct_above="RC造", base_area_m2=2000, floors_down=4, calc_floors_struct=20, display_max_floor=20,
+                         enable_soil_limit=True, daily_soil_limit=300)
+    inc = IncrementalSchedule()
+    inc.compute(inp, False)
+    changed = dataclasses.replace(inp, daily_soil_limit=300.0)
+    assert inc.compute(changed, False) == calculate_schedule(changed, False)
+
+
+def test_unrelated_change_skips_upstream_nodes():
+    inp = ScheduleInputs(b_type="住宅", struct_above="RC造", base_area_m2=2000, floors_down=4, calc_floors_struct=20, display_max_floor=20,
+                         ext_wall="標準磁磚/塗料")
+    inc = IncrementalSchedule()
+    inc.compute(inp, False)
+    changed = dataclasses.replace(inp, ext_wall="玻璃帷幕 (工期較短)")
+    assert inc.compute(changed, False) == calculate_schedule(changed, False)
+    assert 0 < len(inc.recomputed) < 10
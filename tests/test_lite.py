@@ -0,0 +1,20 @@
+import random
+
+from reference import reference_lite
+from schedule_engine import LiteInputs, STRUCT_MAP_ABOVE, calculate_lite
+
+B_TYPES = ["住宅", "辦公大樓", "飯店", "廠房"]
+METHODS = ["順打工法", "逆打工法"]
+
+
+def test_matches_inline_page_calculation():
+    rng = random.Random(2021)
+    for _ in range(20000):
+        args = (rng.randint(1, 80), rng.randint(0, 10), rng.choice(list(STRUCT_MAP_ABOVE)), rng.choice([10.0, rng.uniform(10, 30000)]),
+                rng.choice(B_TYPES), rng.choice(METHODS), rng.random() < 0.5)
+        result = calculate_lite(LiteInputs(*args))
+        assert result == reference_lite(*args), args
+
+
+def test_defaults_match_page_defaults():
+    assert calculate_lite(LiteInputs()) == reference_lite(15, 3, "RC造", 1000.0, "住宅", "順打工法", True)
@@ -0,0 +1,52 @@
+import dataclasses
+import datetime
+import random
+
+from cpm import Activity, Dependency, compute_cpm
+from reference import random_inputs
+from resource_leveling import CRANE, Resource, level_project, level_resources, project_resource_network
+from schedule_engine import ScheduleInputs
+
+TOWER_INPUTS = ScheduleInputs(
+    start_date=datetime.date(2025, 3, 3), b_type="集合住宅", struct_above="RC造", base_area_m2=3000.0, total_fa_m2=45000.0,
+    calc_floors_struct=22, display_max_floor=20, building_count=2, floors_down=3, selected_wall="連續壁 (Diaphragm Wall)",
+    selected_support="型鋼內支撐 (Strut)", foundation_type="標準筏式基礎 (無基樁)", ext_wall="標準磁磚/塗料", prep_type_select="一般 (120天)",
+)
+
+
+def test_single_resource_serializes_by_latest_start():
+    activities = [Activity("A", 5), Activity("B", 3), Activity("C", 4), Activity("D", 2)]
+    dependencies = [Dependency("A", "D"), Dependency("B", "D"), Dependency("C", "D", "SS", 1)]
+    leveled = level_resources(activities, dependencies, [Resource("r", 1)], {"A": {"r": 1}, "B": {"r": 1}, "C": {"r": 1}})
+    # CPM 最晚開始：A 0、B 2、C 3 → 依序 A、B、C；D 不需資源，前置條件滿足 (C 開始 + 1) 即開工
+    assert leveled.start == (0, 5, 8, 9)
+    assert leveled.finish == (5, 8, 12, 11)
+    assert leveled.delay == (0, 5, 8, 4)
+    assert (leveled.project_duration, leveled.cpm_duration) == (12, 7)
+    assert all(used["r"] <= 1 for _, used in leveled.usage)
+
+
+def test_one_crane_delays_second_building():
+    buildings = [("A 棟", 22), ("B 棟", 22)]
+    shared, _ = level_project(TOWER_INPUTS, False, buildings, crane_count=1)
+    own, _ = level_project(TOWER_INPUTS, False, buildings, crane_count=2)
+    i1, i2 = shared.ids.index("struct_body@1"), shared.ids.index("struct_body@2")
+    assert own.start[i1] == own.start[i2] and own.project_duration == own.cpm_duration
+    assert shared.start[i2] == shared.finish[i1]
+    assert shared.delay[i2] == shared.duration[i1] and shared.delay[i1] == 0
+    assert shared.project_duration > own.project_duration == shared.cpm_duration
+    assert max(used[CRANE] for _, used in shared.usage) == 1
+
+
+def test_unbound_resources_match_cpm():
+    rng = random.Random(13)
+    for _ in range(300):
+        inp = dataclasses.replace(random_inputs(rng), enable_soil_limit=False)
+        is_reverse = rng.random() < 0.5
+        buildings = [(f"{b}", rng.randint(1, inp.calc_floors_struct or 1)) for b in range(rng.randint(1, 4))]
+        activities, dependencies, resources, demands = project_resource_network(inp, is_reverse, buildings, crane_count=len(buildings))
+        leveled = level_resources(activities, dependencies, resources, demands)
+        cpm = compute_cpm(activities, dependencies)
+        assert leveled.start == cpm.es and leveled.finish == cpm.ef
+        assert leveled.project_duration == leveled.cpm_duration == cpm.project_duration
+        assert set(leveled.delay) <= {0}
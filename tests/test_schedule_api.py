@@ -0,0 +1,104 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from schedule_api import MAX_BODY, ScheduleHandler, ScheduleServer
+
+PROJECT = {"工程名稱": "測試案", "建物類型": "住宅", "施工方式": "順打工法", "地上結構": "RC造", "地下結構": "RC造",
+           "基地面積": 1200, "總樓地板面積": 15000, "地上層數": 15, "地下層數": 3, "開工日期": "2025-03-03"}
+
+
+@pytest.fixture(scope="module")
+def server():
+    ScheduleHandler.quiet = True
+    srv = ScheduleServer(("127.0.0.1", 0), workers=1)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def conn(server):
+    c = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=30)
+    yield c
+    c.close()
+
+
+def _post(conn, path, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    conn.request("POST", path, body, {"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read())
+
+
+def _raw(server, head):
+    with socket.create_connection(("127.0.0.1", server.server_port), timeout=30) as s:
+        s.sendall(head)
+        data = b""
+        while chunk := s.recv(65536): data += chunk  # 伺服器回應後關閉連線
+    status = int(data.split(b" ", 2)[1])
+    return status, json.loads(data.split(b"\r\n\r\n", 1)[1])
+
+
+def test_keep_alive_serves_many_requests_on_one_connection(conn):
+    conn.request("GET", "/health")
+    resp = conn.getresponse()
+    assert resp.status == 200 and json.loads(resp.read())["status"] == "ok"
+    sock = conn.sock
+    status, result = _post(conn, "/pro", PROJECT)
+    assert status == 200 and result["cal_days"] > 0 and result["phases"][0]["name"] == "1.前期"
+    status, result = _post(conn, "/compare", {k: v for k, v in PROJECT.items() if k != "施工方式"})
+    assert status == 200 and result["cal_days_diff"] == result["reverse"]["cal_days"] - result["standard"]["cal_days"]
+    status, result = _post(conn, "/lite", {"floors_up": 20, "floors_down": 4})
+    assert status == 200 and result["total_days"] > 0
+    # 錯誤回應後連線照常可用
+    assert _post(conn, "/pro", {"地上層數": 15})[0] == 400
+    assert _post(conn, "/nope", PROJECT)[0] == 404
+    assert _post(conn, "/pro", PROJECT)[0] == 200
+    assert conn.sock is sock
+
+
+@pytest.mark.parametrize("path, payload, message", [
+    ("/pro", b"{not json", "JSON 格式錯誤"),
+    ("/pro", b"[1, 2]", "JSON 物件"),
+    ("/pro", dict(PROJECT, 地上層數="inf"), "地上層數 格式錯誤"),
+    ("/pro", json.dumps(dict(PROJECT, 地上層數=1), ensure_ascii=False).replace('"地上層數": 1', '"地上層數": 1e400').encode("utf-8"), "地上層數 格式錯誤"),
+    ("/pro", dict(PROJECT, 基地面積=True), "基地面積 格式錯誤"),
+    ("/lite", {"floors_up": 0}, "floors_up 不可小於 1"),
+    ("/lite", {"stories": 3}, "未知欄位"),
+    ("/batch", {"projects": [1, 2]}, "物件陣列"),
+])
+def test_bad_requests_answer_400(conn, path, payload, message):
+    status, result = _post(conn, path, payload)
+    assert status == 400 and message in result["error"]
+
+
+def test_unknown_paths_answer_404(conn):
+    conn.request("GET", "/pro")
+    resp = conn.getresponse()
+    assert resp.status == 404 and "未知路徑" in json.loads(resp.read())["error"]
+    assert _post(conn, "/estimate", PROJECT)[0] == 404
+
+
+def test_batch_reports_errors_per_project(conn):
+    projects = [PROJECT, dict(PROJECT, 地上層數="15.5"), {"工程名稱": "缺欄位"}, dict(PROJECT, 施工方式="逆打工法")] * 30
+    status, result = _post(conn, "/batch", {"projects": projects})
+    assert status == 200
+    assert (result["count"], result["errors"]) == (120, 60)
+    assert [r["ok"] for r in result["results"][:4]] == [True, False, False, True]
+    assert "地上層數 格式錯誤" in result["results"][1]["error"] and "缺少必要欄位" in result["results"][2]["error"]
+    assert result["results"][3]["result"]["is_reverse"] and result["results"][4] == result["results"][0]
+    assert _post(conn, "/batch", projects[:2])[1]["count"] == 2  # 也接受直接傳陣列
+
+
+def test_oversized_or_invalid_length_closes_connection(server):
+    status, result = _raw(server, f"POST /pro HTTP/1.1\r\nHost: x\r\nContent-Length: {MAX_BODY + 1}\r\n\r\n".encode())
+    assert status == 413 and "MB" in result["error"]
+    for length in ("abc", "-5"):
+        status, result = _raw(server, f"POST /pro HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n".encode())
+        assert status == 400 and "Content-Length" in result["error"]
@@ -0,0 +1,43 @@
+import dataclasses
+import datetime
+import random
+
+from reference import random_inputs
+from schedule_cache import LRUCache, cached_calculate_schedule, canonical_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=3)
+    for key in "abc": cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # a 變成最近使用
+    cache.put("d", "D")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["A", "C", "D"]
+    cache.put("c", "C2")  # 覆寫也算使用
+    cache.put("e", "E")
+    assert cache.get("a") is None
+    assert [cache.get(k) for k in "cde"] == ["C2", "D", "E"]
+    assert cache.stats()["size"] == 3
+
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.get("a"); cache.get("a"); cache.get("b")
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["hit_rate"]) == (2, 1, 2 / 3)
+    cache.clear()
+    assert cache.stats() == {"size": 0, "maxsize": 2, "hits": 0, "misses": 0, "hit_rate": 0.0}
+
+
+def test_key_is_stable_for_equal_inputs():
+    rng = random.Random(5)
+    for _ in range(200):
+        inp = random_inputs(rng)
+        copy = dataclasses.replace(inp, start_date=datetime.date.fromordinal(inp.start_date.toordinal()))
+        assert copy is not inp
+        assert canonical_key(inp, True) == canonical_key(copy, True)
+        assert canonical_key(inp, True) != canonical_key(inp, False)
+        changed = dataclasses.replace(inp, floors_down=inp.floors_down + 1)
+        assert canonical_key(changed, True) != canonical_key(inp, True)
+        assert cached_calculate_schedule(copy, True) is cached_calculate_schedule(inp, True)
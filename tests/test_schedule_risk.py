@@ -0,0 +1,35 @@
+import random
+
+import numpy as np
+
+from reference import random_inputs
+from schedule_engine import calculate_schedule
+from schedule_risk import PERCENTILES, simulate_schedule
+
+
+def _point(value):
+    return {"dist": "triangular", "low": value, "mode": value, "high": value}
+
+
+def test_percentiles_are_ordered_and_seeded():
+    rng = random.Random(4)
+    for _ in range(20):
+        inp, is_reverse = random_inputs(rng), rng.random() < 0.5
+        mc = simulate_schedule(inp, is_reverse, 2000, seed=7)
+        p50, p80, p90 = (mc["percentiles"][p] for p in PERCENTILES)
+        assert p50 <= p80 <= p90
+        assert [mc["percentile_cal_days"][p] for p in PERCENTILES] == sorted(mc["percentile_cal_days"].values())
+        again = simulate_schedule(inp, is_reverse, 2000, seed=7)
+        assert np.array_equal(mc["finish_dates"], again["finish_dates"])
+
+
+def test_degenerate_distributions_reproduce_deterministic_finish():
+    rng = random.Random(40)
+    for _ in range(50):
+        inp, is_reverse = random_inputs(rng), rng.random() < 0.5
+        dists = {"dw_reality_factor": _point(inp.dw_reality_factor), "days_per_floor_bd": _point(45), "struct_rate": _point(1.0)}
+        mc = simulate_schedule(inp, is_reverse, 100, dists, seed=1)
+        result = calculate_schedule(inp, is_reverse)
+        assert set(mc["finish_dates"].astype(object)) == {result.final_finish}
+        assert all(mc["percentiles"][p] == result.final_finish for p in PERCENTILES)
+        assert mc["percentile_cal_days"][50] == (result.final_finish - inp.start_date).days
@@ -0,0 +1,57 @@
+import datetime
+import math
+import random
+
+import numpy as np
+import pytest
+
+from soil_haulage import LIMIT_DIGGING, LIMIT_PERMIT, LIMIT_TRUCKS, simulate_haulage, truck_capacity
+from workday_calendar import get_calendar
+
+START = datetime.date(2025, 3, 3)
+
+
+def test_truck_capacity_counts_whole_trips():
+    assert truck_capacity(10, 8, 1.5, 8) == 10 * 5 * 8
+    assert truck_capacity(10, 8, 2, 8) == 10 * 4 * 8  # 剛好整趟不因浮點誤差少算
+    assert truck_capacity(10, 8, 1.5, 0) == 0.0 and truck_capacity(10, 8, 0, 8) == 0.0
+
+
+def test_constant_capacity_matches_add_workdays():
+    rng = random.Random(19)
+    for _ in range(200):
+        cal = get_calendar(rng.random() < 0.7, rng.random() < 0.8, rng.random() < 0.7)
+        start = START + datetime.timedelta(days=rng.randrange(3650))
+        volume = rng.uniform(1, 200000)
+        trucks, m3, cycle, window = rng.randint(1, 30), rng.choice([6, 8, 10.5]), rng.choice([1, 1.5, 2.5]), rng.choice([4, 8, 10])
+        limit, dig = rng.choice([None, rng.uniform(100, 3000)]), rng.choice([None, rng.uniform(100, 3000)])
+        plan = simulate_haulage(volume, start, cal, trucks, m3, cycle, window, daily_limit=limit, dig_rate=dig)
+        caps = {LIMIT_TRUCKS: truck_capacity(trucks, m3, cycle, window), LIMIT_PERMIT: limit, LIMIT_DIGGING: dig}
+        cap = min(v for v in caps.values() if v)
+        assert plan.daily_capacity == pytest.approx(cap) and caps[plan.limited_by] == plan.daily_capacity
+        days = math.ceil(volume / cap - 1e-6)
+        assert plan.finish == cal.add_workdays(start, days)
+        assert plan.haul_days == len(plan.dates) == days
+        assert plan.cum_m3[-1] == pytest.approx(volume) and np.all(plan.daily_m3 <= cap + 1e-6)
+
+
+def test_saturday_window():
+    cal = get_calendar(False, True, False)
+    plan = simulate_haulage(1000, START, cal, trucks=5, truck_m3=10, cycle_hours=2, window_hours=8, saturday_hours=4)
+    weekday = np.array([d.astype(datetime.date).weekday() for d in plan.dates])
+    assert set(plan.daily_m3[weekday == 5]) <= {100.0} and set(plan.daily_m3[weekday < 5][:-1]) == {200.0}
+    assert plan.cum_m3[-1] == pytest.approx(1000)
+
+
+def test_no_capacity_raises():
+    cal = get_calendar(True, True, False)
+    with pytest.raises(ValueError, match="每日可運土方為 0"):
+        simulate_haulage(1000, START, cal, trucks=0, truck_m3=8, cycle_hours=1.5, window_hours=8)
+    # 平日不運、只有週六可運但日曆排除週六：不可無限延長期間
+    with pytest.raises(ValueError, match="每日可運土方為 0"):
+        simulate_haulage(1000, START, cal, trucks=10, truck_m3=8, cycle_hours=1.5, window_hours=0, saturday_hours=4)
+
+
+def test_zero_volume():
+    plan = simulate_haulage(0, START, get_calendar(), 10, 8, 1.5, 8)
+    assert (plan.finish, plan.haul_days, len(plan.dates)) == (START, 0, 0)
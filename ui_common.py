@@ -0,0 +1,27 @@
+import importlib
+
+# ==========================================
+# 🧩 Streamlit 頁面共用 (每個行程只載入一次)
+# ==========================================
+# - pandas / plotly 延遲載入：登入頁、Lite 表單、空的歷史資料庫不需要，第一次取用屬性時才 import
+# - 調色盤等常數表放在模組層級，不隨每次重跑重建
+
+
+class LazyModule:
+    """模組代理：第一次取屬性時才 import，之後直接轉給真正的模組"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+pd = LazyModule("pandas")
+px = LazyModule("plotly.express")
+go = LazyModule("plotly.graph_objects")
+
+MORANDI_COLORS = ("#8E9EAB", "#D4A5A5", "#96B3C2", "#B9C0C9", "#E0C9A6", "#A9B7C0", "#C4B7D7", "#8FA691", "#D9B48F", "#BFD7D1", "#E3D0B9")
+MORANDI_COLORS_SIM = MORANDI_COLORS + ("#99A8A5", "#D6C6B0", "#B0A3D2", "#ABC3C5")  # [v6.92] 舊版頁面多 4 色
@@ -0,0 +1,120 @@
+import datetime
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+# ==========================================
+# 📆 工作日曆 (累計工作天陣列)
+# ==========================================
+# 以「日序」(date.toordinal) 為索引，預先建好整段期間的工作日旗標與累計工作天數，
+# 加減 N 個工作天皆以 searchsorted 二分搜尋完成，不再逐日迴圈。
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_DEFAULT_FROM = datetime.date(1990, 1, 1)
+_DEFAULT_TO = datetime.date(2150, 12, 31)
+
+
+class WorkCalendar:
+    """不可施工日 (週六/週日/過年 2/1~2/7) 排除後的工作日曆"""
+
+    def __init__(self, exclude_sat=True, exclude_sun=True, exclude_cny=True):
+        self.exclude_sat = bool(exclude_sat)
+        self.exclude_sun = bool(exclude_sun)
+        self.exclude_cny = bool(exclude_cny)
+        self._lock = threading.Lock()
+        self._build(_DEFAULT_FROM.toordinal(), _DEFAULT_TO.toordinal())
+
+    def _build(self, first_ord, last_ord):
+        days = np.arange(first_ord - _EPOCH_ORDINAL, last_ord - _EPOCH_ORDINAL + 1).astype("datetime64[D]")
+        weekday = (np.arange(first_ord, last_ord + 1) - 1) % 7  # date(1,1,1) 為週一
+        is_work = np.ones(len(days), dtype=bool)
+        if self.exclude_sat: is_work &= weekday != 5
+        if self.exclude_sun: is_work &= weekday != 6
+        if self.exclude_cny:
+            month_start = days.astype("datetime64[M]")
+            month = month_start.astype(np.int64) % 12 + 1
+            day = (days - month_start.astype("datetime64[D]")).astype(np.int64) + 1
+            is_work &= ~((month == 2) & (day <= 7))
+        # 整組一次替換，其他執行緒不會讀到半套資料
+        self._state = (first_ord, last_ord, is_work, np.cumsum(is_work, dtype=np.int64))
+
+    def _ensure(self, lo_ord, hi_ord):
+        """確保涵蓋 [lo_ord, hi_ord]，回傳 (起始日序, 工作日旗標, 累計工作天)"""
+        first, last, is_work, cum = self._state
+        if lo_ord < first or hi_ord > last:
+            with self._lock:
+                first, last = self._state[:2]
+                if lo_ord < first or hi_ord > last:
+                    span = last - first
+                    self._build(min(first, lo_ord - span // 2), max(last, hi_ord + span // 2))
+                first, last, is_work, cum = self._state
+        return first, is_work, cum
+
+    def _margin(self, n):
+        # 每週至少 5 個工作天 (過年週仍 ≥ 0)，取保守上限避免越界
+        return int(n) * 2 + 30
+
+    # --- 單筆查詢 ---
+    def is_workday(self, d):
+        o = d.toordinal()
+        first, is_work, _ = self._ensure(o, o)
+        return bool(is_work[o - first])
+
+    def add_workdays(self, start, days):
+        """start 之後第 N 個工作天 (等同原 get_end)"""
+        if days <= 0: return start
+        n = int(np.ceil(days))
+        o = start.toordinal()
+        first, _, cum = self._ensure(o, o + self._margin(n))
+        target = cum[o - first] + n
+        return datetime.date.fromordinal(first + int(np.searchsorted(cum, target, side="left")))
+
+    def sub_workdays(self, end, days):
+        """end 之前第 N 個工作天 (等同原 get_start_from_end)"""
+        if days <= 0: return end
+        n = int(np.ceil(days))
+        o = end.toordinal()
+        first, _, cum = self._ensure(o - self._margin(n), o)
+        target = cum[o - first - 1] - n + 1
+        return datetime.date.fromordinal(first + int(np.searchsorted(cum, target, side="left")))
+
+    def count_workdays(self, start, end):
+        """(start, end] 區間內的工作天數"""
+        lo, hi = start.toordinal(), end.toordinal()
+        first, _, cum = self._ensure(min(lo, hi), max(lo, hi))
+        return int(cum[hi - first] - cum[lo - first])
+
+    # --- 向量化 (日序陣列) ---
+    def workday_flags(self, first_ord, last_ord):
+        """[first_ord, last_ord] 逐日是否為工作日 (bool 陣列)"""
+        first, is_work, _ = self._ensure(first_ord, last_ord)
+        return is_work[first_ord - first:last_ord - first + 1].copy()
+
+    def add_workdays_ord(self, start_ords, days):
+        """向量版 add_workdays：輸入/輸出皆為日序 (int64 陣列)"""
+        start_ords = np.asarray(start_ords, dtype=np.int64)
+        n = np.ceil(np.asarray(days, dtype=np.float64)).astype(np.int64)
+        n, start_ords = np.broadcast_arrays(n, start_ords)
+        if start_ords.size == 0: return start_ords.copy()
+        first, _, cum = self._ensure(int(start_ords.min()), int(start_ords.max()) + self._margin(max(int(n.max()), 0)))
+        target = cum[start_ords - first] + n
+        out = np.searchsorted(cum, target, side="left") + first
+        return np.where(n > 0, out, start_ords)
+
+    def sub_workdays_ord(self, end_ords, days):
+        """向量版 sub_workdays：輸入/輸出皆為日序 (int64 陣列)"""
+        end_ords = np.asarray(end_ords, dtype=np.int64)
+        n = np.ceil(np.asarray(days, dtype=np.float64)).astype(np.int64)
+        n, end_ords = np.broadcast_arrays(n, end_ords)
+        if end_ords.size == 0: return end_ords.copy()
+        first, _, cum = self._ensure(int(end_ords.min()) - self._margin(max(int(n.max()), 0)), int(end_ords.max()))
+        target = cum[end_ords - first - 1] - n + 1
+        out = np.searchsorted(cum, target, side="left") + first
+        return np.where(n > 0, out, end_ords)
+
+
+@lru_cache(maxsize=8)
+def get_calendar(exclude_sat=True, exclude_sun=True, exclude_cny=True):
+    """依排除條件取得共用的工作日曆 (每個行程只建一次)"""
+    return WorkCalendar(bool(exclude_sat), bool(exclude_sun), bool(exclude_cny))